@@ -0,0 +1,266 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from app.batching import MicroBatcher
+from app.monitoring import (record_prediction, ADMISSION_LIMIT, ADMISSION_QUEUE_DEPTH,
+                            ADMISSION_QUEUE_WAIT, ADMISSION_SHED)
+from app.tokenization import basic_english_tokenize
+
+
+class Overloaded(Exception):
+    """A prediction was shed; ``retry_after`` is a hint in whole seconds"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('event', 'admitted')
+
+    def __init__(self, event):
+        self.event = event
+        self.admitted = False
+
+
+class _LoopEvent:
+    """An asyncio.Event that other threads can set"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class AdmissionController:
+    """Admission control and load shedding in front of ``predictor.predict``.
+
+    At most ``limit`` predictions run at once; later ones wait in FIFO
+    order for a slot, for up to ``queue_deadline_ms``. A request is turned
+    away on arrival when the wait projected from the queue length and the
+    average service time would blow the ``latency_slo_ms`` budget, and
+    later if it is still queued at its deadline, instead of joining a
+    backlog it would time out in anyway. A turned-away request is answered
+    from the prediction cache if possible, else scored on its first
+    ``degrade_max_tokens`` tokens (at most ``degrade_concurrency`` at a
+    time, outside the limit), else ``predict`` raises ``Overloaded``.
+    Degraded results carry ``degraded: 'cache' | 'truncated'``. Cache hits
+    never wait for a slot in the first place. A truncated result is not a
+    prediction of the full text: it stays out of the analytics windows and
+    the web app does not store it.
+
+    With ``adaptive`` the limit follows the observed service times:
+    it grows by 1/limit per prediction served within the budget left after
+    queueing (SLO minus queue deadline) and shrinks by ``backoff``, at most
+    once per service time, when predictions take longer. More concurrency
+    helps while micro-batching can absorb it; past that point it only adds
+    latency, and the limit settles there. Attributes not defined here are
+    delegated to the wrapped predictor.
+    """
+
+    def __init__(self, predictor, latency_slo_ms: float = 1000, queue_deadline_ms: float = 250,
+                 initial_limit: int = 32, min_limit: int = 1, max_limit: int = 256,
+                 adaptive: bool = True, degrade_max_tokens: int = 32,
+                 degrade_concurrency: int = 8, backoff: float = 0.9, smoothing: float = 0.1,
+                 clock=time.monotonic):
+        self.predictor = predictor
+        self.latency_slo = latency_slo_ms / 1000.0
+        self.queue_deadline = queue_deadline_ms / 1000.0
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.adaptive = adaptive
+        self.degrade_max_tokens = degrade_max_tokens
+        self.degrade_concurrency = degrade_concurrency
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.clock = clock
+        # Moving average of admitted predictions' service time, None until the first
+        self.service_time = None
+        self.in_flight = 0
+        self.degraded_in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        ADMISSION_LIMIT.set(self.limit)
+
+    def __getattr__(self, name):
+        return getattr(self.predictor, name)
+
+    def projected_wait(self, position: int) -> float:
+        """Seconds until a slot frees for the ``position``-th waiter (1 = next)"""
+        if self.service_time is None:
+            return 0.0
+        return position / math.floor(self.limit) * self.service_time
+
+    def predict(self, text: str) -> Dict[str, Any]:
+        arrived = self.clock()
+        if not self._try_acquire():
+            # A cache hit costs next to nothing, so it never waits for a slot
+            result = self.predictor.cached_result(text)
+            if result is not None:
+                record_prediction(result, self.clock() - arrived)
+                return result
+            waiter = _Waiter(threading.Event())
+            reason = self._join_queue(waiter)
+            if reason is None and not waiter.admitted:
+                waiter.event.wait(self._remaining(arrived))
+                if not self._leave_queue(waiter):
+                    reason = 'queue_deadline'
+            if reason is not None:
+                return self._degrade(text, reason, arrived)
+        admitted = self.clock()
+        ADMISSION_QUEUE_WAIT.observe(admitted - arrived)
+        try:
+            return self.predictor.predict(text)
+        finally:
+            self._release(self.clock() - admitted)
+
+    async def predict_async(self, text: str, predict, run_blocking) -> Dict[str, Any]:
+        """``predict`` for event loops: waits for a slot without holding a thread.
+
+        ``predict`` is the coroutine function scoring an admitted text and
+        ``run_blocking`` runs a function off the loop (degraded scoring).
+        """
+        arrived = self.clock()
+        if not self._try_acquire():
+            result = self.predictor.cached_result(text)
+            if result is not None:
+                record_prediction(result, self.clock() - arrived)
+                return result
+            waiter = _Waiter(_LoopEvent())
+            reason = self._join_queue(waiter)
+            if reason is None and not waiter.admitted:
+                try:
+                    await waiter.event.wait(self._remaining(arrived))
+                except asyncio.CancelledError:
+                    # The client went away; give back a slot handed over meanwhile
+                    if self._leave_queue(waiter):
+                        self._release(None)
+                    raise
+                if not self._leave_queue(waiter):
+                    reason = 'queue_deadline'
+            if reason is not None:
+                return await run_blocking(self._degrade, text, reason, arrived)
+        admitted = self.clock()
+        ADMISSION_QUEUE_WAIT.observe(admitted - arrived)
+        try:
+            return await predict(text)
+        finally:
+            self._release(self.clock() - admitted)
+
+    def _remaining(self, arrived: float) -> float:
+        return max(0.0, arrived + self.queue_deadline - self.clock())
+
+    def _try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight < math.floor(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return True
+            return False
+
+    def _join_queue(self, waiter: _Waiter) -> Optional[str]:
+        """Admit at once or queue ``waiter``; returns why it was refused instead"""
+        with self._lock:
+            if self.in_flight < math.floor(self.limit) and not self._waiters:
+                self.in_flight += 1
+                waiter.admitted = True
+                return None
+            wait = self.projected_wait(len(self._waiters) + 1)
+            if wait > self.queue_deadline or wait + (self.service_time or 0.0) > self.latency_slo:
+                return 'projected_wait'
+            self._waiters.append(waiter)
+            ADMISSION_QUEUE_DEPTH.inc()
+            return None
+
+    def _leave_queue(self, waiter: _Waiter) -> bool:
+        """Stop waiting; True if the waiter was handed a slot in the meantime"""
+        with self._lock:
+            if waiter.admitted:
+                return True
+            self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.dec()
+            return False
+
+    def _release(self, service_time: Optional[float]):
+        with self._lock:
+            self.in_flight -= 1
+            if service_time is not None:
+                if self.service_time is None:
+                    self.service_time = service_time
+                else:
+                    self.service_time += self.smoothing * (service_time - self.service_time)
+                if self.adaptive:
+                    self._adjust_limit(service_time)
+            while self._waiters and self.in_flight < math.floor(self.limit):
+                waiter = self._waiters.popleft()
+                ADMISSION_QUEUE_DEPTH.dec()
+                waiter.admitted = True
+                self.in_flight += 1
+                waiter.event.set()
+
+    def _adjust_limit(self, service_time: float):
+        """AIMD on service time against the budget left after queueing"""
+        now = self.clock()
+        if service_time <= self.latency_slo - self.queue_deadline:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif now - self._last_decrease >= self.service_time:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._last_decrease = now
+        ADMISSION_LIMIT.set(self.limit)
+
+    def _degrade(self, text: str, reason: str, arrived: float) -> Dict[str, Any]:
+        result = self.predictor.cached_result(text)
+        if result is not None:
+            result['degraded'] = 'cache'
+            record_prediction(result, self.clock() - arrived)
+        elif self.degrade_max_tokens > 0:
+            result = self._predict_truncated(text)
+            if result is not None:
+                record_prediction(result, self.clock() - arrived)
+        if result is None:
+            ADMISSION_SHED.labels(reason=reason, outcome='rejected').inc()
+            wait = self.projected_wait(len(self._waiters) + 1)
+            raise Overloaded('Server is overloaded, retry later',
+                             retry_after=max(1, math.ceil(wait)))
+        ADMISSION_SHED.labels(reason=reason, outcome=result['degraded']).inc()
+        return result
+
+    def _predict_truncated(self, text: str) -> Optional[Dict[str, Any]]:
+        """Score the text's first tokens, if a degraded slot is free.
+
+        They go through the micro-batcher like any other text (scoring them
+        in this thread instead would take the CPU from it), but not through
+        ``predict``, which would record them as a prediction of the
+        shortened text.
+        """
+        with self._lock:
+            if self.degraded_in_flight >= self.degrade_concurrency:
+                return None
+            self.degraded_in_flight += 1
+        try:
+            truncated = ' '.join(basic_english_tokenize(text)[:self.degrade_max_tokens])
+            if isinstance(self.predictor, MicroBatcher):
+                result = self.predictor.submit(truncated).result()
+            else:
+                result = self.predictor.predict_batch([truncated], check_cache=False)[0]
+        finally:
+            with self._lock:
+                self.degraded_in_flight -= 1
+        if not result['success']:
+            return None
+        result['text'] = text
+        result['degraded'] = 'truncated'
+        return result
@@ -0,0 +1,107 @@
+import gzip
+import heapq
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from app.export import EXPORT_COLUMNS, truncate_text, write_ndjson
+
+PERIODS = ('day', 'month')
+
+_ID = EXPORT_COLUMNS.index('id')
+_TIMESTAMP = EXPORT_COLUMNS.index('timestamp')
+
+
+def period_start(timestamp: datetime, period: str) -> datetime:
+    """Start of the day or month partition holding ``timestamp``"""
+    if period == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'month':
+        return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown partition period: {period}")
+
+
+def next_period(start: datetime, period: str) -> datetime:
+    if period == 'day':
+        return datetime.fromordinal(start.toordinal() + 1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def archive_name(start: datetime, period: str, first_id: int, last_id: int) -> str:
+    """File name for one archived partition; the id range tells apart rewrites of a period"""
+    label = start.strftime('%Y-%m-%d' if period == 'day' else '%Y-%m')
+    return f'predictions-{label}-{first_id}-{last_id}.ndjson.gz'
+
+
+def row_order(row: Tuple) -> Tuple[datetime, int]:
+    """Sort key of export rows: (timestamp, id), missing timestamps first"""
+    return row[_TIMESTAMP] or datetime.min, row[_ID]
+
+
+def merge_rows(*streams: Iterable[Tuple]) -> Iterator[Tuple]:
+    """Merge export row streams, each already in (timestamp, id) order"""
+    return heapq.merge(*streams, key=row_order)
+
+
+def write_archive(path: str, rows: Iterator[Tuple], compresslevel: int = 6) -> Dict[str, Any]:
+    """Write export rows to a gzip-compressed NDJSON file, atomically.
+
+    The rows are streamed (memory does not depend on the partition size),
+    fsynced and then renamed into place, so a file at ``path`` is always
+    complete. Returns the number of rows and their id range.
+    """
+    summary = {'row_count': 0, 'first_id': None, 'last_id': None}
+
+    def counted(rows):
+        for row in rows:
+            if summary['row_count'] == 0:
+                summary['first_id'] = summary['last_id'] = row[0]
+            summary['row_count'] += 1
+            summary['first_id'] = min(summary['first_id'], row[0])
+            summary['last_id'] = max(summary['last_id'], row[0])
+            yield row
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=compresslevel) as f:
+            for line in write_ndjson(counted(rows)):
+                f.write(line.encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+    return summary
+
+
+def _read_archive(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def iter_archived_rows(path: str, since: datetime = None, until: datetime = None,
+                       sentiment: str = None, truncate: bool = False) -> Iterator[Tuple]:
+    """Rows of an archive file, filtered like ``iter_prediction_rows`` and in its tuple shape"""
+    for record in _read_archive(path):
+        timestamp = datetime.fromisoformat(record['timestamp']) if record['timestamp'] else None
+        if since is not None and (timestamp is None or timestamp < since):
+            continue
+        if until is not None and (timestamp is None or timestamp >= until):
+            continue
+        if sentiment and record['prediction'] != sentiment:
+            continue
+        record['timestamp'] = timestamp
+        if truncate:
+            record['text'] = truncate_text(record['text'])
+        yield tuple(record[column] for column in EXPORT_COLUMNS)
+
+
+def find_archived(path: str, prediction_id: int) -> Optional[Dict[str, Any]]:
+    """One archived prediction in ``SentimentPrediction.to_dict()`` form, or None"""
+    for record in _read_archive(path):
+        if record['id'] == prediction_id:
+            record['text'] = truncate_text(record['text'])
+            record['archived'] = True
+            return record
+    return None
@@ -0,0 +1,126 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any
+from app.monitoring import monitor_prediction
+from app.profiling import observe_stage
+
+# Sentinel placed on the queue to stop the worker thread
+_STOP = object()
+
+
+class MicroBatcher:
+    """Coalesce concurrent predict() calls into batched forward passes.
+
+    Requests are queued and a background thread flushes them through
+    ``predictor.predict_batch`` once ``max_batch_size`` texts are waiting or
+    the oldest request has waited ``max_wait_ms``. Each caller gets back its
+    own result dict, so the batcher is a drop-in replacement for the wrapped
+    predictor. Attributes not defined here are delegated to that predictor.
+    """
+
+    def __init__(self, predictor, max_batch_size: int = 32, max_wait_ms: float = 5):
+        self.predictor = predictor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def __getattr__(self, name):
+        return getattr(self.predictor, name)
+
+    @monitor_prediction
+    def predict(self, text: str) -> Dict[str, Any]:
+        """Queue a prediction and block until its batch has been processed"""
+        # Cache hits are answered straight away instead of waiting for a batch;
+        # the tokens go with a miss so the batch doesn't tokenize it again
+        started = time.perf_counter_ns()
+        tokens = self.predictor.tokenize(text)
+        observe_stage('tokenize', time.perf_counter_ns() - started)
+        cached = self.predictor.cached_result(text, tokens)
+        if cached is not None:
+            return cached
+        return self.submit(text, tokens).result()
+
+    def submit(self, text: str, tokens=None) -> Future:
+        """Queue a prediction and return a future for its result dict.
+
+        ``tokens`` are the text's ``predictor.tokenize()`` output, if known.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, tokens, future, time.perf_counter_ns()))
+        return future
+
+    def close(self, timeout: float = None):
+        """Flush pending requests and stop the worker thread"""
+        with self._lock:
+            worker = self._worker
+            if worker is None or not worker.is_alive():
+                return
+            self._queue.put(_STOP)
+        worker.join(timeout)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so a gunicorn worker forked after
+        # import has to start its own batching thread.
+        if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out"""
+        batch = [self._queue.get()]
+        if batch[0] is _STOP:
+            return batch
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            requests = [item for item in batch if item is not _STOP]
+            if requests:
+                self._process(requests)
+            if stop:
+                return
+
+    def _process(self, requests):
+        texts = [text for text, _, _, _ in requests]
+        tokens = [text_tokens for _, text_tokens, _, _ in requests]
+        started = time.perf_counter_ns()
+        for _, _, _, enqueued_at in requests:
+            observe_stage('queue_wait', started - enqueued_at)
+        try:
+            results = self.predictor.predict_batch(
+                texts, check_cache=False,
+                tokens=tokens if all(t is not None for t in tokens) else None)
+        except Exception as e:
+            results = [self.predictor.error_result(text, e, 0.0) for text in texts]
+
+        now = time.perf_counter_ns()
+        for (_, _, future, enqueued_at), result in zip(requests, results):
+            # Report the caller's view of latency, including time spent queued
+            result['processing_time'] = (now - enqueued_at) / 1e9
+            future.set_result(result)
@@ -0,0 +1,362 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+import numpy as np
+import torch
+from app.model_loading import load_vocab_table
+from app.tokenization import TextEncoder
+
+INPUT_FORMATS = ('csv', 'ndjson', 'text')
+OUTPUT_FORMATS = ('csv', 'ndjson')
+
+OUTPUT_COLUMNS = ('index', 'id', 'text', 'prediction', 'confidence', 'sentiment_score',
+                  'request_id', 'model_version')
+
+_EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.txt': 'text'}
+
+
+def detect_format(path: str, formats=INPUT_FORMATS) -> str:
+    """Guess a file's format from its extension"""
+    fmt = _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in formats:
+        raise ValueError(f"Can't tell the format of {path}; choose one of {', '.join(formats)}")
+    return fmt
+
+
+class Record(NamedTuple):
+    index: int
+    key: Optional[str]
+    text: Optional[str]
+
+
+class _PositionReader:
+    """Text lines from a binary file, keeping track of the bytes consumed"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.size = os.fstat(raw.fileno()).st_size
+
+    def position(self) -> int:
+        return self.raw.tell()
+
+    def __iter__(self):
+        for line in self.raw:
+            yield line.decode('utf-8', errors='replace')
+
+
+def read_records(reader: _PositionReader, fmt: str, text_field: str = 'text',
+                 id_field: str = None) -> Iterator[Record]:
+    """Every record of the input in order, numbered from 0.
+
+    Records without usable text are still yielded (with ``text`` None) so
+    numbering does not depend on content; the scorer skips them.
+    """
+    if fmt == 'text':
+        for index, line in enumerate(reader):
+            text = line.rstrip('\r\n')
+            yield Record(index, None, text if text.strip() else None)
+    elif fmt == 'ndjson':
+        index = 0
+        for line in reader:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            if isinstance(item, str):
+                item = {text_field: item}
+            if not isinstance(item, dict):
+                item = {}
+            text = item.get(text_field)
+            key = item.get(id_field) if id_field else None
+            yield Record(index, None if key is None else str(key),
+                         text if isinstance(text, str) and text.strip() else None)
+            index += 1
+    else:
+        rows = csv.DictReader(reader)
+        if rows.fieldnames is None or text_field not in rows.fieldnames:
+            raise ValueError(f"CSV input has no '{text_field}' column")
+        for index, row in enumerate(rows):
+            text = row.get(text_field)
+            yield Record(index, row.get(id_field) if id_field else None,
+                         text if text and text.strip() else None)
+
+
+# Per-process encoder for the tokenizer pool
+_worker_encoder = None
+
+
+def _init_worker(vocab_path: str):
+    global _worker_encoder
+    torch.set_num_threads(1)
+    _worker_encoder = TextEncoder(load_vocab_table(vocab_path))
+
+
+def _encode_chunk(texts: List[str]):
+    return _worker_encoder.encode_batch(texts)
+
+
+class Checkpoint:
+    """Progress of one scoring run, rewritten atomically after every chunk"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state: Dict[str, Any]):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkScorer:
+    """Score a large file offline through a streaming pipeline.
+
+    read -> tokenize -> forward -> write, one chunk of ``chunk_size``
+    records at a time. Tokenizing runs in ``workers`` processes (inline
+    when 0), at most ``max_pending`` chunks ahead of the model, so memory
+    stays bounded by a few chunks however large the file is. The model runs
+    one batched forward pass per chunk in this process. Results go to an
+    output file (csv or ndjson) and/or are bulk-inserted into
+    sentiment_predictions, one transaction per chunk.
+
+    After each chunk the output is flushed and a checkpoint records how
+    many input records are done and how long the output file was. A run
+    that is interrupted resumes from there: the output is cut back to the
+    checkpointed length and the finished records are skipped. Request ids
+    are derived from the run id and record number, so rows a crashed run
+    inserted after its last checkpoint are recognised and not inserted
+    twice.
+    """
+
+    def __init__(self, predictor, vocab_path: str = None, workers: int = 0,
+                 chunk_size: int = 256, max_pending: int = None, manager=None,
+                 progress_seconds: float = 5.0, log=sys.stderr):
+        if workers and vocab_path is None:
+            raise ValueError("Tokenizer workers need the vocab path")
+        self.predictor = predictor
+        self.vocab_path = vocab_path
+        self.workers = max(0, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.max_pending = max_pending or max(2, 2 * self.workers)
+        self.manager = manager
+        self.progress_seconds = progress_seconds
+        self.log = log
+
+    def _chunks(self, records: Iterator[Record]):
+        """(next record index, records skipped, records with text) per chunk"""
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                return
+            valid = [record for record in chunk if record.text is not None]
+            yield chunk[-1].index + 1, len(chunk) - len(valid), valid
+
+    def _encoded(self, chunks, pool):
+        """Chunks with their padded ids and lengths added, in input order"""
+        if pool is None:
+            for done, skipped, records in chunks:
+                batch, lengths = self.predictor.encoder.encode_batch([r.text for r in records]) \
+                    if records else (None, None)
+                yield done, skipped, records, batch, lengths
+            return
+        pending = deque()
+        for done, skipped, records in chunks:
+            future = pool.submit(_encode_chunk, [r.text for r in records]) if records else None
+            pending.append((done, skipped, records, future))
+            if len(pending) >= self.max_pending:
+                yield self._resolve(pending.popleft())
+        while pending:
+            yield self._resolve(pending.popleft())
+
+    @staticmethod
+    def _resolve(item):
+        done, skipped, records, future = item
+        batch, lengths = future.result() if future is not None else (None, None)
+        return done, skipped, records, batch, lengths
+
+    def _score(self, records: List[Record], batch: np.ndarray, lengths: np.ndarray,
+               run_id: uuid.UUID) -> List[Dict[str, Any]]:
+        start_time = time.perf_counter()
+        output = self.predictor.forward(torch.from_numpy(batch).to(self.predictor.device),
+                                        torch.from_numpy(lengths)).float().cpu()
+        predictions = torch.argmax(output, dim=1).tolist()
+        probabilities = torch.softmax(output, dim=1)
+        confidences = probabilities.max(dim=1).values.tolist()
+        scores = (output[:, 1] - output[:, 0]).tolist()
+        processing_time = (time.perf_counter() - start_time) / len(records)
+        return [
+            {
+                'index': record.index,
+                'id': record.key,
+                'text': record.text,
+                'prediction': 'Positive' if prediction == 1 else 'Negative',
+                'confidence': confidence,
+                'sentiment_score': score,
+                'request_id': str(uuid.uuid5(run_id, str(record.index))),
+                'processing_time': processing_time,
+                'model_version': self.predictor.version,
+                'success': True
+            }
+            for record, prediction, confidence, score
+            in zip(records, predictions, confidences, scores)
+        ]
+
+    def _insert(self, results: List[Dict[str, Any]], deduplicate: bool):
+        if deduplicate:
+            from app.models import SentimentPrediction
+            session = self.manager.get_session()
+            try:
+                existing = {row[0] for row in session.query(SentimentPrediction.request_id)
+                            .filter(SentimentPrediction.request_id.in_(
+                                [r['request_id'] for r in results]))}
+            finally:
+                session.close()
+            results = [r for r in results if r['request_id'] not in existing]
+        self.manager.bulk_save_predictions(results)
+
+    @staticmethod
+    def _format_rows(results, fmt: str) -> bytes:
+        if fmt == 'ndjson':
+            return ''.join(json.dumps({column: r[column] for column in OUTPUT_COLUMNS}) + '\n'
+                           for r in results).encode('utf-8')
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for r in results:
+            writer.writerow([r[column] for column in OUTPUT_COLUMNS])
+        return buffer.getvalue().encode('utf-8')
+
+    @staticmethod
+    def _check_resumable(checkpoint: Checkpoint, state: Dict[str, Any],
+                         output: Optional[str], fmt: Optional[str]):
+        """Refuse to resume into an output other than the one the checkpoint describes"""
+        problem = None
+        if state.get('output') != output:
+            problem = f"was writing to {state.get('output') or 'no output file'}"
+        elif state.get('output_format') != fmt:
+            problem = f"was writing {state.get('output_format')} output"
+        elif output is not None and (not os.path.exists(output)
+                                     or os.path.getsize(output) < (state['output_bytes'] or 0)):
+            problem = f"expects {output} to hold at least {state['output_bytes']} bytes"
+        if problem is not None:
+            raise ValueError(f"Can't resume: the run in {checkpoint.path} {problem}. "
+                             f"Rerun with the same options, or start over (--restart)")
+
+    def _open_output(self, path: str, fmt: str, resume_at: Optional[int]):
+        if resume_at is not None:
+            output = open(path, 'r+b')
+            output.truncate(resume_at)
+            output.seek(resume_at)
+            return output
+        output = open(path, 'wb')
+        if fmt == 'csv':
+            output.write((','.join(OUTPUT_COLUMNS) + '\r\n').encode('utf-8'))
+        return output
+
+    def _report(self, stats, scored_before, reader, started, final=False):
+        elapsed = time.perf_counter() - started
+        rate = (stats['scored'] - scored_before) / elapsed if elapsed > 0 else 0.0
+        fraction = reader.position() / reader.size if reader.size else 1.0
+        print(f"{'Finished' if final else 'Progress'}: {stats['scored']} scored, "
+              f"{stats['skipped']} skipped, {rate:.0f} records/s, "
+              f"{fraction:.1%} of input read", file=self.log, flush=True)
+
+    def score_file(self, input_path: str, output_path: str = None, to_database: bool = False,
+                   input_format: str = None, output_format: str = None,
+                   text_field: str = 'text', id_field: str = None,
+                   checkpoint_path: str = None) -> Dict[str, Any]:
+        """Score every record of ``input_path``; returns a summary of the run"""
+        if output_path is None and not to_database:
+            raise ValueError("Give an output file, the database, or both")
+        if to_database and self.manager is None:
+            raise ValueError("Database output needs a DatabaseManager")
+        input_format = input_format or detect_format(input_path)
+        output_format = output_format or (detect_format(output_path, OUTPUT_FORMATS)
+                                          if output_path else None)
+        checkpoint = Checkpoint(checkpoint_path or (output_path or input_path) + '.checkpoint')
+        output_target = os.path.abspath(output_path) if output_path else None
+
+        state = checkpoint.load()
+        resumed = state is not None and state.get('input') == os.path.abspath(input_path)
+        if resumed:
+            self._check_resumable(checkpoint, state, output_target, output_format)
+        else:
+            state = {'input': os.path.abspath(input_path), 'run_id': str(uuid.uuid4()),
+                     'output': output_target, 'output_format': output_format,
+                     'records': 0, 'output_bytes': None, 'scored': 0, 'skipped': 0}
+        run_id = uuid.UUID(state['run_id'])
+        stats = {'scored': state['scored'], 'skipped': state['skipped']}
+        scored_before = state['scored']
+
+        pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self.vocab_path,)) if self.workers else None
+        output = self._open_output(output_path, output_format,
+                                   state['output_bytes'] if resumed else None) \
+            if output_path else None
+        started = time.perf_counter()
+        last_report = started
+        deduplicate = resumed
+        try:
+            with open(input_path, 'rb') as raw:
+                reader = _PositionReader(raw)
+                records = islice(read_records(reader, input_format, text_field, id_field),
+                                 state['records'], None)
+                for done, skipped, chunk, batch, lengths in self._encoded(
+                        self._chunks(records), pool):
+                    stats['skipped'] += skipped
+                    if chunk:
+                        results = self._score(chunk, batch, lengths, run_id)
+                        if output is not None:
+                            output.write(self._format_rows(results, output_format))
+                            output.flush()
+                            os.fsync(output.fileno())
+                        if to_database:
+                            self._insert(results, deduplicate)
+                            deduplicate = False
+                        stats['scored'] += len(results)
+                    state.update(stats, records=done,
+                                 output_bytes=output.tell() if output is not None else None)
+                    checkpoint.save(state)
+                    now = time.perf_counter()
+                    if now - last_report >= self.progress_seconds:
+                        self._report(stats, scored_before, reader, started)
+                        last_report = now
+                self._report(stats, scored_before, reader, started, final=True)
+        finally:
+            if output is not None:
+                output.close()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        checkpoint.clear()
+
+        elapsed = time.perf_counter() - started
+        return {
+            'records': state['records'],
+            'scored': stats['scored'],
+            'skipped': stats['skipped'],
+            'resumed': resumed,
+            'seconds': elapsed,
+            'records_per_second': (stats['scored'] - scored_before) / elapsed if elapsed > 0 else 0.0
+        }
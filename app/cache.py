@@ -0,0 +1,106 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.monitoring import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_ENTRIES
+from config.settings import Config
+
+
+def file_fingerprint(*paths: str) -> str:
+    """Hash the given files' paths, sizes and modification times into a short hex digest.
+
+    Replacing a file changes its fingerprint, yet building one costs a
+    stat() per file instead of reading the model weights in full.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}\x00{stat.st_size}\x00{stat.st_mtime_ns}\x00"
+                      .encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """Bounded LRU cache of prediction outcomes with per-entry TTL.
+
+    Keys are a hash of the normalized text plus the fingerprint of the
+    model and vocab that produced the value, so results from one model are
+    never served for another. Versions served side by side share the cache,
+    and entries of a version no longer served age out through the LRU and
+    TTL.
+    Values are ``(prediction, confidence, sentiment_score)`` tuples.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 0,
+                 ttl_seconds: float = 3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(normalized_text: str, fingerprint: str) -> str:
+        data = f"{fingerprint}\x00{normalized_text}".encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+
+    def clear(self):
+        with self._lock:
+            self._clear('invalidated')
+
+    def get(self, key: str) -> Optional[Tuple[str, float, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                CACHE_MISSES.inc()
+                return None
+            value, expires_at, size = entry
+            if self.ttl and expires_at <= self.clock():
+                self._remove(key, 'expired')
+                CACHE_MISSES.inc()
+                return None
+            self._entries.move_to_end(key)
+            CACHE_HITS.inc()
+            return value
+
+    def put(self, key: str, value: Tuple[str, float, float]):
+        size = sys.getsizeof(key) + sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, None)
+            self._entries[key] = (value, self.clock() + self.ttl, size)
+            self._bytes += size
+            while self._entries and (
+                (self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)), 'lru')
+            CACHE_ENTRIES.set(len(self._entries))
+
+    def _remove(self, key, reason):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        if reason:
+            CACHE_EVICTIONS.labels(reason=reason).inc()
+        CACHE_ENTRIES.set(len(self._entries))
+
+    def _clear(self, reason):
+        if self._entries:
+            CACHE_EVICTIONS.labels(reason=reason).inc(len(self._entries))
+        self._entries.clear()
+        self._bytes = 0
+        CACHE_ENTRIES.set(0)
+
+
+# Global prediction cache shared by every predictor in the process
+prediction_cache = PredictionCache(max_entries=Config.CACHE_MAX_ENTRIES,
+                                   max_bytes=Config.CACHE_MAX_BYTES,
+                                   ttl_seconds=Config.CACHE_TTL_SECONDS)
@@ -1,21 +1,441 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models import Base
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import MetaData, create_engine, delete, event, func, insert, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app.archive import (archive_name, find_archived, iter_archived_rows, merge_rows,
+                         next_period, period_start, write_archive)
+from app.export import iter_prediction_rows
+from app.models import (Base, PredictionArchive, PredictionText, SentimentPrediction,
+                        PredictionRollup, store_texts, text_hash)
+from app.rollups import apply_rollups, rebuild_rollups
 from config.settings import Config
 
+logger = logging.getLogger(__name__)
+
+def _in_memory(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(url) -> dict:
+    """Pool settings for an engine; in-memory SQLite keeps its single-connection pool"""
+    if _in_memory(url):
+        return {}
+    return {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_timeout': Config.DB_POOL_TIMEOUT,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+        'pool_pre_ping': Config.DB_POOL_PRE_PING
+    }
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMAs run on every new SQLite connection.
+
+    WAL lets readers keep reading the last committed state while a writer
+    appends to the log, so the dbapp's queries no longer block the
+    webapp's inserts and vice versa. WAL is a property of the database
+    file, set by the read-write engine. synchronous=NORMAL is safe with WAL
+    (a power loss can lose the last transactions, never corrupt the file).
+    The busy timeout makes a connection wait for the remaining writer-writer
+    lock instead of failing with "database is locked".
+    """
+    pragmas = [
+        f'busy_timeout = {Config.SQLITE_BUSY_TIMEOUT_MS}',
+        f'cache_size = -{Config.SQLITE_CACHE_SIZE_KB}',
+        f'synchronous = {Config.SQLITE_SYNCHRONOUS}',
+        'temp_store = MEMORY'
+    ]
+    if read_only:
+        pragmas.append('query_only = ON')
+    else:
+        pragmas.insert(0, f'journal_mode = {Config.SQLITE_JOURNAL_MODE}')
+    return pragmas
+
+def create_tuned_engine(uri: str, read_only: bool = False):
+    url = make_url(uri)
+    engine = create_engine(url, **engine_options(url))
+    if url.get_backend_name() == 'sqlite':
+        pragmas = sqlite_pragmas(read_only)
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(f'PRAGMA {pragma}')
+            finally:
+                cursor.close()
+    return engine
+
 class DatabaseManager:
-    def __init__(self):
-        self.engine = create_engine(Config.DATABASE_URI)
+    """Read-write and read-only engines and their sessions.
+
+    Writes (``get_session``, ``bulk_save_predictions``) go through
+    ``engine``; reads through ``read_engine``, which points at
+    DATABASE_READ_URL when set (e.g. a replica) and otherwise at the same
+    database with writes refused (SQLite ``query_only``). The pools are
+    separate, so a burst of reads can't starve the write-behind queue of
+    connections. Request handlers use ``request_session()``, one read
+    session per thread that ``remove_request_session()`` closes when the
+    request ends.
+    
+    Predictions are partitioned by time. sentiment_predictions holds the
+    live partition; ``archive_partitions()`` moves each day or month past
+    the retention to a compressed file in ``archive_dir``, catalogued in
+    prediction_archives. ``iter_prediction_rows()`` and
+    ``find_prediction()`` route reads to the partitions that can hold the
+    rows asked for.
+    """
+    
+    def __init__(self, database_uri: str = None, read_uri: str = None, archive_dir: str = None):
+        if database_uri is None:
+            database_uri, read_uri = Config.DATABASE_URI, read_uri or Config.DATABASE_READ_URI
+        read_uri = read_uri or database_uri
+        self.engine = create_tuned_engine(database_uri)
+        if read_uri == database_uri and _in_memory(make_url(database_uri)):
+            # A second engine would open a second, empty in-memory database
+            self.read_engine = self.engine
+        else:
+            self.read_engine = create_tuned_engine(read_uri, read_only=True)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False,
+                                             bind=self.read_engine)
+        self.scoped_read_session = scoped_session(self.ReadSessionLocal)
+        self.archive_dir = archive_dir or Config.ARCHIVE_DIR
     
     def init_db(self):
         Base.metadata.create_all(bind=self.engine)
+        self._migrate_inline_texts()
+        # create_all skips tables that already exist, so add any indexes
+        # introduced since an existing database was created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=self.engine, checkfirst=True)
+        self._add_missing_columns()
+        self._add_autoincrement()
+        # Backfill rollups for databases created before they existed
+        session = self.get_session()
+        try:
+            if session.query(PredictionRollup.id).first() is None \
+                    and session.query(SentimentPrediction.id).first() is not None:
+                rebuild_rollups(session)
+                session.commit()
+        finally:
+            session.close()
+    
+    def _migrate_inline_texts(self, batch_size: int = 10000):
+        """Move a database from inline texts to the shared prediction_texts table.
+
+        Databases created before texts were deduplicated keep the full text
+        and a string request_id on every prediction row. Their rows are
+        copied, in id order and batch by batch, into a new table with the
+        compact layout, keeping ids and timestamps. The texts go into
+        prediction_texts, once each. The old table is then dropped and the
+        new one renamed into its place, and SQLite files are vacuumed to
+        give the space back.
+        
+        pysqlite commits before DDL on its own, so on SQLite the whole copy
+        runs under an explicit BEGIN: an interrupted migration leaves the
+        legacy table as it was and the next start simply runs it again. A
+        staging table left behind by one (on any backend) is dropped first.
+        """
+        table = SentimentPrediction.__table__
+        legacy_columns = {column['name'] for column in inspect(self.engine).get_columns(table.name)}
+        if 'text' not in legacy_columns:
+            return
+        staging_name = f'{table.name}_compact'
+        metadata = MetaData()
+        PredictionText.__table__.to_metadata(metadata)
+        staging = table.to_metadata(metadata, name=staging_name)
+        legacy = MetaData()
+        legacy.reflect(bind=self.engine, only=[table.name])
+        source = legacy.tables[table.name]
+        copied = [name for name in ('id', 'prediction', 'confidence', 'sentiment_score',
+                                    'timestamp', 'processing_time', 'model_version')
+                  if name in legacy_columns]
+        
+        with self.engine.begin() as conn:
+            if self.engine.dialect.name == 'sqlite':
+                conn.exec_driver_sql('BEGIN')
+            conn.execute(text(f'DROP TABLE IF EXISTS {staging_name}'))
+            # Index names are global; the new table takes them over
+            for index in table.indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+            staging.create(conn)
+            last_id = 0
+            while True:
+                rows = conn.execute(
+                    select(*[source.c[name] for name in copied], source.c.text, source.c.request_id)
+                    .where(source.c.id > last_id).order_by(source.c.id).limit(batch_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                texts = {}
+                moved = []
+                for row in rows:
+                    key = text_hash(row['text'])
+                    texts[key] = row['text']
+                    moved.append(dict({name: row[name] for name in copied},
+                                      text_hash=key, request_id=row['request_id']))
+                store_texts(conn, texts)
+                conn.execute(staging.insert(), moved)
+                last_id = rows[-1]['id']
+            conn.execute(text(f'DROP TABLE {table.name}'))
+            conn.execute(text(f'ALTER TABLE {staging_name} RENAME TO {table.name}'))
+        
+        if self.engine.dialect.name == 'sqlite' and not _in_memory(self.engine.url):
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text('VACUUM'))
+    
+    def _add_autoincrement(self):
+        """Keep SQLite from reusing the ids of archived predictions.
+
+        Without AUTOINCREMENT SQLite numbers a new row max(rowid) + 1, so
+        once archive_partitions() has deleted the newest rows their ids are
+        handed out again, and find_prediction() or the next archive's name
+        can point at the wrong row. A table created before the declaration
+        is rebuilt with it, under an explicit BEGIN as in
+        _migrate_inline_texts(). The id counter is then moved past the last
+        archived id, which a rebuilt table cannot know about.
+        """
+        if self.engine.dialect.name != 'sqlite':
+            return
+        table = SentimentPrediction.__table__
+        staging_name = f'{table.name}_autoincrement'
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql('BEGIN')
+            schema = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': table.name}
+            ).scalar()
+            if 'AUTOINCREMENT' not in schema.upper():
+                metadata = MetaData()
+                PredictionText.__table__.to_metadata(metadata)
+                staging = table.to_metadata(metadata, name=staging_name)
+                conn.execute(text(f'DROP TABLE IF EXISTS {staging_name}'))
+                # Index names are global; the new table takes them over
+                for index in table.indexes:
+                    conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+                staging.create(conn)
+                columns = ', '.join(column.name for column in table.columns)
+                conn.execute(text(f'INSERT INTO {staging_name} ({columns}) '
+                                  f'SELECT {columns} FROM {table.name}'))
+                conn.execute(text(f'DROP TABLE {table.name}'))
+                conn.execute(text(f'ALTER TABLE {staging_name} RENAME TO {table.name}'))
+            
+            last_archived = conn.execute(select(func.max(PredictionArchive.last_id))).scalar()
+            if last_archived is None:
+                return
+            sequence = conn.execute(text('SELECT seq FROM sqlite_sequence WHERE name = :name'),
+                                    {'name': table.name}).scalar()
+            if sequence is None:
+                conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                             {'name': table.name, 'seq': last_archived})
+            elif sequence < last_archived:
+                conn.execute(text('UPDATE sqlite_sequence SET seq = :seq WHERE name = :name'),
+                             {'name': table.name, 'seq': last_archived})
+    
+    def _add_missing_columns(self):
+        """Add nullable columns introduced since an existing database was created"""
+        inspector = inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                with self.engine.begin() as conn:
+                    conn.execute(text(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                    ))
     
     def get_session(self):
         return self.SessionLocal()
     
+    def get_read_session(self):
+        return self.ReadSessionLocal()
+    
+    def request_session(self):
+        """The current request's read session, created on first use"""
+        return self.scoped_read_session()
+    
+    def remove_request_session(self):
+        self.scoped_read_session.remove()
+    
     def close_session(self, session):
         session.close()
+    
+    def bulk_save_predictions(self, results, timestamp: datetime = None):
+        """Insert all successful prediction results with one bulk INSERT.
+        
+        Each row is stamped with its result's ``timestamp`` if it has one,
+        else with ``timestamp``, by default the current time.
+        """
+        timestamp = timestamp or datetime.utcnow()
+        rows = [
+            {
+                'text': result['text'],
+                'prediction': result['prediction'],
+                'confidence': result['confidence'],
+                'sentiment_score': result['sentiment_score'],
+                'request_id': result['request_id'],
+                'processing_time': result['processing_time'],
+                'model_version': result.get('model_version'),
+                'timestamp': result.get('timestamp') or timestamp
+            }
+            for result in results if result.get('success', False)
+        ]
+        if not rows:
+            return 0
+        
+        session = self.get_session()
+        try:
+            session.execute(insert(SentimentPrediction), rows)
+            # Keep the stats rollups in step with the rows, in one transaction
+            apply_rollups(session, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return len(rows)
+    
+    def archive_path(self, archive: PredictionArchive) -> str:
+        return os.path.join(self.archive_dir, archive.path)
+    
+    def archives_for(self, session, since: datetime = None,
+                     until: datetime = None) -> List[PredictionArchive]:
+        """Archived partitions overlapping [since, until), oldest first"""
+        query = session.query(PredictionArchive)
+        if since is not None:
+            query = query.filter(PredictionArchive.period_end > since)
+        if until is not None:
+            query = query.filter(PredictionArchive.period_start < until)
+        return query.order_by(PredictionArchive.period_start, PredictionArchive.first_id).all()
+    
+    def iter_prediction_rows(self, session, since: datetime = None, until: datetime = None,
+                             sentiment: str = None, truncate: bool = False) -> Iterator[Tuple]:
+        """Export rows in (timestamp, id) order across archived and live partitions.
+
+        Only the archive files whose period overlaps the range are opened,
+        one period at a time. The live rows are merged in rather than
+        appended: a prediction that arrived late for an archived period
+        stays live until the next archive run folds it into that period.
+        """
+        def archived():
+            for _, archives in groupby(self.archives_for(session, since, until),
+                                       key=lambda archive: archive.period_start):
+                yield from merge_rows(*[
+                    iter_archived_rows(self.archive_path(archive), since, until,
+                                       sentiment, truncate)
+                    for archive in archives
+                ])
+        
+        yield from merge_rows(archived(), iter_prediction_rows(
+            session, since=since, until=until, sentiment=sentiment, truncate=truncate))
+    
+    def find_prediction(self, session, prediction_id: int) -> Optional[Dict[str, Any]]:
+        """A prediction's ``to_dict()``, from the live table or its archive"""
+        prediction = session.query(SentimentPrediction)\
+            .filter(SentimentPrediction.id == prediction_id)\
+            .first()
+        if prediction is not None:
+            return prediction.to_dict()
+        archives = session.query(PredictionArchive)\
+            .filter(PredictionArchive.first_id <= prediction_id)\
+            .filter(PredictionArchive.last_id >= prediction_id)\
+            .all()
+        for archive in archives:
+            record = find_archived(self.archive_path(archive), prediction_id)
+            if record is not None:
+                return record
+        return None
+    
+    def archive_partitions(self, retention_days: float = None, period: str = None,
+                           now: datetime = None, vacuum: bool = False) -> List[Dict[str, Any]]:
+        """Move every whole partition older than the retention to an archive file.
+
+        Partitions are archived oldest first. Each is streamed to its file,
+        which is complete once it exists. Its rows are then deleted and its
+        catalog entry added in one transaction, so an interruption leaves
+        each partition either live or archived. Rows that arrived late for
+        a period already archived are merged with its file into a new one
+        that replaces it, keeping one file per period in (timestamp, id)
+        order. Texts no other live row uses are dropped afterwards. Rollups
+        are left alone, so /stats still counts archived predictions.
+        ``vacuum`` compacts a SQLite file once the space is free. Returns
+        the catalog entries written.
+        """
+        if retention_days is None:
+            retention_days = Config.PREDICTION_RETENTION_DAYS
+        period = period or Config.PARTITION_PERIOD
+        cutoff = period_start((now or datetime.utcnow()) - timedelta(days=retention_days), period)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        table = SentimentPrediction.__table__
+        archived = []
+        while True:
+            session = self.get_session()
+            try:
+                oldest = session.query(func.min(SentimentPrediction.timestamp)).scalar()
+                if oldest is None or oldest >= cutoff:
+                    break
+                start = period_start(oldest, period)
+                end = next_period(start, period)
+                first_id, last_id = session.query(func.min(SentimentPrediction.id),
+                                                  func.max(SentimentPrediction.id))\
+                    .filter(SentimentPrediction.timestamp >= start)\
+                    .filter(SentimentPrediction.timestamp < end)\
+                    .one()
+                previous = session.query(PredictionArchive)\
+                    .filter(PredictionArchive.period_start == start)\
+                    .filter(PredictionArchive.period_end == end)\
+                    .all()
+                first_id = min([first_id] + [archive.first_id for archive in previous])
+                name = archive_name(start, period, first_id, last_id)
+                path = os.path.join(self.archive_dir, name)
+                rows = merge_rows(iter_prediction_rows(session, since=start, until=end),
+                                  *[iter_archived_rows(self.archive_path(archive))
+                                    for archive in previous])
+                summary = write_archive(path, rows, Config.ARCHIVE_COMPRESSION_LEVEL)
+                replaced = [(archive.id, self.archive_path(archive)) for archive in previous]
+            finally:
+                session.close()
+            
+            entry = dict(summary, period_start=start, period_end=end, path=name,
+                         size_bytes=os.path.getsize(path), created_at=datetime.utcnow())
+            catalog = PredictionArchive.__table__
+            with self.engine.begin() as conn:
+                conn.execute(
+                    delete(table)
+                    .where(table.c.timestamp >= start)
+                    .where(table.c.timestamp < end)
+                    .where(table.c.id <= summary['last_id'])
+                )
+                if replaced:
+                    conn.execute(delete(catalog).where(
+                        catalog.c.id.in_([archive_id for archive_id, _ in replaced])))
+                conn.execute(insert(catalog).values(**entry))
+            # The new file holds their rows now
+            for _, old_path in replaced:
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+            logger.info("Archived %d predictions from %s to %s%s", summary['row_count'],
+                        f'{start:%Y-%m-%d}', path,
+                        f" (merged with {len(replaced)} earlier archive(s))" if replaced else '')
+            archived.append(entry)
+        
+        if archived:
+            texts = PredictionText.__table__
+            with self.engine.begin() as conn:
+                conn.execute(delete(texts).where(texts.c.hash.not_in(select(table.c.text_hash))))
+            if vacuum and self.engine.dialect.name == 'sqlite' and not _in_memory(self.engine.url):
+                with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.execute(text('VACUUM'))
+        return archived
 
 # Global database manager
 db_manager = DatabaseManager()
\ No newline at end of file
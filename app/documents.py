@@ -0,0 +1,199 @@
+import codecs
+import re
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Union
+import numpy as np
+import torch
+from app.inference import MAX_SEQ_LEN, EOS_ID, PAD_ID, PADDED_LENGTH
+from app.tokenization import basic_english_tokenize
+
+AGGREGATIONS = ('mean', 'max', 'weighted')
+
+# Last whitespace character in a string
+_LAST_SPACE = re.compile(r'\s\S*\Z')
+
+# Text without any whitespace is tokenized anyway once this much is pending
+_MAX_PENDING_CHARS = 1 << 20
+
+
+class DocumentTooLong(ValueError):
+    pass
+
+
+def _safe_cut(text: str) -> int:
+    """Length of the prefix that tokenizes the same on its own as in context.
+
+    Tokens never span whitespace, except for the "<br />" marker, so the
+    text is cut at its last whitespace unless that whitespace could be the
+    one inside a "<br />", in which case the cut moves back before it.
+    """
+    match = _LAST_SPACE.search(text)
+    if match is None:
+        return 0
+    cut = match.start()
+    if text[max(0, cut - 3):cut].lower() == '<br':
+        return _safe_cut(text[:cut - 3])
+    return cut
+
+
+def stream_tokens(chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8',
+                  preview: List[str] = None, preview_chars: int = 0) -> Iterator[str]:
+    """Tokenize a document arriving in pieces, like basic_english_tokenize on the whole.
+
+    Chunks may be str or bytes (decoded incrementally, so multi-byte
+    characters can straddle chunk boundaries). Only the text after the last
+    whitespace is held back between chunks. The first ``preview_chars``
+    characters are collected into the ``preview`` list if one is given.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    seen = 0
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if preview is not None and seen < preview_chars:
+            preview.append(chunk[:preview_chars - seen])
+        seen += len(chunk)
+        pending += chunk
+        cut = len(pending) if len(pending) > _MAX_PENDING_CHARS else _safe_cut(pending)
+        if cut:
+            yield from basic_english_tokenize(pending[:cut])
+            pending = pending[cut:]
+    pending += decoder.decode(b'', final=True)
+    yield from basic_english_tokenize(pending)
+
+
+class _Aggregate:
+    """Running totals for every aggregation mode over scored windows"""
+
+    def __init__(self):
+        self.logit_sum = None
+        self.weighted_sum = None
+        self.total_length = 0
+        self.count = 0
+        self.best_confidence = -1.0
+        self.best_logits = None
+
+    def add(self, logits: torch.Tensor, lengths: torch.Tensor):
+        weights = lengths.to(logits.dtype).unsqueeze(1)
+        logit_sum = logits.sum(dim=0)
+        weighted_sum = (logits * weights).sum(dim=0)
+        self.logit_sum = logit_sum if self.logit_sum is None else self.logit_sum + logit_sum
+        self.weighted_sum = weighted_sum if self.weighted_sum is None \
+            else self.weighted_sum + weighted_sum
+        self.total_length += int(lengths.sum())
+        self.count += len(logits)
+
+        confidence, _ = torch.softmax(logits, dim=1).max(dim=1)
+        best = int(torch.argmax(confidence))
+        if confidence[best].item() > self.best_confidence:
+            self.best_confidence = confidence[best].item()
+            self.best_logits = logits[best]
+
+    def logits(self, aggregation: str) -> torch.Tensor:
+        if aggregation == 'max':
+            return self.best_logits
+        if aggregation == 'weighted':
+            return self.weighted_sum / self.total_length
+        return self.logit_sum / self.count
+
+
+class DocumentScorer:
+    """Score documents longer than one model window.
+
+    The token stream is cut into ``window``-token windows that overlap by
+    ``window - stride`` tokens, so every token is scored with some context
+    on both sides. Windows are laid out like ordinary inputs (ids, <eos>,
+    <pad> to 257) and run through the model up to ``max_batch`` at a time,
+    which is a single forward pass for documents up to
+    ``window + (max_batch - 1) * stride`` tokens. The window logits are
+    folded into running totals as each batch finishes, so memory stays
+    bounded however long the document is. They are combined by:
+
+    * ``mean``: average of the window logits
+    * ``max``: the logits of the single most confident window
+    * ``weighted``: average of the window logits weighted by window length
+    """
+
+    def __init__(self, predictor, window: int = MAX_SEQ_LEN, stride: int = 192,
+                 max_batch: int = 64, max_tokens: int = 2_000_000, preview_chars: int = 200):
+        if not 0 < stride <= window:
+            raise ValueError("stride must be between 1 and the window size")
+        self.predictor = predictor
+        self.window = window
+        self.stride = stride
+        self.max_batch = max(1, max_batch)
+        self.max_tokens = max_tokens
+        self.preview_chars = preview_chars
+
+    def windows(self, ids: Iterable[int]) -> Iterator[List[int]]:
+        """Overlapping windows of ids; the last one may be shorter"""
+        current = []
+        fresh = 0
+        emitted = False
+        for token_id in ids:
+            current.append(token_id)
+            fresh += 1
+            if len(current) == self.window:
+                yield current
+                emitted = True
+                current = current[self.stride:]
+                fresh = 0
+        if fresh or not emitted:
+            yield current
+
+    def _forward(self, batch: List[List[int]], aggregate: _Aggregate):
+        rows = np.full((len(batch), PADDED_LENGTH), PAD_ID, dtype=np.int64)
+        lengths = np.empty(len(batch), dtype=np.int64)
+        for row, ids in enumerate(batch):
+            rows[row, :len(ids)] = ids
+            rows[row, len(ids)] = EOS_ID
+            lengths[row] = len(ids) + 1
+        lengths = torch.from_numpy(lengths)
+        output = self.predictor.forward(torch.from_numpy(rows).to(self.predictor.device), lengths)
+        aggregate.add(output.float().cpu(), lengths)
+
+    def score(self, chunks: Iterable[Union[str, bytes]],
+              aggregation: str = 'mean') -> Dict[str, Any]:
+        """Score a document given as an iterable of str or bytes pieces"""
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {aggregation}. "
+                             f"Choose one of {', '.join(AGGREGATIONS)}")
+        start_time = time.perf_counter()
+        preview = []
+        tokens = stream_tokens(chunks, preview=preview, preview_chars=self.preview_chars)
+        token_count = 0
+
+        def ids():
+            nonlocal token_count
+            for token_count, token_id in enumerate(self.predictor.encoder.table.lookup(tokens), 1):
+                if token_count > self.max_tokens:
+                    raise DocumentTooLong(f"Documents are limited to {self.max_tokens} tokens")
+                yield token_id
+
+        aggregate = _Aggregate()
+        batch = []
+        for window in self.windows(ids()):
+            batch.append(window)
+            if len(batch) >= self.max_batch:
+                self._forward(batch, aggregate)
+                batch = []
+        if batch:
+            self._forward(batch, aggregate)
+
+        logits = aggregate.logits(aggregation)
+        probabilities = torch.softmax(logits, dim=0)
+        prediction = int(torch.argmax(logits))
+        result = self.predictor.build_result(
+            ''.join(preview),
+            "Positive" if prediction == 1 else "Negative",
+            probabilities[prediction].item(),
+            (logits[1] - logits[0]).item(),
+            time.perf_counter() - start_time
+        )
+        result['document'] = {
+            'aggregation': aggregation,
+            'windows': aggregate.count,
+            'tokens': token_count
+        }
+        return result
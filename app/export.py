@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Tuple
+from sqlalchemy import select
+from app.models import SentimentPrediction
+
+EXPORT_COLUMNS = ('id', 'text', 'prediction', 'confidence', 'sentiment_score',
+                  'timestamp', 'request_id', 'processing_time', 'model_version')
+
+# Rows fetched from the database cursor per round trip (and per columnar batch)
+EXPORT_BATCH_SIZE = 1000
+
+
+def truncate_text(text: str) -> str:
+    """Shorten text the same way SentimentPrediction.to_dict() does"""
+    return text[:100] + '...' if len(text) > 100 else text
+
+
+def iter_prediction_rows(session, since: datetime = None, until: datetime = None,
+                         sentiment: str = None, truncate: bool = False,
+                         batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple]:
+    """Stream prediction rows as plain tuples in (timestamp, id) order.
+
+    Rows come straight off a streaming cursor without building ORM objects,
+    so memory use does not grow with the number of rows exported.
+    """
+    columns = [getattr(SentimentPrediction, name) for name in EXPORT_COLUMNS]
+    query = select(*columns).order_by(SentimentPrediction.timestamp, SentimentPrediction.id)
+    if since is not None:
+        query = query.where(SentimentPrediction.timestamp >= since)
+    if until is not None:
+        query = query.where(SentimentPrediction.timestamp < until)
+    if sentiment:
+        query = query.where(SentimentPrediction.prediction == sentiment)
+
+    result = session.execute(
+        query.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in result:
+        if truncate:
+            row = (row[0], truncate_text(row[1])) + tuple(row[2:])
+        yield tuple(row)
+
+
+def write_ndjson(rows: Iterator[Tuple]) -> Iterator[str]:
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['timestamp'] = record['timestamp'].isoformat() if record['timestamp'] else None
+        yield json.dumps(record) + '\n'
+
+
+def write_csv(rows: Iterator[Tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        # Flush the line buffer every so often instead of per row
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def columnar_available() -> bool:
+    """Columnar formats need the optional pyarrow dependency"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever has been written"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _record_batches(rows: Iterator[Tuple], batch_size: int = EXPORT_BATCH_SIZE):
+    """Group rows into Arrow record batches; yields (schema, batch or None)"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('text', pa.string()),
+        ('prediction', pa.string()),
+        ('confidence', pa.float64()),
+        ('sentiment_score', pa.float64()),
+        ('timestamp', pa.timestamp('us')),
+        ('request_id', pa.string()),
+        ('processing_time', pa.float64()),
+        ('model_version', pa.string()),
+    ])
+
+    def to_batch(batch_rows):
+        columns = zip(*batch_rows)
+        return pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    # Always yield at least once so writers can emit a header for empty exports
+    yield schema, None
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield schema, to_batch(batch)
+            batch = []
+    if batch:
+        yield schema, to_batch(batch)
+
+
+def write_arrow(rows: Iterator[Tuple]) -> Iterator[bytes]:
+    """Arrow IPC stream: one record batch per EXPORT_BATCH_SIZE rows"""
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    writer = None
+    for schema, batch in _record_batches(rows):
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, schema)
+        if batch is not None:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def write_parquet(rows: Iterator[Tuple]) -> Iterator[bytes]:
+    """Parquet file written one row group per EXPORT_BATCH_SIZE rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for schema, batch in _record_batches(rows):
+        if writer is None:
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        if batch is not None:
+            writer.write_table(pa.Table.from_batches([batch]))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+# format -> (writer, mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': (write_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (write_csv, 'text/csv', 'csv'),
+    'arrow': (write_arrow, 'application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': (write_parquet, 'application/vnd.apache.parquet', 'parquet'),
+}
+
+COLUMNAR_FORMATS = ('arrow', 'parquet')
@@ -0,0 +1,142 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+import torch
+from app.inference import advance_hidden, close_hidden, supports_packed
+from app.monitoring import STREAM_SESSIONS, STREAM_SESSION_EVICTIONS
+from app.tokenization import basic_english_tokenize
+
+
+class SessionState(NamedTuple):
+    hidden: torch.Tensor
+    tokens: int
+    messages: int
+    fingerprint: str
+
+
+class SessionStore:
+    """Bounded LRU store of per-stream GRU states with an idle TTL.
+
+    A state is one ``hidden_size`` float vector (1 KiB for SentiNN) plus
+    counters, so the default 10000 sessions take about 10 MB. States are
+    tagged with the fingerprint of the model that produced them and are
+    dropped rather than reused when the model changes.
+
+    Updates to one session must not interleave, so callers hold
+    ``lock_for(session_id)`` across get -> compute -> put. Locks are
+    striped over a fixed set, so the store itself is not locked while the
+    GRU runs.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 1800,
+                 lock_stripes: int = 64, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(max(1, lock_stripes))]
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def lock_for(self, session_id: str) -> threading.Lock:
+        return self._stripes[zlib.crc32(session_id.encode('utf-8')) % len(self._stripes)]
+
+    def get(self, session_id: str, fingerprint: str) -> Optional[SessionState]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            state, expires_at = entry
+            if self.ttl and expires_at <= self.clock():
+                self._remove(session_id, 'expired')
+                return None
+            if state.fingerprint != fingerprint:
+                self._remove(session_id, 'model_changed')
+                return None
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def put(self, session_id: str, state: SessionState):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (state, self.clock() + self.ttl)
+            while self.max_sessions and len(self._sessions) > self.max_sessions:
+                self._remove(next(iter(self._sessions)), 'lru')
+            STREAM_SESSIONS.set(len(self._sessions))
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id, None)
+            return True
+
+    def _remove(self, session_id, reason):
+        del self._sessions[session_id]
+        if reason:
+            STREAM_SESSION_EVICTIONS.labels(reason=reason).inc()
+        STREAM_SESSIONS.set(len(self._sessions))
+
+
+class IncrementalScorer:
+    """Re-score an append-only text stream by feeding only the new tokens.
+
+    SentiNN's single-layer GRU state after a prefix summarizes all of it,
+    so each session keeps that state. An update runs the GRU over the new
+    message's tokens from the stored state, then scores a copy of it closed
+    with <eos> and the <pad> tail, exactly as the padded model would see the
+    whole conversation. The cost of an update depends on the new tokens
+    (plus the pad replay, which stops once the state settles), not on the
+    length of the history. Unlike a normal prediction, the history is not
+    cut at 256 tokens.
+    """
+
+    def __init__(self, predictor, store: SessionStore, tolerance: float = 1e-6):
+        self.predictor = predictor
+        self.store = store
+        self.tolerance = tolerance
+
+    def update(self, session_id: str, text: str) -> Dict[str, Any]:
+        """Append a message to a stream and return the stream's new sentiment"""
+        start_time = time.perf_counter()
+        model = self.predictor.model
+        if model is None or not supports_packed(model):
+            raise ValueError("Incremental scoring needs the SentiNN model in this process "
+                             "(eager or quantized backend, no inference pool)")
+        fingerprint = self.predictor.fingerprint
+        tokens = basic_english_tokenize(text)
+        ids = torch.tensor(self.predictor.encoder.table(tokens), dtype=torch.long,
+                           device=model.e.weight.device)
+
+        with self.store.lock_for(session_id):
+            state = self.store.get(session_id, fingerprint)
+            hidden = state.hidden if state is not None else None
+            length = (state.tokens if state is not None else 0) + len(ids)
+            messages = (state.messages if state is not None else 0) + 1
+            with torch.no_grad():
+                if len(ids):
+                    hidden = advance_hidden(model, hidden, ids)
+                if hidden is None:
+                    hidden = torch.zeros(model.rnn.hidden_size, device=ids.device)
+                output = close_hidden(model, hidden, length, tolerance=self.tolerance)
+            self.store.put(session_id, SessionState(hidden, length, messages, fingerprint))
+
+        probabilities = torch.softmax(output, dim=0)
+        prediction = int(torch.argmax(output))
+        result = self.predictor.build_result(
+            text,
+            "Positive" if prediction == 1 else "Negative",
+            probabilities[prediction].item(),
+            (output[1] - output[0]).item(),
+            time.perf_counter() - start_time
+        )
+        result['session'] = {'id': session_id, 'tokens': length, 'messages': messages}
+        return result
+
+    def reset(self, session_id: str) -> bool:
+        """Forget a stream's state"""
+        return self.store.delete(session_id)
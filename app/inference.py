@@ -0,0 +1,126 @@
+import torch
+from torch.ao.nn.quantized import dynamic as quantized_dynamic
+from torch.nn.utils.rnn import pack_padded_sequence
+
+# Sequence layout used when the model was trained
+MAX_SEQ_LEN = 256
+EOS_ID = 1
+PAD_ID = 2
+PADDED_LENGTH = MAX_SEQ_LEN + 1
+
+# Plain and dynamically quantized (see app/optimization.py) layers
+_GRU_TYPES = (torch.nn.GRU, quantized_dynamic.GRU)
+_LINEAR_TYPES = (torch.nn.Linear, quantized_dynamic.Linear)
+
+
+def supports_packed(model) -> bool:
+    """Check whether a model has the SentiNN embedding -> GRU -> linear layout"""
+    rnn = getattr(model, 'rnn', None)
+    return (
+        isinstance(getattr(model, 'e', None), torch.nn.Embedding)
+        and isinstance(rnn, _GRU_TYPES)
+        and isinstance(getattr(model, 'out', None), _LINEAR_TYPES)
+        and rnn.num_layers == 1
+        and not rnn.bidirectional
+        and rnn.batch_first
+    )
+
+
+def packed_forward(model, padded: torch.Tensor, lengths: torch.Tensor,
+                   padded_length: int = PADDED_LENGTH,
+                   tolerance: float = 1e-6) -> torch.Tensor:
+    """Compute SentiNN logits running the GRU only over the real tokens.
+
+    The padded path feeds every row through all ``padded_length`` steps, so
+    the hidden state keeps moving while it reads the trailing ``<pad>``
+    tokens. To reproduce that, the real tokens go through the GRU as a packed
+    sequence and the pad tail is then replayed one step at a time, but each
+    row stops as soon as a step changes no element of its hidden state by
+    more than ``tolerance`` (the state has reached the pad fixed point) or
+    its remaining pad steps run out. Logits match ``model(padded)`` to about
+    1e-4 with the default tolerance; ``tolerance=0`` replays the full tail
+    and matches exactly.
+
+    ``padded`` is a ``batch x seq`` tensor of token ids and ``lengths`` the
+    number of real tokens (including ``<eos>``) in each row.
+    """
+    lengths = lengths.to('cpu', torch.long)
+    max_len = int(lengths.max())
+    embedded = model.e(padded[:, :max_len])
+    packed = pack_padded_sequence(embedded, lengths, batch_first=True, enforce_sorted=False)
+    _, hidden = model.rnn(packed)
+    hidden = hidden[0]
+
+    remaining = (padded_length - lengths).to(hidden.device)
+    hidden = _replay_pad_tail(model, hidden, remaining, tolerance)
+    return model.out(hidden)
+
+
+def advance_hidden(model, hidden, ids: torch.Tensor) -> torch.Tensor:
+    """Run the GRU over more tokens of one sequence, starting from ``hidden``.
+
+    ``hidden`` is the ``hidden_size`` state left by the tokens before
+    ``ids`` (None at the start of a sequence). Returns the new state.
+    """
+    embedded = model.e(ids.view(1, -1))
+    initial = None if hidden is None else hidden.view(1, 1, -1).contiguous()
+    _, hidden = model.rnn(embedded, initial)
+    return hidden[0, 0]
+
+
+def close_hidden(model, hidden, length: int, padded_length: int = PADDED_LENGTH,
+                 tolerance: float = 1e-6) -> torch.Tensor:
+    """Logits for a sequence of ``length`` tokens whose GRU state is ``hidden``.
+
+    Appends <eos> and replays the <pad> tail the padded layout would have,
+    without changing ``hidden`` itself, so the same state can keep growing.
+    """
+    closed = advance_hidden(model, hidden, torch.tensor([EOS_ID], device=model.e.weight.device))
+    remaining = torch.tensor([max(0, padded_length - length - 1)], device=closed.device)
+    closed = _replay_pad_tail(model, closed.unsqueeze(0), remaining, tolerance)
+    return model.out(closed)[0]
+
+
+def _replay_pad_tail(model, hidden, remaining, tolerance):
+    pad = model.e(torch.tensor([PAD_ID], device=hidden.device))[0]
+    if isinstance(model.rnn, torch.nn.GRU):
+        step = _gru_step(model.rnn, pad)
+    else:
+        step = _module_step(model.rnn, pad)
+
+    hidden = hidden.clone()
+    active = torch.nonzero(remaining > 0).squeeze(1)
+    while active.numel():
+        h = hidden[active]
+        new_h = step(h)
+
+        hidden[active] = new_h
+        remaining[active] -= 1
+        changed = (new_h - h).abs().amax(dim=1) > tolerance
+        active = active[changed & (remaining[active] > 0)]
+    return hidden
+
+
+def _gru_step(rnn, pad):
+    hidden_size = rnn.hidden_size
+    # The input is the same <pad> embedding at every step, so its gate
+    # projection only has to be computed once.
+    gate_input = torch.nn.functional.linear(pad, rnn.weight_ih_l0, rnn.bias_ih_l0)
+    input_r, input_z, input_n = gate_input.split(hidden_size)
+
+    def step(h):
+        gate_hidden = torch.nn.functional.linear(h, rnn.weight_hh_l0, rnn.bias_hh_l0)
+        hidden_r, hidden_z, hidden_n = gate_hidden.split(hidden_size, dim=1)
+        r = torch.sigmoid(input_r + hidden_r)
+        z = torch.sigmoid(input_z + hidden_z)
+        n = torch.tanh(input_n + r * hidden_n)
+        return (1 - z) * n + z * h
+    return step
+
+
+def _module_step(rnn, pad):
+    """One GRU step through the module itself, for layers without float weights"""
+    def step(h):
+        _, new_h = rnn(pad.expand(h.shape[0], 1, -1), h.unsqueeze(0).contiguous())
+        return new_h[0]
+    return step
@@ -0,0 +1,111 @@
+import torch
+
+
+def load_model(model_path: str, device=torch.device('cpu')):
+    """Load a SentiNN model from a state_dict or a pickled module, in eval mode"""
+    if is_state_dict_file(model_path):
+        return load_weights(model_path, device)
+    
+    # Load model with fallback for pickled class lookup issues
+    # Sometimes a model saved from a script references the model class
+    # under the '__main__' module (e.g. '__main__.SentiNN'). When the
+    # code that unpickles runs under a different module (like
+    # 'run_webapp.py'), pickle can't find the class and raises
+    # "Can't get attribute 'SentiNN'". To robustly handle that case,
+    # import the real class and inject it into the '__main__' module
+    # namespace before retrying the load.
+    try:
+        model = torch.load(model_path, map_location="cpu")
+    except AttributeError as e:
+        # Detect the specific missing-class during unpickling
+        msg = str(e)
+        if "Can't get attribute 'SentiNN'" in msg or 'SentiNN' in msg:
+            import sys
+            # Import the architecture where SentiNN is defined
+            import ml_model.model_architecture as arch
+            # Inject into __main__ so pickle can resolve it
+            try:
+                sys.modules['__main__'].SentiNN = arch.SentiNN
+            except Exception:
+                # As a fallback, set attribute on the module object returned
+                import types
+                main_mod = sys.modules.get('__main__')
+                if main_mod is None:
+                    main_mod = types.ModuleType('__main__')
+                    sys.modules['__main__'] = main_mod
+                setattr(main_mod, 'SentiNN', arch.SentiNN)
+
+            # Retry loading now that SentiNN is available
+            model = torch.load(model_path, map_location="cpu")
+        else:
+            # re-raise if it's a different AttributeError
+            raise
+    # Move model to device and set evaluation mode
+    try:
+        model.to(device)
+        model.eval()
+    except Exception:
+        # If model is a state_dict or other object, ignore here; caller
+        # can handle or further errors will be raised at inference
+        pass
+    return model
+
+
+def is_state_dict_file(path: str) -> bool:
+    """Check whether a file holds a plain state_dict rather than a pickled module"""
+    try:
+        state = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    except Exception:
+        return False
+    return isinstance(state, dict)
+
+
+def load_weights(weights_path: str, device=torch.device('cpu')):
+    """Build SentiNN from its architecture and memory-map a saved state_dict.
+
+    ``weights_only=True`` only unpickles tensors and plain containers, so no
+    code from the file is run, and ``mmap=True`` maps tensor storage from
+    the file lazily instead of reading it all up front. The mapped tensors
+    are assigned to the model as its parameters rather than copied into
+    freshly allocated ones, so worker processes share the file's pages.
+    """
+    from ml_model.model_architecture import SentiNN
+
+    state = torch.load(weights_path, map_location='cpu', mmap=True, weights_only=True)
+    input_size, embed_size = state['e.weight'].shape
+    hidden_size = state['rnn.weight_hh_l0'].shape[1]
+    model = SentiNN(input_size, embed_size, hidden_size)
+    model.load_state_dict(state, assign=True)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def load_vocab_table(vocab_path: str):
+    """Load the flat token table, or convert a pickled torchtext Vocab"""
+    from app.tokenization import VocabTable
+
+    if VocabTable.is_table_file(vocab_path):
+        return VocabTable.load(vocab_path)
+    import pickle
+    with open(vocab_path, 'rb') as f:
+        return VocabTable.from_vocab(pickle.load(f))
+
+
+def resolve_artifact_paths(config=None):
+    """Prefer the safe weights and token table when they have been generated"""
+    import os
+    from config.settings import Config
+    config = config or Config
+    model_path = config.MODEL_WEIGHTS_PATH if os.path.exists(config.MODEL_WEIGHTS_PATH) \
+        else config.MODEL_PATH
+    vocab_path = config.VOCAB_TABLE_PATH if os.path.exists(config.VOCAB_TABLE_PATH) \
+        else config.VOCAB_PATH
+    return model_path, vocab_path
+
+
+def convert_artifacts(model_path: str, vocab_path: str, weights_path: str, table_path: str):
+    """Write the pickled model and vocab out as a state_dict and a token table"""
+    model = load_model(model_path)
+    torch.save(model.state_dict(), weights_path)
+    load_vocab_table(vocab_path).save(table_path)
@@ -1,20 +1,103 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text
+import hashlib
+import uuid
+from sqlalchemy import (Column, Integer, String, DateTime, Float, Text, Index, UniqueConstraint,
+                        ForeignKey, LargeBinary, event, select)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 
 Base = declarative_base()
 
+def text_hash(text: str) -> bytes:
+    """16-byte content hash identifying a text in prediction_texts"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+class RequestId(TypeDecorator):
+    """A request id string stored as compact bytes.
+
+    UUIDs (what the API generates) take 17 bytes instead of 36 characters:
+    a 0x01 tag and the raw 16 bytes. Any other id is kept as a 0x00 tag
+    plus its UTF-8 text. Values read back are the original strings, and
+    comparisons in queries accept strings too.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            parsed = None
+        if parsed is not None and str(parsed) == value:
+            return b'\x01' + parsed.bytes
+        return b'\x00' + value.encode('utf-8')
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        value = bytes(value)
+        if value[:1] == b'\x01':
+            return str(uuid.UUID(bytes=value[1:]))
+        return value[1:].decode('utf-8')
+
+class PredictionText(Base):
+    """Each distinct input text, stored once and keyed by its content hash"""
+    __tablename__ = 'prediction_texts'
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    hash = Column(LargeBinary(16), primary_key=True)
+    text = Column(Text, nullable=False)
+
 class SentimentPrediction(Base):
     __tablename__ = 'sentiment_predictions'
+    __table_args__ = (
+        # Keyset pagination walks (timestamp, id); the sentiment filter
+        # leads the second index so filtered pages are range scans too
+        Index('ix_sentiment_predictions_timestamp_id', 'timestamp', 'id'),
+        Index('ix_sentiment_predictions_prediction_timestamp_id',
+              'prediction', 'timestamp', 'id'),
+        # Ids outlive their rows in archive files and names, so SQLite must
+        # never hand the id of an archived row out again
+        {'sqlite_autoincrement': True},
+    )
     
     id = Column(Integer, primary_key=True)
-    text = Column(Text, nullable=False)
+    # The text lives in prediction_texts, shared by every prediction of it
+    text_hash = Column(LargeBinary(16), ForeignKey('prediction_texts.hash'), nullable=False)
     prediction = Column(String(50), nullable=False)
     confidence = Column(Float, nullable=False)
     sentiment_score = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    request_id = Column(String(100), unique=True, nullable=False)
+    request_id = Column(RequestId, unique=True, nullable=False)
     processing_time = Column(Float, nullable=False)
+    model_version = Column(String(50))
+    
+    # Read-only: texts are written by store_texts, which skips stored ones
+    text_entry = relationship(PredictionText, lazy='joined', innerjoin=True, viewonly=True)
+    # The text of a prediction built in Python, until it is stored
+    _text = None
+    
+    def __init__(self, text: str = None, **kwargs):
+        if text is not None:
+            kwargs['text_hash'] = text_hash(text)
+            self._text = text
+        super().__init__(**kwargs)
+    
+    @hybrid_property
+    def text(self):
+        if self._text is not None:
+            return self._text
+        return self.text_entry.text
+    
+    @text.expression
+    def text(cls):
+        return select(PredictionText.text)\
+            .where(PredictionText.hash == cls.text_hash)\
+            .scalar_subquery()
     
     def to_dict(self):
         return {
@@ -25,5 +108,107 @@ class SentimentPrediction(Base):
             'sentiment_score': self.sentiment_score,
             'timestamp': self.timestamp.isoformat(),
             'request_id': self.request_id,
-            'processing_time': self.processing_time
-        }
\ No newline at end of file
+            'processing_time': self.processing_time,
+            'model_version': self.model_version
+        }
+
+def store_texts(connection, texts):
+    """Add texts (hash -> text) to prediction_texts, skipping ones already stored"""
+    if not texts:
+        return
+    table = PredictionText.__table__
+    rows = [{'hash': key, 'text': value} for key, value in texts.items()]
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        connection.execute(insert(table).on_conflict_do_nothing(index_elements=['hash']), rows)
+        return
+    existing = {row[0] for row in connection.execute(
+        select(table.c.hash).where(table.c.hash.in_(list(texts))))}
+    rows = [row for row in rows if row['hash'] not in existing]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _store_inserted_texts(state):
+    """Let ``insert(SentimentPrediction)`` rows carry the text itself.
+
+    The texts are stored in prediction_texts first and each row is given
+    its text_hash, so bulk inserts look the same as before texts were
+    shared.
+    """
+    if not state.is_insert or state.bind_mapper is not SentimentPrediction.__mapper__:
+        return None
+    rows = state.parameters if state.is_executemany else [state.parameters or {}]
+    if not rows or 'text' not in rows[0]:
+        return None
+    texts = {}
+    hashes = []
+    for row in rows:
+        key = text_hash(row['text'])
+        texts[key] = row['text']
+        hashes.append({'text_hash': key})
+    store_texts(state.session.connection(), texts)
+    return state.invoke_statement(params=hashes if state.is_executemany else hashes[0])
+
+@event.listens_for(Session, 'before_flush')
+def _store_added_texts(session, flush_context, instances):
+    """Store the texts of new SentimentPrediction objects ahead of their rows"""
+    store_texts(session.connection(), {
+        prediction.text_hash: prediction._text for prediction in session.new
+        if isinstance(prediction, SentimentPrediction) and prediction._text is not None
+    })
+
+class PredictionRollup(Base):
+    """Pre-aggregated prediction statistics for one time bucket and sentiment"""
+    __tablename__ = 'prediction_rollups'
+    __table_args__ = (
+        UniqueConstraint('granularity', 'bucket_start', 'prediction',
+                         name='uq_prediction_rollups_bucket'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # 'minute', 'hour' or 'total' (a single all-time bucket)
+    granularity = Column(String(10), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    prediction = Column(String(50), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    confidence_min = Column(Float, nullable=False)
+    confidence_max = Column(Float, nullable=False)
+    processing_time_sum = Column(Float, nullable=False, default=0.0)
+    processing_time_min = Column(Float, nullable=False)
+    processing_time_max = Column(Float, nullable=False)
+
+class PredictionArchive(Base):
+    """A time partition of predictions moved out to a compressed archive file"""
+    __tablename__ = 'prediction_archives'
+    __table_args__ = (
+        Index('ix_prediction_archives_period', 'period_start', 'period_end'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # [period_start, period_end): one day or month
+    period_start = Column(DateTime, nullable=False)
+    period_end = Column(DateTime, nullable=False)
+    # File name inside ARCHIVE_DIR
+    path = Column(String(255), nullable=False, unique=True)
+    row_count = Column(Integer, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'period_start': self.period_start.isoformat(),
+            'period_end': self.period_end.isoformat(),
+            'rows': self.row_count,
+            'first_id': self.first_id,
+            'last_id': self.last_id,
+            'size_bytes': self.size_bytes,
+            'archived_at': self.created_at.isoformat() if self.created_at else None
+        }
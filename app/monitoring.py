@@ -1,56 +1,196 @@
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, REGISTRY
+from prometheus_client import CollectorRegistry, multiprocess
+import threading
 import time
 from functools import wraps
+from config.settings import Config
+from monitoring.custom_metrics import advanced_metrics
+
+# With PROMETHEUS_MULTIPROC_DIR set in the environment (before anything
+# imports prometheus_client), every process writes its samples to mmap'd
+# files in that directory and a scrape of any worker merges all of them.
+# Gauges then need a multiprocess_mode saying how per-process values combine.
+MULTIPROCESS = bool(Config.PROMETHEUS_MULTIPROC_DIR)
+
+CONFIDENCE_BUCKETS = (0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0)
+
+SCORE_BUCKETS = (-10, -5, -2.5, -1, -0.5, 0, 0.5, 1, 2.5, 5, 10)
 
 # Metrics
 PREDICTION_COUNTER = Counter('sentiment_predictions_total', 
                             'Total sentiment predictions', 
-                            ['sentiment', 'status'])
+                            ['sentiment', 'status', 'model_version'])
 
 PREDICTION_DURATION = Histogram('sentiment_prediction_duration_seconds',
-                               'Prediction processing time')
+                               'Prediction processing time',
+                               ['model_version'])
 
-CONFIDENCE_GAUGE = Gauge('sentiment_confidence', 
-                        'Prediction confidence', 
-                        ['sentiment'])
+CONFIDENCE_HISTOGRAM = Histogram('sentiment_confidence',
+                                 'Prediction confidence',
+                                 ['sentiment', 'model_version'],
+                                 buckets=CONFIDENCE_BUCKETS)
 
-SENTIMENT_SCORE = Gauge('sentiment_score_current',
-                       'Current sentiment score')
+SENTIMENT_SCORE = Histogram('sentiment_score',
+                            'Sentiment score (positive minus negative logit)',
+                            ['model_version'],
+                            buckets=SCORE_BUCKETS)
 
-ACTIVE_REQUESTS = Gauge('active_requests', 'Active prediction requests')
+ACTIVE_REQUESTS = Gauge('active_requests', 'Active prediction requests',
+                        multiprocess_mode='livesum')
 
 ERROR_COUNTER = Counter('prediction_errors_total', 'Total prediction errors')
 
+BATCH_SIZE = Histogram('sentiment_batch_size',
+                       'Number of texts per model forward pass',
+                       buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+CACHE_HITS = Counter('sentiment_cache_hits_total', 'Prediction cache hits')
+
+CACHE_MISSES = Counter('sentiment_cache_misses_total', 'Prediction cache misses')
+
+CACHE_EVICTIONS = Counter('sentiment_cache_evictions_total',
+                          'Prediction cache evictions',
+                          ['reason'])
+
+CACHE_ENTRIES = Gauge('sentiment_cache_entries', 'Entries in the prediction cache',
+                      multiprocess_mode='livesum')
+
+WRITE_QUEUE_DEPTH = Gauge('prediction_write_queue_depth',
+                          'Prediction rows waiting to be written',
+                          multiprocess_mode='livesum')
+
+WRITE_QUEUE_DROPPED = Counter('prediction_write_queue_dropped_total',
+                              'Prediction rows dropped because the write queue was full')
+
+WRITE_QUEUE_ROWS = Counter('prediction_write_queue_rows_total',
+                           'Prediction rows written by the write-behind queue')
+
+WRITE_QUEUE_FAILED = Counter('prediction_write_queue_failed_total',
+                             'Prediction rows lost to database errors after retries')
+
+WRITE_QUEUE_SPILLED = Counter('prediction_write_queue_spilled_total',
+                              'Prediction rows spilled to disk after database errors, '
+                              'to be replayed')
+
+WRITE_QUEUE_FLUSH_DURATION = Histogram('prediction_write_queue_flush_seconds',
+                                       'Time to write one batch of prediction rows')
+
+STREAM_SESSIONS = Gauge('sentiment_stream_sessions',
+                        'Incremental scoring sessions held in memory',
+                        multiprocess_mode='livesum')
+
+STREAM_SESSION_EVICTIONS = Counter('sentiment_stream_session_evictions_total',
+                                   'Incremental scoring sessions evicted',
+                                   ['reason'])
+
+STAGE_DURATION = Histogram('sentiment_stage_duration_seconds',
+                           'Time spent in each stage of the prediction path',
+                           ['stage'],
+                           buckets=Config.STAGE_HISTOGRAM_BUCKETS)
+
+ADMISSION_QUEUE_WAIT = Histogram('sentiment_admission_queue_wait_seconds',
+                                 'Time predictions waited for admission',
+                                 buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+ADMISSION_SHED = Counter('sentiment_admission_shed_total',
+                         'Predictions not admitted, by reason and what was served instead',
+                         ['reason', 'outcome'])
+
+ADMISSION_LIMIT = Gauge('sentiment_admission_limit', 'Current admission concurrency limit',
+                        multiprocess_mode='livesum')
+
+ADMISSION_QUEUE_DEPTH = Gauge('sentiment_admission_queue_depth',
+                              'Predictions waiting for admission',
+                              multiprocess_mode='livesum')
+
+MODEL_VERSION_LOADS = Counter('sentiment_model_version_loads_total',
+                              'Model versions loaded by the registry',
+                              ['model_version'])
+
+def record_prediction(result, processing_time):
+    """Record per-request metrics for a single prediction result"""
+    model_version = result.get('model_version') or 'unknown'
+    PREDICTION_DURATION.labels(model_version=model_version).observe(processing_time)
+    
+    if result.get('success', False):
+        PREDICTION_COUNTER.labels(
+            sentiment=result['prediction'],
+            status='success',
+            model_version=model_version
+        ).inc()
+        
+        CONFIDENCE_HISTOGRAM.labels(
+            sentiment=result['prediction'],
+            model_version=model_version
+        ).observe(result['confidence'])
+        
+        SENTIMENT_SCORE.labels(model_version=model_version).observe(result['sentiment_score'])
+        
+        # A shed request scored on its first tokens says little about the
+        # sentiment of the texts sent
+        if result.get('degraded') != 'truncated':
+            advanced_metrics.record(result)
+    else:
+        PREDICTION_COUNTER.labels(
+            sentiment='error',
+            status='error',
+            model_version=model_version
+        ).inc()
+        ERROR_COUNTER.inc()
+
 def monitor_prediction(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         with ACTIVE_REQUESTS.track_inprogress():
-            start_time = time.time()
+            start_time = time.perf_counter()
             result = func(*args, **kwargs)
-            processing_time = time.time() - start_time
-            
-            PREDICTION_DURATION.observe(processing_time)
+            processing_time = time.perf_counter() - start_time
             
-            if result.get('success', False):
-                PREDICTION_COUNTER.labels(
-                    sentiment=result['prediction'],
-                    status='success'
-                ).inc()
-                
-                CONFIDENCE_GAUGE.labels(
-                    sentiment=result['prediction']
-                ).set(result['confidence'])
-                
-                SENTIMENT_SCORE.set(result['sentiment_score'])
-            else:
-                PREDICTION_COUNTER.labels(
-                    sentiment='error',
-                    status='error'
-                ).inc()
-                ERROR_COUNTER.inc()
+            record_prediction(result, processing_time)
             
             return result
     return wrapper
 
+class _ScrapeCache:
+    """Rendered /metrics output of one or more registries, reused for ``ttl`` seconds.
+
+    Merging every worker's files costs time proportional to workers times
+    label sets, so concurrent or back-to-back scrapes (several Prometheus
+    servers, a dashboard hitting every worker) share one render. Only one
+    thread renders at a time; the others wait for its result.
+    """
+
+    def __init__(self, *registries, ttl: float):
+        self.registries = registries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._output = None
+        self._rendered_at = 0.0
+
+    def _generate(self) -> bytes:
+        return b''.join(generate_latest(registry) for registry in self.registries)
+
+    def render(self) -> bytes:
+        if self.ttl <= 0:
+            return self._generate()
+        with self._lock:
+            now = time.monotonic()
+            if self._output is None or now - self._rendered_at >= self.ttl:
+                self._output = self._generate()
+                self._rendered_at = now
+            return self._output
+
+def _scrape_registries():
+    # The sliding-window analytics describe a single process, so in
+    # multiprocess mode they are pushed per worker instead, when
+    # PUSHGATEWAY_URL is set (see gunicorn.conf.py)
+    if not MULTIPROCESS:
+        return REGISTRY, advanced_metrics.registry
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return (registry,)
+
+_scrape_cache = _ScrapeCache(*_scrape_registries(), ttl=Config.METRICS_CACHE_SECONDS)
+
 def get_metrics():
-    return generate_latest(REGISTRY)
\ No newline at end of file
+    return _scrape_cache.render()
\ No newline at end of file
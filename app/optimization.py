@@ -0,0 +1,74 @@
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+# Selectable CPU inference backends, see optimize_model()
+INFERENCE_BACKENDS = ('eager', 'quantized', 'torchscript', 'quantized_torchscript')
+
+EMBEDDING_DTYPES = {
+    'float32': torch.float32,
+    'float16': torch.float16,
+    'bfloat16': torch.bfloat16,
+}
+
+
+class CompactEmbedding(nn.Embedding):
+    """Embedding table stored in a narrower dtype that returns float32 vectors"""
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        return F.embedding(input, self.weight, self.padding_idx).float()
+
+
+def compact_embedding(embedding: nn.Embedding, dtype: torch.dtype) -> nn.Embedding:
+    """Copy an embedding into ``dtype`` storage, halving its memory for fp16/bf16"""
+    if dtype == torch.float32:
+        return embedding
+    weight = embedding.weight.detach().to(dtype)
+    return CompactEmbedding(weight.shape[0], weight.shape[1],
+                            padding_idx=embedding.padding_idx, _weight=weight, _freeze=True)
+
+
+def quantize(model: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of the GRU and Linear layers.
+
+    Weights are stored as int8 and activations quantized on the fly, so no
+    calibration data is needed. The embedding is left alone; use a narrower
+    embedding dtype to shrink it.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.GRU, nn.Linear}, dtype=torch.qint8)
+
+
+def compile_model(model: nn.Module, example: torch.Tensor = None) -> torch.jit.ScriptModule:
+    """Script (or, failing that, trace) the forward pass and freeze the graph.
+
+    Freezing inlines the weights as constants and drops the eval-mode
+    Dropout. The compiled graph always runs the full padded sequence, so
+    packed inference does not apply to it.
+    """
+    try:
+        compiled = torch.jit.script(model)
+    except Exception:
+        if example is None:
+            example = torch.full((1, 257), 2, dtype=torch.long)
+        compiled = torch.jit.trace(model, example)
+    return torch.jit.freeze(compiled.eval())
+
+
+def optimize_model(model: nn.Module, backend: str = 'eager',
+                   embedding_dtype: str = 'float32') -> nn.Module:
+    """Prepare an eval-mode SentiNN for CPU inference with the given backend"""
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}. "
+                         f"Choose one of {', '.join(INFERENCE_BACKENDS)}")
+    if embedding_dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {embedding_dtype}. "
+                         f"Choose one of {', '.join(EMBEDDING_DTYPES)}")
+
+    model.eval()
+    if isinstance(getattr(model, 'e', None), nn.Embedding):
+        model.e = compact_embedding(model.e, EMBEDDING_DTYPES[embedding_dtype])
+    if backend in ('quantized', 'quantized_torchscript'):
+        model = quantize(model)
+    if backend in ('torchscript', 'quantized_torchscript'):
+        model = compile_model(model)
+    return model
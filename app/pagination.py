@@ -0,0 +1,63 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, tuple_
+from app.models import SentimentPrediction
+
+
+def encode_cursor(prediction: SentimentPrediction) -> str:
+    """Build an opaque cursor pointing at a row's (timestamp, id) position"""
+    raw = f"{prediction.timestamp.isoformat()}|{prediction.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Turn a cursor back into (timestamp, id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, prediction_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(prediction_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(query, per_page: int, after: str = None,
+                before: str = None) -> Tuple[List[SentimentPrediction], Optional[str], Optional[str]]:
+    """Fetch one page of predictions, newest first, by (timestamp, id) position.
+
+    ``after`` continues with rows older than that cursor and ``before``
+    steps back to rows newer than it. Each page is an index range scan on
+    ``(timestamp, id)``, so its cost does not depend on how deep it is.
+    Returns the rows plus cursors for the next (older) and previous (newer)
+    pages, either of which is None when there is nothing more that way.
+    """
+    position = tuple_(SentimentPrediction.timestamp, SentimentPrediction.id)
+
+    if before:
+        query = query.filter(position > tuple_(*decode_cursor(before)))\
+            .order_by(SentimentPrediction.timestamp.asc(), SentimentPrediction.id.asc())
+    else:
+        if after:
+            query = query.filter(position < tuple_(*decode_cursor(after)))
+        query = query.order_by(SentimentPrediction.timestamp.desc(), SentimentPrediction.id.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before:
+        rows.reverse()
+        newer = has_more
+        older = True
+    else:
+        newer = bool(after)
+        older = has_more
+
+    next_cursor = encode_cursor(rows[-1]) if rows and older else None
+    prev_cursor = encode_cursor(rows[0]) if rows and newer else None
+    return rows, next_cursor, prev_cursor
+
+
+def approximate_count(session) -> int:
+    """Estimate the table size from the primary key range instead of scanning"""
+    return session.query(func.max(SentimentPrediction.id)).scalar() or 0
@@ -0,0 +1,224 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any
+from app.database import db_manager
+from app.monitoring import (
+    WRITE_QUEUE_DEPTH, WRITE_QUEUE_DROPPED, WRITE_QUEUE_ROWS, WRITE_QUEUE_FAILED,
+    WRITE_QUEUE_FLUSH_DURATION, WRITE_QUEUE_SPILLED
+)
+from config.settings import Config
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; replays are then not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Sentinel placed on the queue to stop the writer thread
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Persist prediction results from a background thread in batches.
+
+    Requests hand their result to ``submit()`` and return straight away. A
+    writer thread groups queued rows and inserts them with one transaction
+    per flush, triggered when ``batch_size`` rows are waiting or the oldest
+    row has waited ``flush_interval`` seconds. The queue is bounded: when it
+    is full ``submit()`` blocks for up to ``put_timeout`` seconds to push
+    back on callers, then drops the row and counts it. Each row is stamped
+    with the time it was submitted, not the time of its flush. ``close()``
+    drains everything already accepted before returning.
+
+    A batch that still fails after ``retries`` is written to a file in
+    ``spill_dir`` instead of being lost. Spilled batches are replayed, with
+    their original timestamps, when a writer thread starts and after the
+    next successful flush. One process replays at a time. A crash between
+    a replay's commit and the file's removal would insert those rows twice,
+    so delivery is at least once. Without ``spill_dir`` failed batches are
+    only counted and logged.
+    """
+
+    def __init__(self, manager, max_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5, put_timeout: float = 0.05,
+                 retries: int = 2, spill_dir: str = None):
+        self.manager = manager
+        self.max_size = max_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.spill_dir = spill_dir
+        # Spill files may be waiting from an earlier run until a replay succeeds
+        self._spilled = spill_dir is not None
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def submit(self, result: Dict[str, Any], block: bool = True) -> bool:
+        """Queue a successful result for insertion; False if it was dropped.
+
+        ``block=False`` never waits for room, for callers on an event loop.
+        """
+        if not result.get('success', False):
+            return False
+        self._ensure_worker()
+        item = (result, datetime.utcnow())
+        try:
+            if block and self.put_timeout:
+                self._queue.put(item, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            WRITE_QUEUE_DROPPED.inc()
+            return False
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def close(self, timeout: float = None):
+        """Write every queued row and stop the writer thread"""
+        with self._lock:
+            worker = self._worker
+            if worker is None or not worker.is_alive() or self._pid != os.getpid():
+                return
+            self._queue.put(_STOP)
+        worker.join(timeout)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so each gunicorn worker starts its own
+        if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_size)
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._worker.start()
+
+    def _collect(self):
+        """Block for the first row, then gather more until full or timed out"""
+        batch = [self._queue.get()]
+        if batch[0] is _STOP:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        self._replay_spilled()
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            # _STOP only ever ends a batch
+            rows = [dict(result, timestamp=submitted)
+                    for result, submitted in (batch[:-1] if stop else batch)]
+            if rows:
+                self._flush(rows)
+            WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+            if stop:
+                return
+
+    def _flush(self, rows):
+        start_time = time.time()
+        for attempt in range(self.retries + 1):
+            try:
+                self.manager.bulk_save_predictions(rows)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self._spill(rows, e)
+                    return
+                # SQLite reports "database is locked" under write contention
+                time.sleep(0.05 * (attempt + 1))
+        WRITE_QUEUE_ROWS.inc(len(rows))
+        WRITE_QUEUE_FLUSH_DURATION.observe(time.time() - start_time)
+        if self._spilled:
+            self._replay_spilled()
+
+    def _spill(self, rows, error: Exception):
+        """Keep a batch that could not be written in a file for a later replay"""
+        if self.spill_dir is None:
+            WRITE_QUEUE_FAILED.inc(len(rows))
+            logger.error("Dropped %d prediction rows after database error: %s", len(rows), error)
+            return
+        name = f'spill-{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}.json'
+        path = os.path.join(self.spill_dir, name)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'rows': [dict(row, timestamp=row['timestamp'].isoformat())
+                                    for row in rows]}, f)
+            os.replace(path + '.tmp', path)
+        except (OSError, TypeError, ValueError) as e:
+            WRITE_QUEUE_FAILED.inc(len(rows))
+            logger.error("Dropped %d prediction rows after database error (%s); "
+                         "spilling them failed: %s", len(rows), error, e)
+            return
+        self._spilled = True
+        WRITE_QUEUE_SPILLED.inc(len(rows))
+        logger.warning("Spilled %d prediction rows to %s after database error: %s",
+                       len(rows), path, error)
+
+    def _replay_spilled(self) -> int:
+        """Write spilled batches, oldest first, deleting each once stored"""
+        if self.spill_dir is None or not os.path.isdir(self.spill_dir):
+            self._spilled = False
+            return 0
+        replayed = 0
+        with open(os.path.join(self.spill_dir, '.replay.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            for path in sorted(glob.glob(os.path.join(self.spill_dir, 'spill-*.json'))):
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        spilled = json.load(f)
+                except FileNotFoundError:
+                    continue
+                rows = [dict(row, timestamp=datetime.fromisoformat(row['timestamp']))
+                        if row.get('timestamp') else row for row in spilled['rows']]
+                # Files spilled before rows kept their own time have one for all
+                timestamp = spilled.get('timestamp')
+                try:
+                    self.manager.bulk_save_predictions(
+                        rows, timestamp=datetime.fromisoformat(timestamp) if timestamp else None)
+                except Exception as e:
+                    logger.warning("Replaying %s failed, keeping it for later: %s", path, e)
+                    return replayed
+                os.remove(path)
+                replayed += len(spilled['rows'])
+                WRITE_QUEUE_ROWS.inc(len(spilled['rows']))
+        self._spilled = False
+        if replayed:
+            logger.info("Replayed %d spilled prediction rows", replayed)
+        return replayed
+
+
+# Global write-behind queue used by the web app
+write_queue = WriteBehindQueue(db_manager,
+                               max_size=Config.WRITE_QUEUE_MAX_SIZE,
+                               batch_size=Config.WRITE_QUEUE_BATCH_SIZE,
+                               flush_interval=Config.WRITE_QUEUE_FLUSH_INTERVAL,
+                               put_timeout=Config.WRITE_QUEUE_PUT_TIMEOUT,
+                               spill_dir=Config.WRITE_QUEUE_SPILL_DIR or None)
+
+# Drain accepted rows on interpreter shutdown
+atexit.register(write_queue.close)
@@ -1,12 +1,20 @@
 import torch
 import time
 import uuid
-from typing import Dict, Any
-from app.monitoring import monitor_prediction
+from typing import Dict, Any, List, Optional, Tuple
+from app.monitoring import monitor_prediction, BATCH_SIZE
+from app.admission import AdmissionController
+from app.batching import MicroBatcher
+from app.inference import packed_forward, supports_packed
+from app.tokenization import TextEncoder, VocabTable
+from app.cache import prediction_cache, file_fingerprint
+from app.model_loading import load_model, load_vocab_table, resolve_artifact_paths
+from app.worker_pool import PoolClient
+from app.optimization import optimize_model
+from app.profiling import start_timer
+from app.registry import ModelRegistry
 from config.settings import Config
-from torchtext.data.utils import get_tokenizer
-from torchtext.vocab import Vocab
-import pickle
+import threading
 
 # INPUT_SIZE = 51719  # Vocabulary size
 # EMBED_SIZE = 128
@@ -22,119 +30,243 @@ import pickle
 
 
 class SentimentPredictor:
-    def __init__(self, model_path: str, vocab_path: str):
+    def __init__(self, model_path: str, vocab_path: str, version: str = None):
+        self.version = version or Config.MODEL_VERSION
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        # Load model with fallback for pickled class lookup issues
-        # Sometimes a model saved from a script references the model class
-        # under the '__main__' module (e.g. '__main__.SentiNN'). When the
-        # code that unpickles runs under a different module (like
-        # 'run_webapp.py'), pickle can't find the class and raises
-        # "Can't get attribute 'SentiNN'". To robustly handle that case,
-        # import the real class and inject it into the '__main__' module
-        # namespace before retrying the load.
-        try:
-            self.model = torch.load(model_path, map_location="cpu")
-        except AttributeError as e:
-            # Detect the specific missing-class during unpickling
-            msg = str(e)
-            if "Can't get attribute 'SentiNN'" in msg or 'SentiNN' in msg:
-                import sys
-                # Import the architecture where SentiNN is defined
-                import ml_model.model_architecture as arch
-                # Inject into __main__ so pickle can resolve it
-                try:
-                    sys.modules['__main__'].SentiNN = arch.SentiNN
-                except Exception:
-                    # As a fallback, set attribute on the module object returned
-                    import types
-                    main_mod = sys.modules.get('__main__')
-                    if main_mod is None:
-                        main_mod = types.ModuleType('__main__')
-                        sys.modules['__main__'] = main_mod
-                    setattr(main_mod, 'SentiNN', arch.SentiNN)
-
-                # Retry loading now that SentiNN is available
-                self.model = torch.load(model_path, map_location="cpu")
-            else:
-                # re-raise if it's a different AttributeError
-                raise
-        # Move model to device and set evaluation mode
-        try:
-            self.model.to(self.device)
-            self.model.eval()
-        except Exception:
-            # If model is a state_dict or other object, ignore here; caller
-            # can handle or further errors will be raised at inference
-            pass
-        with open(vocab_path, 'rb') as f:
-            self.vocab: Vocab = pickle.load(f)
+        # Inference can be served by a separate worker pool, in which case
+        # this process never needs its own copy of the weights
+        self.pool = PoolClient(Config.INFERENCE_POOL_ADDRESS, Config.INFERENCE_POOL_AUTHKEY,
+                               workers=Config.INFERENCE_POOL_WORKERS) \
+            if Config.INFERENCE_POOL_ENABLED else None
+        self.model = None
+        if self.pool is None:
+            self.model = optimize_model(load_model(model_path, self.device),
+                                        Config.INFERENCE_BACKEND, Config.EMBEDDING_DTYPE)
+        # Flat token -> id table, from the token table file or a pickled Vocab
+        self.vocab: VocabTable = load_vocab_table(vocab_path)
+        # Build the tokenizer and encoder once, up front
+        self.encoder = TextEncoder(self.vocab)
+        # Cache results per model/vocab version: the fingerprint is part of
+        # every key, so versions loaded side by side keep their own entries
+        self.fingerprint = file_fingerprint(model_path, vocab_path)
+        self.cache = prediction_cache if Config.CACHE_ENABLED else None
+        # Only run the GRU over real tokens if the model has the SentiNN layout
+        self.packed = Config.PACKED_INFERENCE and supports_packed(self.model)
         # self.model.to(self.device)
         # self.model.eval()
+    def encode_text(self, text: str) -> List[int]:
+        """Tokenize text into vocab ids, truncated and terminated with <eos>"""
+        return self.encoder.encode(text).tolist()
+    
     def preprocess_text(self, text):
-        tokenizer = get_tokenizer("basic_english", language="en")
         """Convert raw text to tensor suitable for model input"""
-        # Tokenize and convert to numerical IDs
-        MAX_SEQ_LEN = 256
-        tokens = tokenizer(text)
-        token_ids = self.vocab(tokens)
-        
-        # Truncate to MAX_SEQ_LEN and append <eos> (id=1 as per your train.py)
-        token_ids = token_ids[:MAX_SEQ_LEN]
-        token_ids.append(1)  # <eos>
-        
-        # Pad sequence with <pad> (id=2)
-        padded = [2] * (MAX_SEQ_LEN + 1)
-        padded[:len(token_ids)] = token_ids
-        
-        # Convert to tensor
-        tensor = torch.tensor([padded], dtype=torch.long).to("cpu")
-        return tensor
+        batch, _ = self.preprocess_batch([text])
+        return batch
+    
+    def preprocess_batch(self, texts: List[str], timer=None,
+                         tokens: List[List[str]] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Pad several texts into one batch and return it with each row's length"""
+        batch, lengths = self.encoder.encode_batch(texts, timer=timer, tokens=tokens)
+        return torch.from_numpy(batch), torch.from_numpy(lengths)
+    
+    def forward(self, batch: torch.Tensor, lengths: torch.Tensor) -> torch.Tensor:
+        """Run the model, skipping <pad> steps when packed inference is enabled"""
+        if self.pool is not None:
+            return torch.from_numpy(self.pool.forward(batch.numpy(), lengths.numpy()))
+        with torch.no_grad():
+            if self.packed:
+                return packed_forward(self.model, batch, lengths,
+                                      tolerance=Config.PACKED_TAIL_TOLERANCE)
+            return self.model(batch)
     
     @monitor_prediction
     def predict(self, text: str) -> Dict[str, Any]:
         """Make sentiment prediction with monitoring"""
-        start_time = time.time()
-        request_id = str(uuid.uuid4())
+        return self.predict_batch([text])[0]
+    
+    def tokenize(self, text: str) -> List[str]:
+        """The tokens the model sees for a text.
+
+        Callers that check the cache and then score the text pass them on
+        to ``cached_result`` and ``predict_batch`` so it is tokenized once.
+        """
+        return self.encoder.tokenize(text)
+    
+    def cache_key(self, text: str, tokens: List[str] = None) -> str:
+        """Key a text on the tokens the model would actually see"""
+        if tokens is None:
+            tokens = self.tokenize(text)
+        return self.cache.make_key(' '.join(tokens), self.fingerprint)
+    
+    def cached_result(self, text: str, tokens: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Return a result built from the cache, or None on a miss"""
+        if self.cache is None:
+            return None
+        start_time = time.perf_counter()
+        value = self.cache.get(self.cache_key(text, tokens))
+        if value is None:
+            return None
+        return self.build_result(text, *value, time.perf_counter() - start_time)
+    
+    def build_result(self, text: str, sentiment: str, confidence: float,
+                     sentiment_score: float, processing_time: float) -> Dict[str, Any]:
+        """Build the result dict returned for a successful prediction"""
+        return {
+            'request_id': str(uuid.uuid4()),
+            'text': text,
+            'prediction': sentiment,
+            'confidence': confidence,
+            'sentiment_score': sentiment_score,
+            'processing_time': processing_time,
+            'model_version': self.version,
+            'success': True
+        }
+    
+    def predict_batch(self, texts: List[str], check_cache: bool = True,
+                      tokens: List[List[str]] = None) -> List[Dict[str, Any]]:
+        """Make sentiment predictions for several texts in one forward pass.
+        
+        ``tokens`` are the texts' ``tokenize()`` output, if already known.
+        """
+        start_time = time.perf_counter()
+        timer = start_timer()
+        results = [None] * len(texts)
         
         try:
-            # Preprocess text
-            processed_text = self.preprocess_text(text)
+            # Tokenize once: the cache keys and the model input both use them
+            if tokens is None:
+                tokens = [self.tokenize(text) for text in texts]
+                timer.mark('tokenize')
+            keys = [self.cache_key(text, text_tokens) for text, text_tokens in zip(texts, tokens)] \
+                if self.cache is not None else None
+            if keys is not None and check_cache:
+                for i, key in enumerate(keys):
+                    value = self.cache.get(key)
+                    if value is not None:
+                        results[i] = self.build_result(texts[i], *value, 0.0)
+            misses = [i for i, result in enumerate(results) if result is None]
+            timer.mark('cache_lookup')
+            
+            if misses:
+                # Preprocess all uncached texts into a single padded batch
+                processed_texts, lengths = self.preprocess_batch(
+                    [texts[i] for i in misses], timer, tokens=[tokens[i] for i in misses])
+                processed_texts = processed_texts.to(self.device)
+                timer.mark('tensor')
 
-            with torch.no_grad():
-                output = self.model(processed_text)
-                prediction = torch.argmax(output, dim=1).item()
+                output = self.forward(processed_texts, lengths)
+                timer.mark('forward')
+                predictions = torch.argmax(output, dim=1)
+                probabilities = torch.softmax(output, dim=1)
+                timer.mark('softmax')
+                BATCH_SIZE.observe(len(misses))
                 
-            sentiment = "Positive" if prediction == 1 else "Negative"
-            prediction_prob = torch.softmax(output, dim=1)[0][prediction].item()
-            sentiment_score = output[0][1].item() - output[0][0].item()
-            # Determine sentiment label
+                for row, i in enumerate(misses):
+                    prediction = predictions[row].item()
+                    # Determine sentiment label
+                    sentiment = "Positive" if prediction == 1 else "Negative"
+                    value = (sentiment,
+                             probabilities[row][prediction].item(),
+                             output[row][1].item() - output[row][0].item())
+                    results[i] = self.build_result(texts[i], *value, 0.0)
+                    if keys is not None:
+                        self.cache.put(keys[i], value)
             
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
+            for result in results:
+                result['processing_time'] = processing_time
+            timer.mark('postprocess')
+            timer.finish(results)
             
-            result = {
-                'request_id': request_id,
-                'text': text,
-                'prediction': sentiment,
-                'confidence': prediction_prob,
-                'sentiment_score': sentiment_score,
-                'processing_time': processing_time,
-                'success': True
-            }
-            
-            return result
+            return results
             
         except Exception as e:
-            processing_time = time.time() - start_time
-            return {
-                'request_id': request_id,
-                'text': text,
-                'prediction': 'Error',
-                'confidence': 0.0,
-                'sentiment_score': 0.0,
-                'processing_time': processing_time,
-                'success': False,
-                'error': str(e)
-            }
-
-# Global predictor instance
-predictor = SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
\ No newline at end of file
+            processing_time = time.perf_counter() - start_time
+            return [self.error_result(text, e, processing_time) for text in texts]
+    
+    def error_result(self, text: str, error: Exception, processing_time: float,
+                     request_id: str = None) -> Dict[str, Any]:
+        """Build the result dict returned for a failed prediction"""
+        return {
+            'request_id': request_id or str(uuid.uuid4()),
+            'text': text,
+            'prediction': 'Error',
+            'confidence': 0.0,
+            'sentiment_score': 0.0,
+            'processing_time': processing_time,
+            'model_version': self.version,
+            'success': False,
+            'error': str(error)
+        }
+
+class LazyPredictor:
+    """Create the real predictor on first use instead of at import time.
+
+    Attribute access is forwarded to the predictor, loading it the first
+    time; call ``load()`` or ``warm_up()`` to pay that cost up front.
+    """
+    
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+    
+    def load(self) -> SentimentPredictor:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+    
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+def create_predictor() -> SentimentPredictor:
+    """Build the predictor from the safest available model and vocab files"""
+    model_path, vocab_path = resolve_artifact_paths()
+    return SentimentPredictor(model_path, vocab_path, Config.MODEL_VERSION)
+
+def warm_up():
+    """Load every model version and run one forward pass through each"""
+    _lazy_predictor.load()
+    model_registry.warm_up()
+
+# Global predictor instance, loaded on first use
+_lazy_predictor = LazyPredictor(create_predictor)
+
+# Registry holding every live model version; starts with the default model
+# and follows MODEL_MANIFEST_PATH when set
+model_registry = ModelRegistry(
+    loader=SentimentPredictor,
+    default_version=Config.MODEL_VERSION,
+    default_predictor=_lazy_predictor,
+    manifest_path=Config.MODEL_MANIFEST_PATH,
+    poll_seconds=Config.MODEL_MANIFEST_POLL_SECONDS,
+    single_version=Config.INFERENCE_POOL_ENABLED
+)
+predictor = model_registry
+
+if Config.EAGER_MODEL_LOAD:
+    warm_up()
+
+# Coalesce concurrent requests into padded batches
+if Config.BATCHING_ENABLED:
+    predictor = MicroBatcher(predictor,
+                             max_batch_size=Config.BATCH_MAX_SIZE,
+                             max_wait_ms=Config.BATCH_MAX_WAIT_MS)
+
+# Bound how many predictions queue up behind the model, shedding the rest
+if Config.ADMISSION_CONTROL_ENABLED:
+    predictor = AdmissionController(predictor,
+                                    latency_slo_ms=Config.ADMISSION_LATENCY_SLO_MS,
+                                    queue_deadline_ms=Config.ADMISSION_QUEUE_DEADLINE_MS,
+                                    initial_limit=Config.ADMISSION_INITIAL_CONCURRENCY,
+                                    min_limit=Config.ADMISSION_MIN_CONCURRENCY,
+                                    max_limit=Config.ADMISSION_MAX_CONCURRENCY,
+                                    adaptive=Config.ADMISSION_ADAPTIVE,
+                                    degrade_max_tokens=Config.ADMISSION_DEGRADE_MAX_TOKENS,
+                                    degrade_concurrency=Config.ADMISSION_DEGRADE_CONCURRENCY)
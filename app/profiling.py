@@ -0,0 +1,104 @@
+import json
+import logging
+import random
+import threading
+from datetime import datetime
+from time import perf_counter_ns
+from typing import Any, Dict, List
+from app.monitoring import STAGE_DURATION
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Stages of the prediction path, in the order a request goes through them
+STAGES = ('queue_wait', 'cache_lookup', 'tokenize', 'vocab_lookup', 'tensor',
+          'forward', 'softmax', 'postprocess', 'db_write')
+
+# Resolve the labelled histogram children once instead of on every observation
+_stage_histograms = {stage: STAGE_DURATION.labels(stage=stage) for stage in STAGES}
+
+
+def observe_stage(stage: str, duration_ns: int):
+    """Record one stage duration measured with perf_counter_ns()"""
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = _stage_histograms[stage] = STAGE_DURATION.labels(stage=stage)
+    histogram.observe(duration_ns / 1e9)
+
+
+class StageTimer:
+    """Split the time spent on one batch into consecutive stages.
+
+    ``mark(stage)`` charges everything since the previous mark to
+    ``stage``, so each boundary costs a single clock read. ``finish``
+    records the stage histograms and, for sampled batches, writes the full
+    breakdown to the profile log.
+    """
+
+    __slots__ = ('stages', 'sampled', 'started', '_last')
+
+    def __init__(self, sampled: bool = False):
+        self.stages: Dict[str, int] = {}
+        self.sampled = sampled
+        self.started = self._last = perf_counter_ns()
+
+    def mark(self, stage: str):
+        now = perf_counter_ns()
+        self.stages[stage] = self.stages.get(stage, 0) + now - self._last
+        self._last = now
+
+    def finish(self, results: List[Dict[str, Any]] = ()):
+        for stage, duration in self.stages.items():
+            observe_stage(stage, duration)
+        if self.sampled:
+            profile_log.write(self, results)
+
+
+class _NullTimer:
+    """Stand-in used when stage metrics are switched off"""
+
+    sampled = False
+
+    def mark(self, stage: str):
+        pass
+
+    def finish(self, results=()):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def start_timer():
+    """Timer for one batch, sampled for profiling at PROFILE_SAMPLE_RATE"""
+    if not Config.STAGE_METRICS_ENABLED:
+        return NULL_TIMER
+    rate = Config.PROFILE_SAMPLE_RATE
+    return StageTimer(sampled=rate > 0 and random.random() < rate)
+
+
+class ProfileLog:
+    """Append sampled per-request stage breakdowns to a JSON lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, timer: StageTimer, results: List[Dict[str, Any]]):
+        record = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'request_ids': [result.get('request_id') for result in results],
+            'batch_size': len(results),
+            'model_version': results[0].get('model_version') if results else None,
+            'stages_us': {stage: duration / 1000 for stage, duration in timer.stages.items()},
+            'total_us': (timer._last - timer.started) / 1000
+        }
+        line = json.dumps(record) + '\n'
+        try:
+            with self._lock, open(self.path, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning("Profile log error: %s", e)
+
+
+profile_log = ProfileLog(Config.PROFILE_LOG_PATH)
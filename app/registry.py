@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.monitoring import monitor_prediction, MODEL_VERSION_LOADS
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Keep several model versions loaded and route predictions between them.
+
+    Versions are loaded (and warmed up) before they receive traffic, then
+    made live by swapping an immutable routing table in one assignment, so
+    in-flight requests finish on whichever predictor they already hold.
+    Traffic is split by percentage using a stable hash of the text, so a
+    given text always goes to the same version and stays cacheable.
+
+    With a manifest file, a background thread reloads it whenever it
+    changes, which lets every worker process pick up a new version without
+    a restart. The manifest looks like::
+
+        {
+            "versions": {
+                "v1": {"model_path": "...", "vocab_path": "..."},
+                "v2": {"model_path": "...", "vocab_path": "..."}
+            },
+            "traffic": {"v1": 90, "v2": 10}
+        }
+
+    The registry exposes the same prediction interface as
+    SentimentPredictor, and anything else is delegated to the version
+    taking the largest share of traffic.
+
+    With ``single_version`` no other version can be loaded. That is the
+    case when inference runs in the shared worker pool: every version would
+    score with the pool's one model and be tagged wrongly.
+    """
+
+    def __init__(self, loader: Callable[[str, str, str], Any], default_version: str,
+                 default_predictor: Any, manifest_path: str = None,
+                 poll_seconds: float = 10, single_version: bool = False):
+        self.loader = loader
+        self.manifest_path = manifest_path
+        self.poll_seconds = poll_seconds
+        self.single_version = single_version
+        self._predictors: Dict[str, Any] = {default_version: default_predictor}
+        self._paths: Dict[str, Tuple[str, str]] = {}
+        # Routing table: tuple of (version, cumulative upper bound in percent)
+        self._routes: Tuple[Tuple[str, float], ...] = ((default_version, 100.0),)
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._watcher = None
+        self._pid = None
+
+    # Version management
+
+    def versions(self) -> Dict[str, Dict[str, Any]]:
+        """Describe every loaded version and its share of traffic"""
+        shares = self.traffic()
+        return {
+            version: {
+                'traffic_percent': shares.get(version, 0.0),
+                'model_path': self._paths.get(version, (None, None))[0],
+                'vocab_path': self._paths.get(version, (None, None))[1]
+            }
+            for version in self._predictors
+        }
+
+    def traffic(self) -> Dict[str, float]:
+        shares, lower = {}, 0.0
+        for version, upper in self._routes:
+            shares[version] = upper - lower
+            lower = upper
+        return shares
+
+    def load_version(self, version: str, model_path: str, vocab_path: str):
+        """Load and warm up a version without sending it any traffic"""
+        if self.single_version and set(self._predictors) - {version}:
+            raise ValueError(f"Can't load version {version}: the inference pool serves a "
+                             f"single model, so only one version can be loaded")
+        predictor = self.loader(model_path, vocab_path, version)
+        warm_up_predictor(predictor)
+        with self._lock:
+            self._predictors[version] = predictor
+            self._paths[version] = (model_path, vocab_path)
+        MODEL_VERSION_LOADS.labels(model_version=version).inc()
+        return predictor
+
+    def set_traffic(self, weights: Dict[str, float]):
+        """Atomically replace the traffic split, e.g. {'v1': 90, 'v2': 10}"""
+        weights = {version: float(weight) for version, weight in weights.items() if weight > 0}
+        unknown = set(weights) - set(self._predictors)
+        if unknown:
+            raise KeyError(f"Unknown model versions: {', '.join(sorted(unknown))}")
+        if not weights:
+            raise ValueError("At least one version needs a positive traffic share")
+
+        total = sum(weights.values())
+        routes, upper = [], 0.0
+        for version in sorted(weights):
+            upper += weights[version] * 100.0 / total
+            routes.append((version, upper))
+        routes[-1] = (routes[-1][0], 100.0)
+        self._routes = tuple(routes)
+
+    def activate(self, version: str):
+        """Send all traffic to one version"""
+        self.set_traffic({version: 100})
+
+    def unload(self, version: str):
+        """Drop a version that no longer receives traffic"""
+        if version in self.traffic():
+            raise ValueError(f"Version {version} still receives traffic")
+        with self._lock:
+            self._predictors.pop(version, None)
+            self._paths.pop(version, None)
+
+    def route(self, text: str) -> Tuple[str, Any]:
+        """Pick the version for a text"""
+        self._ensure_watcher()
+        routes = self._routes
+        if len(routes) == 1:
+            version = routes[0][0]
+        else:
+            bucket = zlib.crc32(text.encode('utf-8', 'replace')) % 10000 / 100.0
+            version = next((v for v, upper in routes if bucket < upper), routes[-1][0])
+        return version, self._predictors[version]
+
+    def warm_up(self):
+        """Run one forward pass through every loaded version"""
+        with self._lock:
+            predictors = list(self._predictors.values())
+        for predictor in predictors:
+            warm_up_predictor(predictor)
+
+    def primary(self) -> Any:
+        """The predictor taking the largest share of traffic"""
+        shares = self.traffic()
+        return self._predictors[max(shares, key=shares.get)]
+
+    # Manifest handling
+
+    def sync_manifest(self):
+        """Load new versions from the manifest, then switch traffic to match it"""
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+
+        for version, paths in manifest.get('versions', {}).items():
+            model_path, vocab_path = paths['model_path'], paths['vocab_path']
+            if self._paths.get(version) != (model_path, vocab_path):
+                self.load_version(version, model_path, vocab_path)
+
+        if manifest.get('traffic'):
+            self.set_traffic(manifest['traffic'])
+        live = set(self.traffic())
+        for version in list(self._predictors):
+            if version not in manifest.get('versions', {}) and version not in live:
+                self.unload(version)
+
+    def _ensure_watcher(self):
+        if not self.manifest_path or (self._watcher is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._watcher is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch, name='model-registry',
+                                             daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            try:
+                mtime = os.path.getmtime(self.manifest_path)
+                if mtime != self._manifest_mtime:
+                    self.sync_manifest()
+                    self._manifest_mtime = mtime
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error("Model manifest error: %s", e)
+                # Don't retry a broken manifest until it changes again
+                try:
+                    self._manifest_mtime = os.path.getmtime(self.manifest_path)
+                except OSError:
+                    pass
+            time.sleep(self.poll_seconds)
+
+    # SentimentPredictor interface
+
+    @monitor_prediction
+    def predict(self, text: str) -> Dict[str, Any]:
+        """Make sentiment prediction with monitoring"""
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str], check_cache: bool = True,
+                      tokens: List[List[str]] = None) -> List[Dict[str, Any]]:
+        """Split a batch by version, run each part, and restore input order"""
+        groups: Dict[str, Tuple[Any, List[int]]] = {}
+        for i, text in enumerate(texts):
+            version, predictor = self.route(text)
+            groups.setdefault(version, (predictor, []))[1].append(i)
+
+        results = [None] * len(texts)
+        for predictor, indexes in groups.values():
+            batch = predictor.predict_batch(
+                [texts[i] for i in indexes], check_cache=check_cache,
+                tokens=[tokens[i] for i in indexes] if tokens is not None else None)
+            for i, result in zip(indexes, batch):
+                results[i] = result
+        return results
+
+    def cached_result(self, text: str, tokens: List[str] = None) -> Optional[Dict[str, Any]]:
+        return self.route(text)[1].cached_result(text, tokens)
+
+    def error_result(self, *args, **kwargs) -> Dict[str, Any]:
+        return self.primary().error_result(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.primary(), name)
+
+
+def warm_up_predictor(predictor):
+    """Run one forward pass so the first real request doesn't pay for it"""
+    batch, lengths = predictor.preprocess_batch(["warm up"])
+    predictor.forward(batch.to(predictor.device), lengths)
@@ -0,0 +1,201 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List
+from sqlalchemy import case, func, select, update, delete
+from app.models import PredictionRollup, SentimentPrediction
+from config.settings import Config
+
+GRANULARITIES = ('minute', 'hour', 'total')
+
+# Start of the single all-time bucket
+TOTAL_BUCKET = datetime(1970, 1, 1)
+
+_last_prune = 0.0
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its bucket"""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return TOTAL_BUCKET
+
+
+def aggregate(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold prediction rows into one rollup delta per bucket and sentiment"""
+    buckets = {}
+    for row in rows:
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(row['timestamp'], granularity), row['prediction'])
+            bucket = buckets.get(key)
+            confidence = row['confidence']
+            processing_time = row['processing_time']
+            if bucket is None:
+                buckets[key] = {
+                    'granularity': key[0],
+                    'bucket_start': key[1],
+                    'prediction': key[2],
+                    'count': 1,
+                    'confidence_sum': confidence,
+                    'confidence_min': confidence,
+                    'confidence_max': confidence,
+                    'processing_time_sum': processing_time,
+                    'processing_time_min': processing_time,
+                    'processing_time_max': processing_time
+                }
+                continue
+            bucket['count'] += 1
+            bucket['confidence_sum'] += confidence
+            bucket['confidence_min'] = min(bucket['confidence_min'], confidence)
+            bucket['confidence_max'] = max(bucket['confidence_max'], confidence)
+            bucket['processing_time_sum'] += processing_time
+            bucket['processing_time_min'] = min(bucket['processing_time_min'], processing_time)
+            bucket['processing_time_max'] = max(bucket['processing_time_max'], processing_time)
+    return list(buckets.values())
+
+
+def apply_rollups(session, rows: Iterable[Dict[str, Any]]):
+    """Add prediction rows to the rollup buckets inside the caller's transaction"""
+    deltas = aggregate(rows)
+    if not deltas:
+        return
+
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        _upsert(session, deltas, dialect)
+    else:
+        for delta in deltas:
+            _merge(session, delta)
+    _prune_minutes(session)
+
+
+def _combined_values(current, incoming):
+    """SET clauses that merge an incoming delta into an existing bucket row"""
+    def smaller(column):
+        return case((incoming[column] < current[column], incoming[column]), else_=current[column])
+
+    def larger(column):
+        return case((incoming[column] > current[column], incoming[column]), else_=current[column])
+
+    return {
+        'count': current['count'] + incoming['count'],
+        'confidence_sum': current['confidence_sum'] + incoming['confidence_sum'],
+        'confidence_min': smaller('confidence_min'),
+        'confidence_max': larger('confidence_max'),
+        'processing_time_sum': current['processing_time_sum'] + incoming['processing_time_sum'],
+        'processing_time_min': smaller('processing_time_min'),
+        'processing_time_max': larger('processing_time_max'),
+    }
+
+
+def _upsert(session, deltas, dialect):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+    table = PredictionRollup.__table__
+    for delta in deltas:
+        statement = insert(table).values(**delta)
+        statement = statement.on_conflict_do_update(
+            index_elements=['granularity', 'bucket_start', 'prediction'],
+            set_=_combined_values(table.c, statement.excluded)
+        )
+        session.execute(statement)
+
+
+def _merge(session, delta):
+    table = PredictionRollup.__table__
+    bucket = (
+        (table.c.granularity == delta['granularity'])
+        & (table.c.bucket_start == delta['bucket_start'])
+        & (table.c.prediction == delta['prediction'])
+    )
+    exists = session.execute(select(table.c.id).where(bucket).with_for_update()).first()
+    if exists is None:
+        session.execute(table.insert().values(**delta))
+        return
+    incoming = {column: value for column, value in delta.items()}
+    session.execute(update(table).where(bucket).values(**_combined_values(table.c, incoming)))
+
+
+def _prune_minutes(session):
+    """Drop minute buckets past their retention, at most once a minute"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < 60:
+        return
+    _last_prune = now
+    cutoff = datetime.utcnow() - timedelta(hours=Config.ROLLUP_MINUTE_RETENTION_HOURS)
+    session.execute(
+        delete(PredictionRollup)
+        .where(PredictionRollup.granularity == 'minute')
+        .where(PredictionRollup.bucket_start < cutoff)
+    )
+
+
+def rebuild_rollups(session, batch_size: int = 10000):
+    """Recompute every rollup bucket from the predictions table"""
+    session.execute(delete(PredictionRollup))
+    query = session.query(
+        SentimentPrediction.timestamp,
+        SentimentPrediction.prediction,
+        SentimentPrediction.confidence,
+        SentimentPrediction.processing_time
+    ).execution_options(yield_per=batch_size)
+
+    batch = []
+    for row in query:
+        batch.append(row._asdict())
+        if len(batch) >= batch_size:
+            apply_rollups(session, batch)
+            batch = []
+    apply_rollups(session, batch)
+
+
+def sentiment_totals(session) -> List[Dict[str, Any]]:
+    """All-time statistics per sentiment, read from the 'total' buckets"""
+    rows = session.query(PredictionRollup)\
+        .filter(PredictionRollup.granularity == 'total')\
+        .order_by(PredictionRollup.prediction)\
+        .all()
+    return [
+        {
+            'sentiment': row.prediction,
+            'count': row.count,
+            'confidence_sum': row.confidence_sum,
+            'confidence_min': row.confidence_min,
+            'confidence_max': row.confidence_max,
+            'processing_time_sum': row.processing_time_sum,
+            'processing_time_min': row.processing_time_min,
+            'processing_time_max': row.processing_time_max
+        }
+        for row in rows
+    ]
+
+
+def count_since(session, since: datetime) -> int:
+    """Count predictions since a time, to minute precision.
+
+    Whole hours come from hour buckets and the partial hour at the start of
+    the window from minute buckets, so at most ~60 + 24 rows per sentiment
+    are read for a day-long window.
+    """
+    first_minute = bucket_start(since, 'minute')
+    if first_minute < since:
+        first_minute += timedelta(minutes=1)
+    first_hour = bucket_start(first_minute, 'hour')
+    if first_hour < first_minute:
+        first_hour += timedelta(hours=1)
+
+    hours = session.query(func.sum(PredictionRollup.count))\
+        .filter(PredictionRollup.granularity == 'hour')\
+        .filter(PredictionRollup.bucket_start >= first_hour)\
+        .scalar() or 0
+    minutes = session.query(func.sum(PredictionRollup.count))\
+        .filter(PredictionRollup.granularity == 'minute')\
+        .filter(PredictionRollup.bucket_start >= first_minute)\
+        .filter(PredictionRollup.bucket_start < first_hour)\
+        .scalar() or 0
+    return int(hours + minutes)
@@ -0,0 +1,158 @@
+import numpy as np
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple
+from app.inference import MAX_SEQ_LEN, EOS_ID, PAD_ID, PADDED_LENGTH
+
+# torchtext's "basic_english" tokenizer applies a chain of regex
+# substitutions, in order. Every pattern except "<br />" is a single
+# character, so the ones before it collapse into one str.translate() and
+# the ones after it into another, with the "<br />" str.replace() kept in
+# between: dropping '"' can complete a "<br />" ('<br" />'), and mapping
+# ';' or ':' to a space must not create one ('<br;/>').
+_BEFORE_BR_TABLE = str.maketrans({
+    "'": " '  ",
+    '"': "",
+    '.': " . ",
+})
+_AFTER_BR_TABLE = str.maketrans({
+    ',': " , ",
+    '(': " ( ",
+    ')': " ) ",
+    '!': " ! ",
+    '?': " ? ",
+    ';': " ",
+    ':': " ",
+})
+
+
+def basic_english_tokenize(text: str) -> List[str]:
+    """Tokenize exactly like torchtext's get_tokenizer("basic_english")"""
+    return text.lower().translate(_BEFORE_BR_TABLE).replace('<br />', ' ')\
+        .translate(_AFTER_BR_TABLE).split()
+
+
+# Header of the flat token table file: magic, token count, default index
+_TABLE_MAGIC = b'SNTVOCB1'
+_TABLE_HEADER = np.dtype([('magic', 'S8'), ('count', '<u8'), ('default_index', '<i8')])
+
+
+class VocabTable:
+    """Flat token -> id lookup table built once from a torchtext Vocab"""
+
+    def __init__(self, itos: List[str], default_index: int = None):
+        self.itos = itos
+        self.stoi: Dict[str, int] = {token: i for i, token in enumerate(itos)}
+        self.default_index = default_index
+
+    @classmethod
+    def from_vocab(cls, vocab) -> 'VocabTable':
+        return cls(vocab.get_itos(), vocab.get_default_index())
+
+    @staticmethod
+    def is_table_file(path: str) -> bool:
+        with open(path, 'rb') as f:
+            return f.read(len(_TABLE_MAGIC)) == _TABLE_MAGIC
+
+    @classmethod
+    def load(cls, path: str) -> 'VocabTable':
+        """Load a token table file written by save(), without unpickling anything.
+
+        Lookups go through a dict built from the tokens, so the file is
+        read in full rather than kept mapped.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _TABLE_HEADER.itemsize:
+            raise ValueError(f"{path} is not a vocab token table")
+        header = np.frombuffer(data, dtype=_TABLE_HEADER, count=1)[0]
+        if header['magic'] != _TABLE_MAGIC:
+            raise ValueError(f"{path} is not a vocab token table")
+        blob = data[_TABLE_HEADER.itemsize:].decode('utf-8')
+        itos = blob.split('\n') if header['count'] else []
+        if len(itos) != header['count']:
+            raise ValueError(f"{path} is truncated or corrupt")
+        default_index = int(header['default_index'])
+        return cls(itos, default_index if default_index >= 0 else None)
+
+    def save(self, path: str):
+        """Write the table as a header followed by newline-separated UTF-8 tokens"""
+        if any('\n' in token for token in self.itos):
+            raise ValueError("Tokens containing newlines cannot be stored in a token table")
+        header = np.zeros(1, dtype=_TABLE_HEADER)
+        header['magic'] = _TABLE_MAGIC
+        header['count'] = len(self.itos)
+        header['default_index'] = -1 if self.default_index is None else self.default_index
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            f.write('\n'.join(self.itos).encode('utf-8'))
+
+    def __len__(self):
+        return len(self.itos)
+
+    def __call__(self, tokens: List[str]) -> List[int]:
+        """Look up ids like a torchtext Vocab does"""
+        return list(self.lookup(tokens))
+
+    def lookup(self, tokens: Iterable[str]) -> Iterable[int]:
+        """Lazily map tokens to ids, falling back to the default index"""
+        if self.default_index is None:
+            return map(self.stoi.__getitem__, tokens)
+        get = self.stoi.get
+        default = self.default_index
+        return (get(token, default) for token in tokens)
+
+
+class TextEncoder:
+    """Tokenize and encode texts straight into padded int64 buffers"""
+
+    def __init__(self, table: VocabTable, max_seq_len: int = MAX_SEQ_LEN):
+        self.table = table
+        self.max_seq_len = max_seq_len
+
+    def tokenize(self, text: str) -> List[str]:
+        """The tokens of a text the model sees, cut at ``max_seq_len``"""
+        return basic_english_tokenize(text)[:self.max_seq_len]
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one text into ids, truncated and terminated with <eos>"""
+        tokens = basic_english_tokenize(text)
+        length = min(len(tokens), self.max_seq_len)
+        ids = np.empty(length + 1, dtype=np.int64)
+        ids[:length] = np.fromiter(self.table.lookup(islice(tokens, length)), np.int64, length)
+        ids[length] = EOS_ID
+        return ids
+
+    def encode_batch(self, texts: List[str], out: np.ndarray = None,
+                     padded_length: int = PADDED_LENGTH, timer=None,
+                     tokens: List[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode texts into a ``len(texts) x padded_length`` <pad>-filled buffer.
+
+        Returns the buffer and the number of ids (including <eos>) in each
+        row. A preallocated ``out`` buffer of at least that shape can be
+        passed in to avoid allocating a new one. Texts already split by
+        ``tokenize()`` can pass those ``tokens`` instead of being tokenized
+        again. A ``timer`` (see app/profiling.py) gets separate 'tokenize'
+        and 'vocab_lookup' marks.
+        """
+        token_lists = tokens
+        if token_lists is None:
+            token_lists = [basic_english_tokenize(text) for text in texts]
+            if timer is not None:
+                timer.mark('tokenize')
+
+        if out is None:
+            out = np.empty((len(texts), padded_length), dtype=np.int64)
+        out = out[:len(texts), :padded_length]
+        out.fill(PAD_ID)
+        lengths = np.empty(len(texts), dtype=np.int64)
+
+        for row, tokens in enumerate(token_lists):
+            length = min(len(tokens), self.max_seq_len)
+            out[row, :length] = np.fromiter(
+                self.table.lookup(islice(tokens, length)), np.int64, length
+            )
+            out[row, length] = EOS_ID
+            lengths[row] = length + 1
+        if timer is not None:
+            timer.mark('vocab_lookup')
+        return out, lengths
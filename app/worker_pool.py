@@ -0,0 +1,311 @@
+import json
+import multiprocessing
+import os
+import signal
+import struct
+import threading
+from multiprocessing.connection import Client, Listener, wait
+from typing import List, Tuple, Union
+import numpy as np
+import torch
+from app.inference import packed_forward, supports_packed
+
+# Arrays cross the socket as raw bytes behind a JSON header, never pickled,
+# so a peer can only ever make a worker read numbers
+DTYPES = {np.dtype(np.int64).str, np.dtype(np.float32).str}
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+_HEADER_LENGTH = struct.Struct('!I')
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Turn 'host:port' into a TCP address; anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
+def worker_address(address: Union[str, Tuple[str, int]], index: int) -> Union[str, Tuple[str, int]]:
+    """Where worker ``index`` of a pool at ``address`` listens: 'path.N' or port + N"""
+    if isinstance(address, tuple):
+        host, port = address
+        return host, port + index
+    return f'{address}.{index}'
+
+
+def encode_message(arrays: List[np.ndarray]) -> bytes:
+    """Frame int64/float32 arrays as a length-prefixed header plus their bytes"""
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    for array in arrays:
+        if array.dtype.str not in DTYPES:
+            raise ValueError(f"Unsupported dtype {array.dtype}")
+    header = json.dumps({'status': 'ok', 'arrays': [
+        {'dtype': array.dtype.str, 'shape': list(array.shape)} for array in arrays
+    ]}).encode()
+    return b''.join([_HEADER_LENGTH.pack(len(header)), header] + [a.tobytes() for a in arrays])
+
+
+def encode_error(message: str) -> bytes:
+    header = json.dumps({'status': 'error', 'message': message}).encode()
+    return _HEADER_LENGTH.pack(len(header)) + header
+
+
+def decode_message(data: bytes) -> List[np.ndarray]:
+    """Inverse of ``encode_message``; an error response raises RuntimeError.
+
+    The arrays share one writable copy of ``data``, as torch.from_numpy needs.
+    """
+    view = memoryview(bytearray(data))
+    try:
+        size, = _HEADER_LENGTH.unpack_from(view)
+        header = json.loads(bytes(view[_HEADER_LENGTH.size:_HEADER_LENGTH.size + size]))
+    except (struct.error, ValueError) as e:
+        raise ValueError(f"Malformed inference message: {e}")
+    if header.get('status') == 'error':
+        raise RuntimeError(header.get('message', 'Inference worker error'))
+    arrays = []
+    offset = _HEADER_LENGTH.size + size
+    for spec in header['arrays']:
+        if spec['dtype'] not in DTYPES:
+            raise ValueError(f"Unsupported dtype {spec['dtype']}")
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(int(dim) for dim in spec['shape'])
+        if any(dim < 0 for dim in shape):
+            raise ValueError(f"Invalid shape {shape}")
+        end = offset + int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        if end > len(view):
+            raise ValueError("Inference message is shorter than its header says")
+        arrays.append(np.frombuffer(view[offset:end], dtype=dtype).reshape(shape))
+        offset = end
+    if offset != len(view):
+        raise ValueError("Inference message is longer than its header says")
+    return arrays
+
+
+class InferencePool:
+    """Serve SentiNN forward passes from a fixed set of worker processes.
+
+    The model is loaded once and its parameters are moved into shared
+    memory before the workers are forked, so every worker reads the same
+    physical copy of the weights. Worker N listens on its own socket,
+    ``worker_address(address, N)``, so a client can send each batch to the
+    workers that are free instead of whichever one the kernel picked for
+    its connection. Each worker limits torch to ``threads_per_worker`` threads so
+    the pool as a whole does not oversubscribe the cores.
+
+    Requests are ``(token_ids, lengths)`` int64 arrays as produced by
+    ``TextEncoder.encode_batch``; responses are float32 logits, both framed
+    by ``encode_message``. Connections must authenticate with ``authkey``,
+    which is required, and a Unix socket is only accessible to its owner.
+    This relies on fork() and is meant for Linux deployments.
+    """
+
+    def __init__(self, model, address: str, workers: int = 2,
+                 threads_per_worker: int = 1, authkey: bytes = None,
+                 packed: bool = True, tolerance: float = 1e-6):
+        if not authkey:
+            raise ValueError("INFERENCE_POOL_AUTHKEY must be set to start the inference pool")
+        self.model = model
+        self.address = parse_address(address)
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.authkey = authkey
+        self.packed = packed and supports_packed(model)
+        self.tolerance = tolerance
+        self._processes = []
+        self._listeners = []
+
+    def start(self):
+        """Share the weights, open the sockets and fork the workers"""
+        self.model.share_memory()
+        for index in range(self.workers):
+            address = worker_address(self.address, index)
+            if isinstance(address, str) and os.path.exists(address):
+                os.unlink(address)
+            self._listeners.append(Listener(address, authkey=self.authkey))
+            if isinstance(address, str):
+                os.chmod(address, 0o600)
+        context = multiprocessing.get_context('fork')
+        for index, listener in enumerate(self._listeners):
+            process = context.Process(target=self._worker_main, args=(listener,),
+                                      name=f'inference-worker-{index}', daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def serve_forever(self):
+        """Start the pool and block until interrupted"""
+        self.start()
+        try:
+            for process in self._processes:
+                process.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        for listener in self._listeners:
+            listener.close()
+        self._listeners = []
+
+    def _worker_main(self, listener: Listener):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        torch.set_num_threads(self.threads_per_worker)
+        # Clients keep their connections open, so a worker serves all the
+        # connections it accepted, whichever has a request ready; the
+        # accept thread wakes the loop when a new one arrives.
+        connections = []
+        lock = threading.Lock()
+        wakeup_reader, wakeup_writer = multiprocessing.Pipe(duplex=False)
+
+        def accept():
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    continue
+                with lock:
+                    connections.append(conn)
+                wakeup_writer.send_bytes(b'')
+
+        threading.Thread(target=accept, name='inference-accept', daemon=True).start()
+        while True:
+            with lock:
+                ready = list(connections)
+            for conn in wait(ready + [wakeup_reader]):
+                if conn is wakeup_reader:
+                    wakeup_reader.recv_bytes()
+                    continue
+                try:
+                    request = conn.recv_bytes(MAX_MESSAGE_BYTES)
+                    conn.send_bytes(self._handle(request))
+                except (EOFError, OSError):
+                    with lock:
+                        connections.remove(conn)
+                    conn.close()
+
+    def _handle(self, request: bytes) -> bytes:
+        try:
+            batch, lengths = decode_message(request)
+            return encode_message([self._forward(batch, lengths)])
+        except Exception as e:
+            return encode_error(f"Inference worker error: {e}")
+
+    def _forward(self, batch: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        batch = torch.from_numpy(batch)
+        lengths = torch.from_numpy(lengths)
+        with torch.no_grad():
+            if self.packed:
+                output = packed_forward(self.model, batch, lengths, tolerance=self.tolerance)
+            else:
+                output = self.model(batch)
+        return output.numpy()
+
+
+class PoolClient:
+    """Send tokenized batches to an InferencePool and wait for the logits.
+
+    ``workers`` is the size of the pool. Each batch is split into one
+    chunk per worker (fewer for a batch with fewer rows), the chunks go to
+    the workers with the fewest of this client's requests in flight, and
+    every chunk is sent before any response is read, so even a single
+    calling thread such as the micro-batcher keeps the whole pool busy.
+    Connections are kept open for reuse by any thread, so the
+    authentication handshake happens once per connection rather than per
+    batch. A connection the pool dropped is reopened once before giving up.
+    """
+
+    def __init__(self, address: str, authkey: bytes = None, workers: int = 1):
+        if not authkey:
+            raise ValueError("INFERENCE_POOL_AUTHKEY must be set to use the inference pool")
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.addresses = [worker_address(self.address, index) for index in range(max(1, workers))]
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = [[] for _ in self.addresses]
+        self._in_flight = [0] * len(self.addresses)
+
+    def forward(self, batch: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        workers, conns = self._acquire(max(1, min(len(batch), len(self.addresses))))
+        requests = [encode_message([part, part_lengths]) for part, part_lengths
+                    in zip(np.array_split(batch, len(workers)),
+                           np.array_split(lengths, len(workers)))]
+        try:
+            retried = [False] * len(workers)
+            for index, request in enumerate(requests):
+                try:
+                    conns[index].send_bytes(request)
+                except (EOFError, OSError):
+                    self._reconnect(workers, conns, index)
+                    conns[index].send_bytes(request)
+                    retried[index] = True
+            responses = []
+            for index, request in enumerate(requests):
+                try:
+                    responses.append(conns[index].recv_bytes(MAX_MESSAGE_BYTES))
+                except (EOFError, OSError):
+                    if retried[index]:
+                        raise
+                    self._reconnect(workers, conns, index)
+                    conns[index].send_bytes(request)
+                    responses.append(conns[index].recv_bytes(MAX_MESSAGE_BYTES))
+        except BaseException:
+            # The other connections may still have a response on the way
+            self._release(workers, conns, broken=True)
+            raise
+        self._release(workers, conns)
+        logits = [decode_message(response)[0] for response in responses]
+        return logits[0] if len(logits) == 1 else np.concatenate(logits)
+
+    def _acquire(self, count: int) -> Tuple[List[int], list]:
+        """Pick the ``count`` least busy workers and a connection to each"""
+        # Connections inherited across fork() belong to the parent
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            workers = sorted(range(len(self.addresses)), key=self._in_flight.__getitem__)[:count]
+            conns = []
+            for worker in workers:
+                self._in_flight[worker] += 1
+                conns.append(self._idle[worker].pop() if self._idle[worker] else None)
+        try:
+            for index, worker in enumerate(workers):
+                if conns[index] is None:
+                    conns[index] = Client(self.addresses[worker], authkey=self.authkey)
+        except BaseException:
+            self._release(workers, conns, broken=True)
+            raise
+        return workers, conns
+
+    def _reconnect(self, workers: List[int], conns: list, index: int):
+        conns[index].close()
+        conns[index] = None
+        conns[index] = Client(self.addresses[workers[index]], authkey=self.authkey)
+
+    def _release(self, workers: List[int], conns: list, broken: bool = False):
+        with self._lock:
+            for worker, conn in zip(workers, conns):
+                self._in_flight[worker] -= 1
+                if conn is None:
+                    continue
+                if broken:
+                    conn.close()
+                else:
+                    self._idle[worker].append(conn)
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            for idle in self._idle:
+                while idle:
+                    idle.pop().close()
@@ -0,0 +1,147 @@
+"""Latency under overload with and without admission control.
+
+Scores random reviews with a randomly initialized SentiNN behind the
+micro-batcher, as the webapp does. The closed-loop capacity is measured first.
+Then requests arrive open-loop (Poisson, one thread each, like a threaded
+server) at ``--overload`` times that capacity for ``--duration`` seconds,
+first straight into the batcher and then through an AdmissionController
+with the given SLO. For each run it reports how many requests were served
+in full, degraded or shed, latency percentiles of the answered ones, and
+goodput: requests answered within the SLO per second. The prediction cache
+is off, so only truncated scoring can degrade a request. Prints JSON.
+
+    python benchmarks/bench_admission.py [--duration 10] [--overload 2] [--slo-ms 500]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import build_artifacts, make_texts, percentile
+
+
+def capacity(batcher, texts, seconds: float = 3, clients: int = 32) -> float:
+    """Predictions per second with ``clients`` callers back to back"""
+    done = [0]
+    deadline = time.monotonic() + seconds
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < deadline:
+            batcher.predict(texts[i % len(texts)])
+            i += clients
+            done[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return done[0] / seconds
+
+
+def offered_load(predict, texts, rate: float, duration: float, slo: float, seed: int) -> dict:
+    from app.admission import Overloaded
+
+    rng = random.Random(seed)
+    outcomes = []
+    lock = threading.Lock()
+
+    def request(text):
+        start = time.perf_counter()
+        try:
+            result = predict(text)
+            outcome = result.get('degraded', 'full')
+        except Overloaded:
+            outcome = 'shed'
+        with lock:
+            outcomes.append((outcome, time.perf_counter() - start))
+
+    threads = []
+    start = time.monotonic()
+    next_arrival = start
+    while next_arrival < start + duration:
+        time.sleep(max(0.0, next_arrival - time.monotonic()))
+        thread = threading.Thread(target=request, args=(rng.choice(texts),), daemon=True)
+        thread.start()
+        threads.append(thread)
+        next_arrival += rng.expovariate(rate)
+    for thread in threads:
+        thread.join()
+
+    answered = [latency for outcome, latency in outcomes if outcome != 'shed']
+    summary = {
+        'requests': len(outcomes),
+        'full': sum(outcome == 'full' for outcome, _ in outcomes),
+        'truncated': sum(outcome == 'truncated' for outcome, _ in outcomes),
+        'shed': sum(outcome == 'shed' for outcome, _ in outcomes),
+        'goodput_per_second': sum(latency <= slo for latency in answered) / duration
+    }
+    if answered:
+        summary['p50_ms'] = percentile(answered, 50) * 1000
+        summary['p99_ms'] = percentile(answered, 99) * 1000
+        summary['max_ms'] = max(answered) * 1000
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--overload', type=float, default=2.0,
+                        help='Arrival rate as a multiple of the measured capacity')
+    parser.add_argument('--slo-ms', type=float, default=500)
+    parser.add_argument('--queue-deadline-ms', type=float, default=150)
+    parser.add_argument('--vocab-size', type=int, default=51719)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='sentiment-bench-')
+    os.environ['CACHE_ENABLED'] = 'false'
+    os.environ['MODEL_MANIFEST_PATH'] = ''
+    weights_path, table_path, words = build_artifacts(directory, args.vocab_size, 128, 256,
+                                                      args.seed)
+    texts = make_texts(random.Random(args.seed), words, 256, 20, 200)
+
+    from app.admission import AdmissionController
+    from app.batching import MicroBatcher
+    from app.prediction import SentimentPredictor
+    from config.settings import Config
+
+    batcher = MicroBatcher(SentimentPredictor(weights_path, table_path),
+                           max_batch_size=Config.BATCH_MAX_SIZE,
+                           max_wait_ms=Config.BATCH_MAX_WAIT_MS)
+    measured = capacity(batcher, texts)
+    rate = measured * args.overload
+    controller = AdmissionController(batcher, latency_slo_ms=args.slo_ms,
+                                     queue_deadline_ms=args.queue_deadline_ms,
+                                     initial_limit=Config.ADMISSION_INITIAL_CONCURRENCY,
+                                     degrade_max_tokens=Config.ADMISSION_DEGRADE_MAX_TOKENS,
+                                     degrade_concurrency=Config.ADMISSION_DEGRADE_CONCURRENCY)
+    slo = args.slo_ms / 1000
+    report = {
+        'capacity_per_second': measured,
+        'arrival_rate_per_second': rate,
+        'slo_ms': args.slo_ms,
+        'results': {
+            'no_admission_control': offered_load(batcher.predict, texts, rate, args.duration,
+                                                 slo, args.seed),
+            'admission_control': offered_load(controller.predict, texts, rate, args.duration,
+                                              slo, args.seed),
+        },
+        'final_limit': controller.limit,
+        'service_time_ms': controller.service_time * 1000 if controller.service_time else None
+    }
+    batcher.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
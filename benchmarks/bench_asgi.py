@@ -0,0 +1,180 @@
+"""Compare the Flask app under gunicorn with the ASGI app under uvicorn.
+
+Both servers are started as subprocesses against the synthetic offline
+model from bench_suite.py and a throwaway database. Each is then driven by
+an asyncio load generator that keeps ``concurrency`` HTTP/1.1 keep-alive
+connections open, each sending ``POST /api/predict`` requests back to back
+for ``--duration`` seconds. Reports requests/s, p50/p95/p99 latency and
+failed requests (connection errors, timeouts, non-200 responses) per
+server and concurrency level. Prints JSON.
+
+    python benchmarks/bench_asgi.py [--concurrency 16,256,1024] [--workers 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import build_artifacts, make_texts, percentile
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_commands(port: int, workers: int, threads: int) -> dict:
+    return {
+        'flask_gunicorn': [sys.executable, '-m', 'gunicorn', '-w', str(workers),
+                           '--threads', str(threads), '--backlog', '4096',
+                           '-b', f'127.0.0.1:{port}', 'webapp.app:app'],
+        'asgi_uvicorn': [sys.executable, '-m', 'uvicorn', '--workers', str(workers),
+                         '--backlog', '4096', '--log-level', 'warning',
+                         '--port', str(port), 'webapp.asgi:app'],
+    }
+
+
+async def request(reader, writer, body: bytes, timeout: float) -> int:
+    writer.write(b'POST /api/predict HTTP/1.1\r\nHost: localhost\r\n'
+                 b'Content-Type: application/json\r\n'
+                 b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+    await writer.drain()
+    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    await asyncio.wait_for(reader.readexactly(length), timeout)
+    return status
+
+
+async def connection(port, texts, deadline, timeout, latencies, failures):
+    rng = random.Random()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection('127.0.0.1', port), timeout)
+    except Exception:
+        failures['connect'] += 1
+        return
+    try:
+        while time.monotonic() < deadline:
+            body = json.dumps({'text': rng.choice(texts)}).encode()
+            start = time.perf_counter()
+            try:
+                status = await request(reader, writer, body, timeout)
+            except asyncio.TimeoutError:
+                failures['timeout'] += 1
+                return
+            except Exception:
+                failures['error'] += 1
+                return
+            if status != 200:
+                failures['status'] += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load(port, texts, concurrency, duration, timeout) -> dict:
+    latencies = []
+    failures = {'connect': 0, 'timeout': 0, 'error': 0, 'status': 0}
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        connection(port, texts, deadline, timeout, latencies, failures)
+        for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    result = {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed,
+        'failures': failures
+    }
+    if latencies:
+        result.update({
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000
+        })
+    return result
+
+
+def wait_until_ready(port: int, process, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1) as s:
+                body = b'{"text": "warm up"}'
+                s.sendall(b'POST /api/predict HTTP/1.1\r\nHost: localhost\r\n'
+                          b'Content-Type: application/json\r\nConnection: close\r\n'
+                          b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+                if s.recv(12).endswith(b'200'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('Server did not become ready')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='16,256,1024')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    # Thousands of sockets need more than the usual 1024 file descriptors
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    directory = tempfile.mkdtemp(prefix='sentiment-bench-')
+    weights_path, table_path, words = build_artifacts(directory, 51719, 128, 256, args.seed)
+    texts = make_texts(random.Random(args.seed), words, 256, 5, 120)
+
+    report = {'workers': args.workers, 'gunicorn_threads': args.threads,
+              'duration_seconds': args.duration, 'results': {}}
+    for name, command in server_commands(free_port(), args.workers, args.threads).items():
+        port = int(command[command.index('-b') + 1].rsplit(':', 1)[1]) if '-b' in command \
+            else int(command[command.index('--port') + 1])
+        env = dict(os.environ,
+                   DATABASE_URL='sqlite:///' + os.path.join(directory, f'{name}.db'),
+                   MODEL_WEIGHTS_PATH=weights_path, VOCAB_TABLE_PATH=table_path,
+                   MODEL_MANIFEST_PATH='', CACHE_ENABLED='false')
+        process = subprocess.Popen(command, cwd=ROOT, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(port, process)
+            report['results'][name] = [
+                asyncio.run(load(port, texts, level, args.duration, args.timeout))
+                for level in levels
+            ]
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Compare inference backends and embedding dtypes against the fp32 eager model.
+
+For every backend x embedding dtype this reports, on a held-out set:
+
+* drift: how often the predicted label differs from fp32 eager, and the
+  mean / max absolute difference in positive-class probability
+* latency: p50 / p95 milliseconds per forward pass at batch sizes 1 and 32
+* memory: serialized model size and process RSS after loading
+
+Each configuration runs in a fresh interpreter so memory numbers are not
+polluted by the others. Prints JSON.
+
+    python benchmarks/bench_backends.py [--texts reviews.txt] [--samples 512]
+
+``--texts`` is a file with one review per line. Without it, random
+sequences of vocabulary tokens are used, which is fine for latency and
+memory but only a rough proxy for drift on real reviews.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BATCH_SIZES = (1, 32)
+
+
+def load_texts(path: str, samples: int, vocab) -> list:
+    if path:
+        with open(path, encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts[:samples]
+    rng = random.Random(0)
+    tokens = vocab.itos[3:]
+    return [' '.join(rng.choices(tokens, k=rng.randint(5, 300))) for _ in range(samples)]
+
+
+def rss_mb() -> float:
+    """Resident set size of this process, in MB (Linux)"""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def serialized_mb(model) -> float:
+    import torch
+    buffer = io.BytesIO()
+    if isinstance(model, torch.jit.ScriptModule):
+        torch.jit.save(model, buffer)
+    else:
+        torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2 ** 20
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def run_config(backend: str, embedding_dtype: str, data_path: str, repeat: int) -> dict:
+    """Measure one configuration; runs in its own interpreter"""
+    import numpy as np
+    import torch
+    from app.inference import packed_forward, supports_packed
+    from app.model_loading import load_model
+    from app.optimization import optimize_model
+    from config.settings import Config
+
+    data = np.load(data_path)
+    batch, lengths, reference = (torch.from_numpy(data['batch']),
+                                 torch.from_numpy(data['lengths']), data['reference'])
+
+    baseline_rss = rss_mb()
+    model = optimize_model(load_model(data['model_path'].item()), backend, embedding_dtype)
+    packed = Config.PACKED_INFERENCE and supports_packed(model)
+
+    def forward(rows, row_lengths):
+        with torch.no_grad():
+            if packed:
+                return packed_forward(model, rows, row_lengths,
+                                      tolerance=Config.PACKED_TAIL_TOLERANCE)
+            return model(rows)
+
+    forward(batch[:1], lengths[:1])
+    loaded_rss = rss_mb() - baseline_rss
+
+    probabilities = []
+    for start in range(0, len(batch), 32):
+        logits = forward(batch[start:start + 32], lengths[start:start + 32])
+        probabilities.append(torch.softmax(logits, dim=1)[:, 1].numpy())
+    probabilities = np.concatenate(probabilities)
+    difference = np.abs(probabilities - reference)
+
+    latency = {}
+    for size in BATCH_SIZES:
+        timings = []
+        for i in range(repeat):
+            start = (i * size) % max(1, len(batch) - size)
+            rows, row_lengths = batch[start:start + size], lengths[start:start + size]
+            began = time.perf_counter()
+            forward(rows, row_lengths)
+            timings.append((time.perf_counter() - began) * 1000)
+        latency[f'batch_{size}'] = {
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95)
+        }
+
+    return {
+        'backend': backend,
+        'embedding_dtype': embedding_dtype,
+        'packed': packed,
+        'drift': {
+            'label_disagreement': float(np.mean((probabilities >= 0.5) != (reference >= 0.5))),
+            'mean_abs_probability_diff': float(difference.mean()),
+            'max_abs_probability_diff': float(difference.max())
+        },
+        'latency': latency,
+        'memory': {
+            'serialized_mb': serialized_mb(model),
+            'rss_after_load_mb': loaded_rss
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', help='held-out reviews, one per line')
+    parser.add_argument('--samples', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.config:
+        backend, embedding_dtype = args.config.split(',')
+        print(json.dumps(run_config(backend, embedding_dtype, args.data, args.repeat)))
+        return
+
+    import numpy as np
+    import torch
+    from app.model_loading import load_model, load_vocab_table, resolve_artifact_paths
+    from app.optimization import EMBEDDING_DTYPES, INFERENCE_BACKENDS
+    from app.tokenization import TextEncoder
+
+    model_path, vocab_path = resolve_artifact_paths()
+    vocab = load_vocab_table(vocab_path)
+    texts = load_texts(args.texts, args.samples, vocab)
+    batch, lengths = TextEncoder(vocab).encode_batch(texts)
+
+    # The fp32 eager model over the full padded sequence is the reference
+    model = load_model(model_path)
+    with torch.no_grad():
+        logits = torch.cat([model(torch.from_numpy(batch[i:i + 32]))
+                            for i in range(0, len(batch), 32)])
+    reference = torch.softmax(logits, dim=1)[:, 1].numpy()
+
+    data_path = os.path.join(tempfile.mkdtemp(), 'heldout.npz')
+    np.savez(data_path, batch=batch, lengths=lengths, reference=reference,
+             model_path=np.array(model_path))
+
+    results = []
+    for backend in INFERENCE_BACKENDS:
+        for embedding_dtype in EMBEDDING_DTYPES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--config',
+                 f'{backend},{embedding_dtype}', '--data', data_path,
+                 '--repeat', str(args.repeat)],
+                cwd=ROOT, check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps({'samples': len(texts), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
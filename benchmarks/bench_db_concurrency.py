@@ -0,0 +1,182 @@
+"""Concurrent reads and writes against one SQLite file, before and after tuning.
+
+Mirrors the webapp and dbapp sharing a database: a writer process
+inserts batches of prediction rows with ``bulk_save_predictions`` from
+``--writers`` threads (as write-behind queues do) while a reader process
+runs the dbapp's queries (a keyset page of predictions and the rollup
+stats) through read sessions from ``--readers`` threads.
+Each configuration runs in a fresh subprocess so its settings are read from
+the environment like in production:
+
+* baseline: rollback journal, synchronous=FULL, the default 2 MB page cache
+* tuned: the defaults in config/settings.py (WAL, synchronous=NORMAL,
+  16 MB cache)
+
+Both use the same busy timeout. Reports rows written and queries answered
+per second, p50/p99 latency of each, and operations that failed with
+"database is locked". Prints JSON.
+
+    python benchmarks/bench_db_concurrency.py [--duration 10] [--writers 2] [--readers 8]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import percentile
+
+CONFIGURATIONS = {
+    'baseline': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                 'SQLITE_CACHE_SIZE_KB': '2000'},
+    'tuned': {},
+}
+
+
+def make_results(count: int):
+    return [
+        {
+            'request_id': str(uuid.uuid4()),
+            'text': f'benchmark prediction text number {i}',
+            'prediction': 'Positive' if i % 2 else 'Negative',
+            'confidence': 0.5 + (i % 50) / 100,
+            'sentiment_score': 1.0,
+            'processing_time': 0.01,
+            'model_version': 'bench',
+            'success': True
+        }
+        for i in range(count)
+    ]
+
+
+def summarize(latencies, errors, elapsed, rows_per_op=1) -> dict:
+    summary = {
+        'operations': len(latencies),
+        'per_second': len(latencies) * rows_per_op / elapsed,
+        'locked_errors': errors
+    }
+    if latencies:
+        summary['p50_ms'] = percentile(latencies, 50) * 1000
+        summary['p99_ms'] = percentile(latencies, 99) * 1000
+    return summary
+
+
+def run_role(role: str, args, start_at: float, results):
+    """One side of the workload in its own process, like the webapp or the dbapp"""
+    from sqlalchemy.exc import OperationalError
+    from app.database import DatabaseManager
+    from app.models import SentimentPrediction
+    from app.pagination import keyset_page
+    from app.rollups import sentiment_totals
+
+    manager = DatabaseManager()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def write():
+        manager.bulk_save_predictions(make_results(args.batch_size))
+
+    def read():
+        session = manager.get_read_session()
+        try:
+            keyset_page(session.query(SentimentPrediction), 50)
+            sentiment_totals(session)
+        finally:
+            session.close()
+
+    operation = write if role == 'writes' else read
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = time.monotonic() + args.duration
+
+    def loop():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                operation()
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=loop)
+               for _ in range(args.writers if role == 'writes' else args.readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    results.put((role, summarize(latencies, errors[0], elapsed,
+                                 args.batch_size if role == 'writes' else 1)))
+
+
+def run_configuration(args) -> dict:
+    """Runs inside the subprocess, with the configuration in the environment"""
+    from app.database import DatabaseManager
+
+    manager = DatabaseManager()
+    manager.init_db()
+    for _ in range(args.seed_rows // 1000):
+        manager.bulk_save_predictions(make_results(1000))
+    manager.engine.dispose()
+    manager.read_engine.dispose()
+
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1
+    processes = [multiprocessing.Process(target=run_role, args=(role, args, start_at, results))
+                 for role in ('writes', 'reads')]
+    for process in processes:
+        process.start()
+    report = dict(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--seed-rows', type=int, default=20000)
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_configuration(args)))
+        return
+
+    directory = tempfile.mkdtemp(prefix='sentiment-bench-')
+    report = {'duration_seconds': args.duration, 'writers': args.writers,
+              'readers': args.readers, 'batch_size': args.batch_size, 'results': {}}
+    for name, settings in CONFIGURATIONS.items():
+        env = dict(os.environ, **settings,
+                   DATABASE_URL='sqlite:///' + os.path.join(directory, f'{name}.db'))
+        env.pop('DATABASE_READ_URL', None)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run', name,
+             '--duration', str(args.duration), '--writers', str(args.writers),
+             '--readers', str(args.readers), '--batch-size', str(args.batch_size),
+             '--seed-rows', str(args.seed_rows)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        report['results'][name] = json.loads(output.strip().splitlines()[-1])
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
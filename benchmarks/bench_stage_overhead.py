@@ -0,0 +1,97 @@
+"""Measure what the per-stage latency instrumentation costs.
+
+Reports the cost of a single ``StageTimer.mark`` and of recording a full
+batch's stages, then times ``predict_batch`` with stage metrics off, on,
+and on with every batch sampled into the profile log. The off/on runs are
+interleaved so that drift in machine load affects all modes equally.
+Runs offline against the same synthetic model as bench_suite.py. Prints JSON.
+
+    python benchmarks/bench_stage_overhead.py [--iterations 300]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'off': {'STAGE_METRICS_ENABLED': False, 'PROFILE_SAMPLE_RATE': 0.0},
+    'on': {'STAGE_METRICS_ENABLED': True, 'PROFILE_SAMPLE_RATE': 0.0},
+    'on_sampled_every_batch': {'STAGE_METRICS_ENABLED': True, 'PROFILE_SAMPLE_RATE': 1.0},
+}
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='sentiment-bench-')
+    os.environ['CACHE_ENABLED'] = 'false'
+    os.environ['PROFILE_LOG_PATH'] = os.path.join(directory, 'stage_profile.jsonl')
+
+    from bench_suite import build_artifacts, make_texts
+    from app.prediction import SentimentPredictor
+    from app.profiling import STAGES, StageTimer
+    from config.settings import Config
+
+    weights_path, table_path, words = build_artifacts(directory, 51719, 128, 256, args.seed)
+    predictor = SentimentPredictor(weights_path, table_path)
+    texts = make_texts(random.Random(args.seed), words, 64, 5, 120)
+
+    timer = StageTimer()
+    mark_ns = per_call_ns(lambda: timer.mark('forward'), 100000)
+
+    def record_batch():
+        batch_timer = StageTimer()
+        for stage in STAGES[1:8]:
+            batch_timer.mark(stage)
+        batch_timer.finish()
+    batch_ns = per_call_ns(record_batch, 20000)
+
+    report = {
+        'mark_ns': mark_ns,
+        'record_batch_of_7_stages_ns': batch_ns,
+        'predict_batch': {}
+    }
+    for size in (1, 32):
+        batches = [texts[i:i + size] for i in range(0, len(texts) - size + 1, size)]
+        timings = {mode: [] for mode in MODES}
+        for i in range(args.iterations):
+            batch = batches[i % len(batches)]
+            for mode, settings in MODES.items():
+                for name, value in settings.items():
+                    setattr(Config, name, value)
+                start = time.perf_counter_ns()
+                predictor.predict_batch(batch)
+                timings[mode].append(time.perf_counter_ns() - start)
+
+        baseline = statistics.median(timings['off'])
+        report['predict_batch'][f'batch_{size}'] = {
+            mode: {
+                'median_us': statistics.median(values) / 1000,
+                'overhead_percent': (statistics.median(values) - baseline) / baseline * 100
+            }
+            for mode, values in timings.items()
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Compare cold-start time of the pickled and the safe, mmap-based loading paths.
+
+Each measurement runs in a fresh interpreter so import and page-cache
+effects of one path do not leak into the other. Prints JSON.
+
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = {
+    # What importing webapp.app used to do: pickled module + pickled Vocab
+    'pickled_model_and_vocab': '''
+import pickle, torch
+from app.model_loading import load_model
+from app.tokenization import VocabTable
+model = load_model({model!r})
+with open({vocab!r}, 'rb') as f:
+    table = VocabTable.from_vocab(pickle.load(f))
+''',
+    'safe_weights_and_token_table': '''
+from app.model_loading import load_weights, load_vocab_table
+model = load_weights({weights!r})
+table = load_vocab_table({table!r})
+''',
+    # Importing the web app no longer loads the model at all
+    'import_webapp_lazy': '''
+import webapp.app
+''',
+}
+
+
+def time_snippet(code: str) -> float:
+    script = f'''
+import time, warnings
+warnings.filterwarnings("ignore")
+# torch's own import cost is the same for every path, so keep it out
+import torch
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+'''
+    output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from app.model_loading import convert_artifacts
+    from config.settings import Config
+
+    directory = tempfile.mkdtemp()
+    weights = os.path.join(directory, 'model_weights.pt')
+    table = os.path.join(directory, 'vocab.bin')
+    convert_artifacts(Config.MODEL_PATH, Config.VOCAB_PATH, weights, table)
+    paths = {'model': Config.MODEL_PATH, 'vocab': Config.VOCAB_PATH,
+             'weights': weights, 'table': table}
+
+    results = {}
+    for name, snippet in SNIPPETS.items():
+        timings = [time_snippet(snippet.format(**paths)) for _ in range(args.repeat)]
+        results[name] = {
+            'median_seconds': statistics.median(timings),
+            'min_seconds': min(timings),
+            'runs': args.repeat
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
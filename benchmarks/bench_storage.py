@@ -0,0 +1,173 @@
+"""Database size and query speed with inline texts vs the shared prediction_texts table.
+
+Builds a SQLite file in the layout used before texts were deduplicated
+(full text and a string request_id on every row) with ``--rows``
+predictions of ``--distinct`` different review texts, copies it, and
+migrates the copy with ``DatabaseManager.init_db``. Both files are then
+vacuumed and queried the same way:
+
+* scan: sentiment counts and mean confidence over every row
+* page: the dashboard's newest 50 predictions, texts included
+* lookup: one prediction by request_id
+* export: every row with its text, in (timestamp, id) order
+
+Reports file sizes, the migration time and the median of ``--repeat``
+runs of each query. Prints JSON.
+
+    python benchmarks/bench_storage.py [--rows 200000] [--distinct 2000]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, text
+
+LEGACY_SCHEMA = (
+    """CREATE TABLE sentiment_predictions (
+        id INTEGER NOT NULL PRIMARY KEY,
+        text TEXT NOT NULL,
+        prediction VARCHAR(50) NOT NULL,
+        confidence FLOAT NOT NULL,
+        sentiment_score FLOAT NOT NULL,
+        timestamp DATETIME,
+        request_id VARCHAR(100) NOT NULL UNIQUE,
+        processing_time FLOAT NOT NULL,
+        model_version VARCHAR(50)
+    )""",
+    "CREATE INDEX ix_sentiment_predictions_timestamp_id ON sentiment_predictions (timestamp, id)",
+    "CREATE INDEX ix_sentiment_predictions_prediction_timestamp_id "
+    "ON sentiment_predictions (prediction, timestamp, id)",
+)
+
+WORDS = ('great', 'terrible', 'movie', 'plot', 'acting', 'boring', 'loved', 'hated', 'the',
+         'a', 'was', 'really', 'not', 'worth', 'watching', 'again', 'story', 'ending')
+
+QUERIES = {
+    'legacy': {
+        'scan': "SELECT prediction, count(*), avg(confidence) FROM sentiment_predictions "
+                "GROUP BY prediction",
+        'page': "SELECT * FROM sentiment_predictions ORDER BY timestamp DESC, id DESC LIMIT 50",
+        'lookup': "SELECT * FROM sentiment_predictions WHERE request_id = :request_id",
+        'export': "SELECT id, text, prediction, confidence, sentiment_score, timestamp, "
+                  "request_id, processing_time, model_version "
+                  "FROM sentiment_predictions ORDER BY timestamp, id",
+    },
+    'compact': {
+        'scan': "SELECT prediction, count(*), avg(confidence) FROM sentiment_predictions "
+                "GROUP BY prediction",
+        'page': "SELECT p.*, t.text FROM sentiment_predictions p "
+                "JOIN prediction_texts t ON t.hash = p.text_hash "
+                "ORDER BY p.timestamp DESC, p.id DESC LIMIT 50",
+        'lookup': "SELECT p.*, t.text FROM sentiment_predictions p "
+                  "JOIN prediction_texts t ON t.hash = p.text_hash "
+                  "WHERE p.request_id = :request_id",
+        'export': "SELECT p.id, t.text, p.prediction, p.confidence, p.sentiment_score, "
+                  "p.timestamp, p.request_id, p.processing_time, p.model_version "
+                  "FROM sentiment_predictions p JOIN prediction_texts t ON t.hash = p.text_hash "
+                  "ORDER BY p.timestamp, p.id",
+    },
+}
+
+
+def build_legacy(path: str, rows: int, distinct: int, text_words: int, seed: int):
+    """A database in the old layout; returns one of its request ids"""
+    rng = random.Random(seed)
+    texts = [' '.join(rng.choice(WORDS) for _ in range(text_words)) for _ in range(distinct)]
+    start = datetime(2024, 1, 1)
+    request_ids = []
+    engine = create_engine('sqlite:///' + path)
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        for offset in range(0, rows, 10000):
+            batch = []
+            for i in range(offset, min(rows, offset + 10000)):
+                request_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+                request_ids.append(request_id)
+                batch.append({
+                    'text': rng.choice(texts),
+                    'prediction': rng.choice(('Positive', 'Negative')),
+                    'confidence': rng.uniform(0.5, 1.0),
+                    'sentiment_score': rng.uniform(-3, 3),
+                    'timestamp': start + timedelta(seconds=i),
+                    'request_id': request_id,
+                    'processing_time': rng.uniform(0.001, 0.05),
+                    'model_version': 'bench'
+                })
+            conn.execute(text(
+                "INSERT INTO sentiment_predictions (text, prediction, confidence, sentiment_score, "
+                "timestamp, request_id, processing_time, model_version) VALUES (:text, "
+                ":prediction, :confidence, :sentiment_score, :timestamp, :request_id, "
+                ":processing_time, :model_version)"
+            ), batch)
+    engine.dispose()
+    return rng.choice(request_ids)
+
+
+def time_queries(path: str, layout: str, request_id: str, repeat: int) -> dict:
+    from app.models import RequestId
+
+    engine = create_engine('sqlite:///' + path)
+    with engine.connect() as conn:
+        conn.execute(text('VACUUM'))
+        key = request_id if layout == 'legacy' else \
+            RequestId().process_bind_param(request_id, engine.dialect)
+        timings = {}
+        for name, query in QUERIES[layout].items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(text(query), {'request_id': key}).fetchall()
+                samples.append(time.perf_counter() - start)
+            timings[f'{name}_ms'] = statistics.median(samples) * 1000
+    engine.dispose()
+    return dict(timings, size_mb=os.path.getsize(path) / 2 ** 20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--distinct', type=int, default=2000)
+    parser.add_argument('--text-words', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='sentiment-bench-')
+    legacy_path = os.path.join(directory, 'legacy.db')
+    compact_path = os.path.join(directory, 'compact.db')
+    request_id = build_legacy(legacy_path, args.rows, args.distinct, args.text_words, args.seed)
+    shutil.copyfile(legacy_path, compact_path)
+
+    from app.database import DatabaseManager
+    manager = DatabaseManager('sqlite:///' + compact_path)
+    start = time.perf_counter()
+    manager.init_db()
+    migration_seconds = time.perf_counter() - start
+    manager.engine.dispose()
+    manager.read_engine.dispose()
+
+    report = {
+        'rows': args.rows,
+        'distinct_texts': args.distinct,
+        'migration_seconds': migration_seconds,
+        'legacy': time_queries(legacy_path, 'legacy', request_id, args.repeat),
+        'compact': time_queries(compact_path, 'compact', request_id, args.repeat),
+    }
+    shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Offline, reproducible benchmark suite for the prediction and storage paths.
+
+Everything runs against a randomly initialized SentiNN and a synthetic
+vocabulary written to a temporary directory, with a throwaway SQLite
+database, so no model files, network or running services are needed and
+two runs with the same seed see exactly the same inputs.
+
+Sections:
+
+* tokenization: ``TextEncoder.encode`` / ``encode_batch``
+* forward: ``SentimentPredictor.forward`` at several sequence lengths,
+  one text at a time and in batches
+* api: ``POST /api/predict`` through the Flask test client
+* load: the same endpoint from concurrent clients (exercises
+  micro-batching and the write-behind queue)
+* db: ``bulk_save_predictions`` insert throughput at several batch sizes
+
+Each timing section reports p50/p95/p99 latency, rows per second and the
+process's peak RSS so far. The result is JSON; pass ``--baseline`` with
+an earlier run to add the relative change of every latency and
+throughput figure.
+
+    python benchmarks/bench_suite.py [--quick] [--output run.json] [--baseline old.json]
+
+Config settings can be changed through the usual environment variables
+(e.g. ``INFERENCE_BACKEND=quantized``). The prediction cache is off unless
+``--cache`` is given, so repeated inputs measure the model every time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SECTIONS = ('tokenization', 'forward', 'api', 'load', 'db')
+SEQUENCE_LENGTHS = (16, 64, 256)
+BATCH_SIZES = (1, 32)
+DB_BATCH_SIZES = (1, 100, 1000)
+
+
+def build_artifacts(directory: str, vocab_size: int, embed_size: int, hidden_size: int,
+                    seed: int):
+    """Write a random SentiNN state_dict and a synthetic token table"""
+    import torch
+    from app.tokenization import VocabTable
+    from ml_model.model_architecture import SentiNN
+
+    torch.manual_seed(seed)
+    model = SentiNN(vocab_size, embed_size, hidden_size)
+    weights_path = os.path.join(directory, 'model_weights.pt')
+    torch.save(model.state_dict(), weights_path)
+
+    words = [f'word{i}' for i in range(vocab_size - 3)]
+    table_path = os.path.join(directory, 'vocab.bin')
+    VocabTable(['<unk>', '<eos>', '<pad>'] + words, default_index=0).save(table_path)
+    return weights_path, table_path, words
+
+
+def make_texts(rng: random.Random, words, count: int, min_words: int, max_words: int):
+    """Random reviews; about 1 word in 20 is out of vocabulary"""
+    texts = []
+    for _ in range(count):
+        length = rng.randint(min_words, max_words)
+        texts.append(' '.join(
+            rng.choice(words) if rng.random() > 0.05 else f'oov{rng.randint(0, 10 ** 6)}'
+            for _ in range(length)
+        ))
+    return texts
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(timings, rows_per_call: int = 1) -> dict:
+    """Latency percentiles in ms plus throughput for a list of call durations"""
+    total = sum(timings)
+    return {
+        'iterations': len(timings),
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'mean_ms': total / len(timings) * 1000,
+        'rows_per_second': rows_per_call * len(timings) / total if total else None
+    }
+
+
+def timed(fn, iterations: int, warmup: int = 3):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_tokenization(encoder, texts, iterations: int) -> dict:
+    single = iter(texts * (iterations // len(texts) + 2))
+    batch = texts[:32]
+    return {
+        'encode': summarize(timed(lambda: encoder.encode(next(single)), iterations)),
+        'encode_batch_32': summarize(timed(lambda: encoder.encode_batch(batch), iterations),
+                                     rows_per_call=len(batch)),
+    }
+
+
+def bench_forward(predictor, words, rng: random.Random, iterations: int) -> dict:
+    results = {}
+    for length in SEQUENCE_LENGTHS:
+        for size in BATCH_SIZES:
+            # length - 1 in-vocabulary words plus <eos> gives exactly `length` tokens
+            texts = [' '.join(rng.choice(words) for _ in range(length - 1)) for _ in range(size)]
+            batch, lengths = predictor.preprocess_batch(texts)
+            timings = timed(lambda: predictor.forward(batch, lengths), iterations)
+            results[f'seq_{length}_batch_{size}'] = summarize(timings, rows_per_call=size)
+    return results
+
+
+def bench_api(client, texts, iterations: int) -> dict:
+    requests = iter(texts * (iterations // len(texts) + 2))
+
+    def call():
+        response = client.post('/api/predict', json={'text': next(requests)})
+        assert response.status_code == 200, response.data
+    return {'predict': summarize(timed(call, iterations))}
+
+
+def bench_load(app, texts, concurrency: int, requests: int) -> dict:
+    def call(text):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/api/predict', json={'text': text})
+        assert response.status_code == 200, response.data
+        return time.perf_counter() - start
+
+    work = [texts[i % len(texts)] for i in range(requests)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, work[:concurrency]))
+        start = time.perf_counter()
+        timings = list(pool.map(call, work))
+        elapsed = time.perf_counter() - start
+
+    summary = summarize(timings)
+    # Requests overlap, so throughput comes from wall time, not summed latency
+    summary['rows_per_second'] = requests / elapsed
+    summary['concurrency'] = concurrency
+    return {'predict_concurrent': summary}
+
+
+def bench_db(manager, texts, rows: int) -> dict:
+    def results(count):
+        return [{
+            'request_id': str(uuid.uuid4()),
+            'text': texts[i % len(texts)],
+            'prediction': 'Positive' if i % 2 else 'Negative',
+            'confidence': 0.9,
+            'sentiment_score': 0.9,
+            'processing_time': 0.01,
+            'model_version': 'bench',
+            'success': True
+        } for i in range(count)]
+
+    summaries = {}
+    for size in DB_BATCH_SIZES:
+        iterations = max(3, rows // size)
+        batches = iter([results(size) for _ in range(iterations + 3)])
+        timings = timed(lambda: manager.bulk_save_predictions(next(batches)), iterations)
+        summaries[f'bulk_insert_{size}'] = summarize(timings, rows_per_call=size)
+    return summaries
+
+
+def environment(args) -> dict:
+    import torch
+    from config.settings import Config
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'seed': args.seed,
+        'vocab_size': args.vocab_size,
+        'inference_backend': Config.INFERENCE_BACKEND,
+        'embedding_dtype': Config.EMBEDDING_DTYPE,
+        'packed_inference': Config.PACKED_INFERENCE,
+        'batching_enabled': Config.BATCHING_ENABLED,
+        'cache_enabled': Config.CACHE_ENABLED,
+        'write_behind_enabled': Config.WRITE_BEHIND_ENABLED
+    }
+
+
+def compare(current: dict, baseline: dict, path: str = '') -> dict:
+    """Relative change of every latency and throughput figure present in both runs"""
+    changes = {}
+    for key, value in current.items():
+        other = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f'{path}.{key}' if path else key
+        if isinstance(value, dict):
+            changes.update(compare(value, other or {}, name))
+        elif (key.endswith('_ms') or key == 'rows_per_second') \
+                and isinstance(value, (int, float)) and isinstance(other, (int, float)) and other:
+            changes[name] = round((value - other) / other * 100, 2)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sections', default=','.join(SECTIONS),
+                        help=f'comma-separated subset of {", ".join(SECTIONS)}')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--quick', action='store_true', help='20 iterations per measurement')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vocab-size', type=int, default=51719)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--db-rows', type=int, default=5000)
+    parser.add_argument('--cache', action='store_true', help='keep the prediction cache on')
+    parser.add_argument('--output', help='write the JSON here as well as to stdout')
+    parser.add_argument('--baseline', help='earlier JSON output to compare against')
+    args = parser.parse_args()
+    iterations = 20 if args.quick else args.iterations
+    sections = [s for s in args.sections.split(',') if s]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    # Point the app at throwaway artifacts and a throwaway database before
+    # any app module reads its Config
+    directory = tempfile.mkdtemp(prefix='sentiment-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    os.environ['MODEL_WEIGHTS_PATH'] = os.path.join(directory, 'model_weights.pt')
+    os.environ['VOCAB_TABLE_PATH'] = os.path.join(directory, 'vocab.bin')
+    os.environ['MODEL_MANIFEST_PATH'] = ''
+    if not args.cache:
+        os.environ['CACHE_ENABLED'] = 'false'
+    sys.path.insert(0, ROOT)
+
+    weights_path, table_path, words = build_artifacts(directory, args.vocab_size, 128, 256,
+                                                      args.seed)
+    rng = random.Random(args.seed)
+    texts = make_texts(rng, words, 256, 5, 120)
+
+    report = {'environment': environment(args), 'results': {}}
+    results = report['results']
+
+    if 'tokenization' in sections or 'forward' in sections:
+        from app.prediction import SentimentPredictor
+        predictor = SentimentPredictor(weights_path, table_path)
+        if 'tokenization' in sections:
+            results['tokenization'] = bench_tokenization(predictor.encoder, texts, iterations)
+            results['tokenization']['peak_rss_mb'] = peak_rss_mb()
+        if 'forward' in sections:
+            results['forward'] = bench_forward(predictor, words, rng, iterations)
+            results['forward']['peak_rss_mb'] = peak_rss_mb()
+
+    if 'api' in sections or 'load' in sections:
+        from webapp.app import app
+        if 'api' in sections:
+            results['api'] = bench_api(app.test_client(), texts, iterations)
+            results['api']['peak_rss_mb'] = peak_rss_mb()
+        if 'load' in sections:
+            results['load'] = bench_load(app, texts, args.concurrency, iterations * 4)
+            results['load']['peak_rss_mb'] = peak_rss_mb()
+        from app.persistence import write_queue
+        write_queue.close()
+
+    if 'db' in sections:
+        from app.database import DatabaseManager
+        manager = DatabaseManager()
+        manager.init_db()
+        results['db'] = bench_db(manager, texts, args.db_rows // 5 if args.quick else args.db_rows)
+        results['db']['peak_rss_mb'] = peak_rss_mb()
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['change_percent_vs_baseline'] = compare(report['results'],
+                                                           json.load(f)['results'])
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
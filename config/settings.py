@@ -3,16 +3,151 @@ import os
 class Config:
     # Database
     DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///sentiment_predictions.db')
+    # Reads (dbapp, history, dashboard) may go to a replica; defaults to DATABASE_URL
+    DATABASE_READ_URI = os.getenv('DATABASE_READ_URL')
+    # Connection pool per engine (the read and read-write engines each have one)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true'
+    # SQLite connection PRAGMAs (see app/database.py)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16384))
     
     # Model paths
     MODEL_PATH = "C:/Prit/MLOps/assignment/ml_model/model.pth"
     VOCAB_PATH = "C:/Prit/MLOps/assignment/ml_model/vocab.pkl"
+    # Pickle-free versions written by convert_model.py (the weights are
+    # memory-mapped); used instead of the pickles above when present
+    MODEL_WEIGHTS_PATH = os.getenv('MODEL_WEIGHTS_PATH', "C:/Prit/MLOps/assignment/ml_model/model_weights.pt")
+    VOCAB_TABLE_PATH = os.getenv('VOCAB_TABLE_PATH', "C:/Prit/MLOps/assignment/ml_model/vocab.bin")
+    # CPU inference backend: eager, quantized (dynamic int8 GRU/Linear),
+    # torchscript or quantized_torchscript (see app/optimization.py)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager')
+    # Storage dtype of the embedding table: float32, float16 or bfloat16
+    EMBEDDING_DTYPE = os.getenv('EMBEDDING_DTYPE', 'float32')
+    # Version tag recorded with every prediction made by the default model
+    MODEL_VERSION = os.getenv('MODEL_VERSION', 'v1')
+    # Optional JSON manifest of model versions and traffic split, reloaded
+    # by every worker when it changes (see app/registry.py)
+    MODEL_MANIFEST_PATH = os.getenv('MODEL_MANIFEST_PATH')
+    MODEL_MANIFEST_POLL_SECONDS = float(os.getenv('MODEL_MANIFEST_POLL_SECONDS', 10))
+    # Load the model at import time instead of on the first request
+    EAGER_MODEL_LOAD = os.getenv('EAGER_MODEL_LOAD', 'false').lower() == 'true'
+    
+    # Dynamic micro-batching
+    BATCHING_ENABLED = os.getenv('BATCHING_ENABLED', 'true').lower() == 'true'
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 32))
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))
+    
+    # Packed-sequence inference (skip <pad> steps in the GRU)
+    PACKED_INFERENCE = os.getenv('PACKED_INFERENCE', 'true').lower() == 'true'
+    PACKED_TAIL_TOLERANCE = float(os.getenv('PACKED_TAIL_TOLERANCE', 1e-6))
+    
+    # Batch prediction API
+    API_BATCH_CHUNK_SIZE = int(os.getenv('API_BATCH_CHUNK_SIZE', 256))
+    API_BATCH_MAX_ITEMS = int(os.getenv('API_BATCH_MAX_ITEMS', 10000))
+    
+    # Long documents (POST /api/predict/document): overlapping windows of
+    # 256 tokens starting every LONG_DOC_WINDOW_STRIDE tokens
+    LONG_DOC_WINDOW_STRIDE = int(os.getenv('LONG_DOC_WINDOW_STRIDE', 192))
+    LONG_DOC_AGGREGATION = os.getenv('LONG_DOC_AGGREGATION', 'mean')
+    LONG_DOC_MAX_BATCH = int(os.getenv('LONG_DOC_MAX_BATCH', 64))
+    LONG_DOC_MAX_TOKENS = int(os.getenv('LONG_DOC_MAX_TOKENS', 2000000))
+    # Characters of the document kept as the stored prediction text
+    LONG_DOC_PREVIEW_CHARS = int(os.getenv('LONG_DOC_PREVIEW_CHARS', 200))
+    
+    # Incremental scoring of append-only streams (POST /api/stream/<id>)
+    STREAM_MAX_SESSIONS = int(os.getenv('STREAM_MAX_SESSIONS', 10000))
+    STREAM_SESSION_TTL_SECONDS = float(os.getenv('STREAM_SESSION_TTL_SECONDS', 1800))
+    
+    # Prediction result cache
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 0))
+    CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', 3600))
+    
+    # Write-behind persistence of prediction rows
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'true').lower() == 'true'
+    WRITE_QUEUE_MAX_SIZE = int(os.getenv('WRITE_QUEUE_MAX_SIZE', 10000))
+    WRITE_QUEUE_BATCH_SIZE = int(os.getenv('WRITE_QUEUE_BATCH_SIZE', 500))
+    WRITE_QUEUE_FLUSH_INTERVAL = float(os.getenv('WRITE_QUEUE_FLUSH_INTERVAL', 0.5))
+    WRITE_QUEUE_PUT_TIMEOUT = float(os.getenv('WRITE_QUEUE_PUT_TIMEOUT', 0.05))
+    # Batches that still fail after retries are kept here and replayed;
+    # empty drops them instead
+    WRITE_QUEUE_SPILL_DIR = os.getenv('WRITE_QUEUE_SPILL_DIR', 'write_spill')
+    
+    # Offline bulk scoring (see run_batch_score.py)
+    BULK_SCORE_WORKERS = int(os.getenv('BULK_SCORE_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+    BULK_SCORE_CHUNK_SIZE = int(os.getenv('BULK_SCORE_CHUNK_SIZE', 256))
+    
+    # Stats rollups
+    ROLLUP_MINUTE_RETENTION_HOURS = float(os.getenv('ROLLUP_MINUTE_RETENTION_HOURS', 48))
+    
+    # Time partitions and retention (see run_retention.py): predictions older
+    # than the retention move, one day or month at a time, to compressed
+    # files in ARCHIVE_DIR
+    PARTITION_PERIOD = os.getenv('PARTITION_PERIOD', 'month')
+    PREDICTION_RETENTION_DAYS = float(os.getenv('PREDICTION_RETENTION_DAYS', 90))
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archives')
+    ARCHIVE_COMPRESSION_LEVEL = int(os.getenv('ARCHIVE_COMPRESSION_LEVEL', 6))
+    
+    # Admission control for single predictions (see app/admission.py)
+    ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+    ADMISSION_LATENCY_SLO_MS = float(os.getenv('ADMISSION_LATENCY_SLO_MS', 1000))
+    ADMISSION_QUEUE_DEADLINE_MS = float(os.getenv('ADMISSION_QUEUE_DEADLINE_MS', 250))
+    ADMISSION_INITIAL_CONCURRENCY = int(os.getenv('ADMISSION_INITIAL_CONCURRENCY', 32))
+    ADMISSION_MIN_CONCURRENCY = int(os.getenv('ADMISSION_MIN_CONCURRENCY', 1))
+    ADMISSION_MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', 256))
+    ADMISSION_ADAPTIVE = os.getenv('ADMISSION_ADAPTIVE', 'true').lower() == 'true'
+    # Shed requests are answered from the cache, or else scored on their
+    # first tokens (0 turns that off), at most this many at a time
+    ADMISSION_DEGRADE_MAX_TOKENS = int(os.getenv('ADMISSION_DEGRADE_MAX_TOKENS', 32))
+    ADMISSION_DEGRADE_CONCURRENCY = int(os.getenv('ADMISSION_DEGRADE_CONCURRENCY', 8))
+    
+    # Multi-process inference pool (see run_inference_pool.py)
+    INFERENCE_POOL_ENABLED = os.getenv('INFERENCE_POOL_ENABLED', 'false').lower() == 'true'
+    INFERENCE_POOL_ADDRESS = os.getenv('INFERENCE_POOL_ADDRESS', '/tmp/sentiment_inference.sock')
+    # Web processes need the same worker count: each worker has its own socket
+    INFERENCE_POOL_WORKERS = int(os.getenv('INFERENCE_POOL_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    INFERENCE_POOL_THREADS = int(os.getenv('INFERENCE_POOL_THREADS', 1))
+    # Shared secret for the pool's socket; required, there is no default
+    INFERENCE_POOL_AUTHKEY = os.getenv('INFERENCE_POOL_AUTHKEY', '').encode()
+    
+    # ASGI serving mode (see run_asgi.py); threads for CPU-bound work that
+    # can't go through the micro-batcher
+    ASGI_EXECUTOR_WORKERS = int(os.getenv('ASGI_EXECUTOR_WORKERS', 4))
+    
+    # Per-stage latency histograms (see app/profiling.py); buckets are in
+    # seconds and start well below a millisecond for the cheap stages
+    STAGE_METRICS_ENABLED = os.getenv('STAGE_METRICS_ENABLED', 'true').lower() == 'true'
+    STAGE_HISTOGRAM_BUCKETS = tuple(float(b) for b in os.getenv(
+        'STAGE_HISTOGRAM_BUCKETS',
+        '0.00001,0.000025,0.00005,0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,1'
+    ).split(','))
+    # Fraction of batches whose stage breakdown is appended to PROFILE_LOG_PATH
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_LOG_PATH = os.getenv('PROFILE_LOG_PATH', 'stage_profile.jsonl')
     
     # Monitoring
+    # Shared directory for multiprocess metrics under gunicorn (see
+    # gunicorn.conf.py); must be set in the environment, not just here
+    PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    # Seconds a rendered /metrics response is reused; 0 renders every scrape
+    METRICS_CACHE_SECONDS = float(os.getenv('METRICS_CACHE_SECONDS', 1))
+    # Pushgateway (e.g. localhost:9091) for the sliding-window analytics of
+    # each gunicorn worker (monitoring/custom_metrics.py); unset, nothing
+    # is pushed
+    PUSHGATEWAY_URL = os.getenv('PUSHGATEWAY_URL') or None
+    PUSHGATEWAY_INTERVAL_SECONDS = float(os.getenv('PUSHGATEWAY_INTERVAL_SECONDS', 15))
     PROMETHEUS_PORT = 9090
     GRAFANA_PORT = 3000
     WEBAPP_PORT = 5000
     DBAPP_PORT = 5001
+    ASGI_PORT = int(os.getenv('ASGI_PORT', 5002))
     
     # Application
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
@@ -0,0 +1,9 @@
+from app.model_loading import convert_artifacts
+from config.settings import Config
+
+if __name__ == '__main__':
+    print(f"Converting {Config.MODEL_PATH} -> {Config.MODEL_WEIGHTS_PATH}")
+    print(f"Converting {Config.VOCAB_PATH} -> {Config.VOCAB_TABLE_PATH}")
+    convert_artifacts(Config.MODEL_PATH, Config.VOCAB_PATH,
+                      Config.MODEL_WEIGHTS_PATH, Config.VOCAB_TABLE_PATH)
+    print("Done. The predictor will load the converted files from now on.")
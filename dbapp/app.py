@@ -1,39 +1,55 @@
 from flask import Flask, jsonify, request, render_template, Response
 from app.database import db_manager
 from app.models import SentimentPrediction
+from app.pagination import keyset_page, approximate_count
+from app.rollups import sentiment_totals, count_since
+from app.export import EXPORT_FORMATS, COLUMNAR_FORMATS, columnar_available
 from app.monitoring import get_metrics
 from config.settings import Config
-from sqlalchemy import func, desc
+from sqlalchemy import desc
+from datetime import datetime, timedelta
 import json
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Make sure the rollup tables exist (and are backfilled) before serving stats
+db_manager.init_db()
+
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    # Closes the request's session and returns its connection to the pool
+    db_manager.remove_request_session()
+
 @app.route('/')
 def index():
     return jsonify({
         'message': 'Sentiment Analysis DB API',
         'endpoints': {
-            '/predictions': 'GET all predictions',
-            '/predictions/<id>': 'GET specific prediction',
+            '/predictions': 'GET predictions (cursor paginated: ?cursor=, ?before=, ?total=exact|approximate)',
+            '/predictions/<id>': 'GET specific prediction (live or archived)',
             '/stats': 'GET statistics',
+            '/export': 'GET streamed export, archived partitions included (?format=ndjson|csv|arrow|parquet, ?since=, ?until=, ?sentiment=, ?text=full|truncated)',
+            '/archives': 'GET archived time partitions (?since=, ?until=)',
             '/metrics': 'Prometheus metrics'
         }
     })
 
 @app.route('/predictions')
 def get_predictions():
-    session = db_manager.get_session()
-    try:
+    session = db_manager.request_session()
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 1000)
+    sentiment_filter = request.args.get('sentiment')
+    total_mode = request.args.get('total', 'none')
+    
+    query = session.query(SentimentPrediction)
+    
+    if sentiment_filter:
+        query = query.filter(SentimentPrediction.prediction == sentiment_filter)
+    
+    if 'page' in request.args:
+        # Legacy offset pagination, kept for existing clients
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        sentiment_filter = request.args.get('sentiment')
-        
-        query = session.query(SentimentPrediction)
-        
-        if sentiment_filter:
-            query = query.filter(SentimentPrediction.prediction == sentiment_filter)
-        
         predictions = query.order_by(desc(SentimentPrediction.timestamp))\
             .offset((page - 1) * per_page)\
             .limit(per_page)\
@@ -50,75 +66,127 @@ def get_predictions():
                 'pages': (total + per_page - 1) // per_page
             }
         })
-    finally:
-        session.close()
+    
+    try:
+        predictions, next_cursor, prev_cursor = keyset_page(
+            query, per_page,
+            after=request.args.get('cursor'),
+            before=request.args.get('before')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    pagination = {
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'has_more': next_cursor is not None
+    }
+    # Counting is a full scan on large tables, so it is opt-in
+    if total_mode == 'exact' or (total_mode == 'approximate' and sentiment_filter):
+        pagination['total'] = query.count()
+    elif total_mode == 'approximate':
+        pagination['total'] = approximate_count(session)
+        pagination['total_is_approximate'] = True
+    
+    return jsonify({
+        'predictions': [p.to_dict() for p in predictions],
+        'pagination': pagination
+    })
 
 @app.route('/predictions/<int:prediction_id>')
 def get_prediction(prediction_id):
-    session = db_manager.get_session()
-    try:
-        prediction = session.query(SentimentPrediction)\
-            .filter(SentimentPrediction.id == prediction_id)\
-            .first()
-        
-        if not prediction:
-            return jsonify({'error': 'Prediction not found'}), 404
-        
-        return jsonify(prediction.to_dict())
-    finally:
-        session.close()
+    session = db_manager.request_session()
+    prediction = db_manager.find_prediction(session, prediction_id)
+    
+    if not prediction:
+        return jsonify({'error': 'Prediction not found'}), 404
+    
+    return jsonify(prediction)
 
 @app.route('/stats')
 def get_stats():
-    session = db_manager.get_session()
-    try:
-        # Basic statistics
-        total_predictions = session.query(SentimentPrediction).count()
-        
-        # Sentiment distribution
-        sentiment_stats = session.query(
-            SentimentPrediction.prediction,
-            func.count(SentimentPrediction.id).label('count'),
-            func.avg(SentimentPrediction.confidence).label('avg_confidence'),
-            func.avg(SentimentPrediction.processing_time).label('avg_processing_time')
-        ).group_by(SentimentPrediction.prediction).all()
-        
-        # Recent activity (last hour)
-        from datetime import datetime, timedelta
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        recent_count = session.query(SentimentPrediction)\
-            .filter(SentimentPrediction.timestamp >= one_hour_ago)\
-            .count()
-        
-        # Confidence statistics
-        confidence_stats = session.query(
-            func.min(SentimentPrediction.confidence).label('min_confidence'),
-            func.max(SentimentPrediction.confidence).label('max_confidence'),
-            func.avg(SentimentPrediction.confidence).label('avg_confidence')
-        ).first()
-        
-        stats = {
-            'total_predictions': total_predictions,
-            'recent_activity_last_hour': recent_count,
-            'sentiment_distribution': [
-                {
-                    'sentiment': stat.prediction,
-                    'count': stat.count,
-                    'avg_confidence': float(stat.avg_confidence or 0),
-                    'avg_processing_time': float(stat.avg_processing_time or 0)
-                }
-                for stat in sentiment_stats
-            ],
-            'confidence_stats': {
-                'min': float(confidence_stats.min_confidence or 0),
-                'max': float(confidence_stats.max_confidence or 0),
-                'average': float(confidence_stats.avg_confidence or 0)
+    session = db_manager.request_session()
+    # Answered from the pre-aggregated rollups rather than full scans
+    totals = sentiment_totals(session)
+    total_predictions = sum(t['count'] for t in totals)
+    
+    # Recent activity (last hour)
+    one_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    recent_count = count_since(session, one_hour_ago)
+    
+    stats = {
+        'total_predictions': total_predictions,
+        'recent_activity_last_hour': recent_count,
+        'sentiment_distribution': [
+            {
+                'sentiment': t['sentiment'],
+                'count': t['count'],
+                'avg_confidence': t['confidence_sum'] / t['count'] if t['count'] else 0.0,
+                'avg_processing_time': t['processing_time_sum'] / t['count'] if t['count'] else 0.0
             }
+            for t in totals
+        ],
+        'confidence_stats': {
+            'min': min((t['confidence_min'] for t in totals), default=0.0),
+            'max': max((t['confidence_max'] for t in totals), default=0.0),
+            'average': sum(t['confidence_sum'] for t in totals) / total_predictions
+                       if total_predictions else 0.0
         }
-        
-        return jsonify(stats)
-    finally:
-        session.close()
+    }
+    
+    return jsonify(stats)
+
+@app.route('/export')
+def export_predictions():
+    export_format = request.args.get('format', 'ndjson')
+    sentiment_filter = request.args.get('sentiment')
+    truncate = request.args.get('text', 'full') == 'truncated'
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown format, use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if export_format in COLUMNAR_FORMATS and not columnar_available():
+        return jsonify({'error': f'{export_format} export requires pyarrow'}), 400
+    
+    try:
+        since = datetime.fromisoformat(request.args['since']) if 'since' in request.args else None
+        until = datetime.fromisoformat(request.args['until']) if 'until' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'since and until must be ISO 8601 timestamps'}), 400
+    
+    writer, mimetype, extension = EXPORT_FORMATS[export_format]
+    
+    def generate():
+        # The session lives as long as the response is being streamed, past
+        # the end of the request, so it is not the request-scoped one
+        session = db_manager.get_read_session()
+        try:
+            rows = db_manager.iter_prediction_rows(session, since=since, until=until,
+                                                   sentiment=sentiment_filter, truncate=truncate)
+            for chunk in writer(rows):
+                if chunk:
+                    yield chunk
+        finally:
+            session.close()
+    
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=predictions.{extension}'
+    })
+
+@app.route('/archives')
+def get_archives():
+    session = db_manager.request_session()
+    try:
+        since = datetime.fromisoformat(request.args['since']) if 'since' in request.args else None
+        until = datetime.fromisoformat(request.args['until']) if 'until' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'since and until must be ISO 8601 timestamps'}), 400
+    
+    archives = db_manager.archives_for(session, since, until)
+    return jsonify({
+        'archives': [archive.to_dict() for archive in archives],
+        'total_rows': sum(archive.row_count for archive in archives)
+    })
 
 @app.route('/metrics')
 def metrics():
@@ -0,0 +1,46 @@
+"""gunicorn hooks for multiprocess Prometheus metrics.
+
+gunicorn reads this file from the working directory, so it applies to
+
+    PROMETHEUS_MULTIPROC_DIR=/tmp/sentiment-metrics gunicorn -w 4 webapp.app:app
+
+and to the ASGI app run with ``-k uvicorn.workers.UvicornWorker``. The
+directory is emptied when the master starts, since files left by an earlier
+run would be merged into the new one's counters. When a worker exits its
+live gauges (active requests, cache entries, queue depth) are dropped;
+its counters and histograms stay in the totals.
+
+/metrics can't merge the per-process sliding-window analytics, so with
+PUSHGATEWAY_URL set every worker pushes its own to the Pushgateway, and
+deletes them again on exit.
+"""
+import glob
+import os
+
+from config.settings import Config
+
+
+def on_starting(server):
+    directory = Config.PROMETHEUS_MULTIPROC_DIR
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def post_worker_init(worker):
+    if Config.PUSHGATEWAY_URL:
+        from monitoring.custom_metrics import advanced_metrics
+        advanced_metrics.start_pushing()
+
+
+def worker_exit(server, worker):
+    if Config.PUSHGATEWAY_URL:
+        from monitoring.custom_metrics import advanced_metrics
+        advanced_metrics.stop_pushing()
+
+
+def child_exit(server, worker):
+    if Config.PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
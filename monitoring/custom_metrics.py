@@ -1,41 +1,201 @@
-from prometheus_client import CollectorRegistry, push_to_gateway, Gauge
-import requests
+from prometheus_client import CollectorRegistry, delete_from_gateway, push_to_gateway
+from prometheus_client.core import GaugeMetricFamily
+import logging
+import os
 import time
 import threading
+import numpy as np
+from config.settings import Config
+
+# Window name -> (number of buckets, seconds per bucket)
+WINDOWS = {'1m': (60, 1), '5m': (60, 5), '1h': (60, 60)}
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+PUSH_JOB = 'sentiment_metrics'
+
+logger = logging.getLogger(__name__)
+
+class SlidingWindow:
+    """Prediction totals over the last ``buckets * bucket_seconds`` seconds.
+
+    A ring of fixed-width time buckets, each holding a count, the number of
+    positive predictions, a confidence sum and a confidence histogram. A
+    bucket is cleared the first time it is written in a new period, so
+    adding a prediction is O(1) and a query sums ``buckets`` rows, however
+    many predictions the window holds. Quantiles come from the histogram
+    (``bins`` equal bins over [0, 1]), interpolated within a bin.
+    """
+
+    def __init__(self, buckets: int, bucket_seconds: float, bins: int = 100, start: float = 0.0):
+        self.buckets = buckets
+        self.bucket_seconds = bucket_seconds
+        self.bins = bins
+        self.start = start
+        self.epochs = np.full(buckets, -1, dtype=np.int64)
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.positive = np.zeros(buckets, dtype=np.int64)
+        self.confidence_sum = np.zeros(buckets, dtype=np.float64)
+        self.histogram = np.zeros((buckets, bins), dtype=np.int64)
+
+    def add(self, now: float, positive: bool, confidence: float):
+        epoch = int(now // self.bucket_seconds)
+        i = epoch % self.buckets
+        if self.epochs[i] != epoch:
+            self.epochs[i] = epoch
+            self.counts[i] = 0
+            self.positive[i] = 0
+            self.confidence_sum[i] = 0.0
+            self.histogram[i] = 0
+        self.counts[i] += 1
+        self.positive[i] += positive
+        self.confidence_sum[i] += confidence
+        self.histogram[i, min(int(confidence * self.bins), self.bins - 1)] += 1
+
+    def stats(self, now: float) -> dict:
+        live = self.epochs > int(now // self.bucket_seconds) - self.buckets
+        count = int(self.counts[live].sum())
+        # Time actually covered, shorter than the window until it has filled
+        span = min(self.buckets * self.bucket_seconds, max(now - self.start, 1e-9))
+        stats = {
+            'count': count,
+            'positive_ratio': 0.0,
+            'negative_ratio': 0.0,
+            'mean_confidence': 0.0,
+            'quantiles': {q: 0.0 for q in QUANTILES},
+            'throughput_per_minute': count / span * 60
+        }
+        if count:
+            positive = int(self.positive[live].sum())
+            stats['positive_ratio'] = positive / count
+            stats['negative_ratio'] = (count - positive) / count
+            stats['mean_confidence'] = float(self.confidence_sum[live].sum()) / count
+            stats['quantiles'] = self._quantiles(self.histogram[live].sum(axis=0), count)
+        return stats
+
+    def _quantiles(self, histogram, count) -> dict:
+        cumulative = np.cumsum(histogram)
+        quantiles = {}
+        for q in QUANTILES:
+            rank = q * count
+            b = int(np.searchsorted(cumulative, rank))
+            below = cumulative[b - 1] if b else 0
+            fraction = (rank - below) / histogram[b] if histogram[b] else 0.0
+            quantiles[q] = (b + fraction) / self.bins
+        return quantiles
+
+class AnalyticsEngine:
+    """Rolling prediction analytics over several windows, fed one result at a time"""
+
+    def __init__(self, windows: dict = WINDOWS, bins: int = 100, clock=time.time):
+        self.clock = clock
+        start = clock()
+        self.windows = {name: SlidingWindow(buckets, seconds, bins, start)
+                        for name, (buckets, seconds) in windows.items()}
+        self._lock = threading.Lock()
+
+    def record(self, result: dict):
+        """Add a prediction result; failed predictions are ignored"""
+        if not result.get('success', False):
+            return
+        positive = result['prediction'] == 'Positive'
+        confidence = float(result['confidence'])
+        now = self.clock()
+        with self._lock:
+            for window in self.windows.values():
+                window.add(now, positive, confidence)
+
+    def snapshot(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            return {name: window.stats(now) for name, window in self.windows.items()}
 
 class AdvancedMetrics:
-    def __init__(self, prometheus_url: str):
+    """Business metrics from the analytics windows, exposed through ``registry``.
+
+    The values are computed when the registry is collected (a scrape or
+    ``push_metrics``), so they are never stale and nothing is recomputed
+    per prediction. The windows cover the predictions made in this
+    process. A single process serves them on /metrics. Under multiprocess
+    gunicorn, /metrics cannot merge them, so when ``prometheus_url`` (a
+    Pushgateway) is set, each worker pushes its own every
+    ``push_interval`` seconds, grouped by pid. gunicorn.conf.py starts
+    that per worker and deletes the group when the worker exits.
+    """
+
+    def __init__(self, prometheus_url: str = None, engine: AnalyticsEngine = None,
+                 push_interval: float = 15):
         self.registry = CollectorRegistry()
         self.prometheus_url = prometheus_url
-        
-        # Custom business metrics
-        self.positive_ratio = Gauge('sentiment_positive_ratio', 
-                                   'Ratio of positive predictions', 
-                                   registry=self.registry)
-        self.negative_ratio = Gauge('sentiment_negative_ratio', 
-                                   'Ratio of negative predictions', 
-                                   registry=self.registry)
-        self.avg_confidence = Gauge('sentiment_avg_confidence', 
-                                   'Average prediction confidence', 
-                                   registry=self.registry)
-        self.prediction_throughput = Gauge('prediction_throughput', 
-                                          'Predictions per minute', 
-                                          registry=self.registry)
-    
-    def calculate_advanced_metrics(self, predictions_data):
-        """Calculate advanced business metrics"""
-        if not predictions_data:
-            return
-        
-        total = len(predictions_data)
-        positive_count = sum(1 for p in predictions_data if p['prediction'] == 'Positive')
-        negative_count = sum(1 for p in predictions_data if p['prediction'] == 'Negative')
-        avg_conf = sum(p['confidence'] for p in predictions_data) / total
-        
-        self.positive_ratio.set(positive_count / total if total > 0 else 0)
-        self.negative_ratio.set(negative_count / total if total > 0 else 0)
-        self.avg_confidence.set(avg_conf)
-    
+        self.push_interval = push_interval
+        self.engine = engine or AnalyticsEngine()
+        self.registry.register(self)
+        self._pusher = None
+        self._stop_pushing = threading.Event()
+
+    def record(self, result: dict):
+        self.engine.record(result)
+
+    def collect(self):
+        positive_ratio = GaugeMetricFamily('sentiment_positive_ratio',
+                                           'Ratio of positive predictions', labels=['window'])
+        negative_ratio = GaugeMetricFamily('sentiment_negative_ratio',
+                                           'Ratio of negative predictions', labels=['window'])
+        avg_confidence = GaugeMetricFamily('sentiment_avg_confidence',
+                                           'Average prediction confidence', labels=['window'])
+        confidence_quantile = GaugeMetricFamily('sentiment_confidence_quantile',
+                                                'Prediction confidence quantiles',
+                                                labels=['window', 'quantile'])
+        throughput = GaugeMetricFamily('prediction_throughput',
+                                       'Predictions per minute', labels=['window'])
+        predictions = GaugeMetricFamily('sentiment_window_predictions',
+                                        'Predictions in the window', labels=['window'])
+        for window, stats in self.engine.snapshot().items():
+            positive_ratio.add_metric([window], stats['positive_ratio'])
+            negative_ratio.add_metric([window], stats['negative_ratio'])
+            avg_confidence.add_metric([window], stats['mean_confidence'])
+            for q, value in stats['quantiles'].items():
+                confidence_quantile.add_metric([window, str(q)], value)
+            throughput.add_metric([window], stats['throughput_per_minute'])
+            predictions.add_metric([window], stats['count'])
+        return [positive_ratio, negative_ratio, avg_confidence, confidence_quantile,
+                throughput, predictions]
+
     def push_metrics(self):
         """Push custom metrics to Prometheus"""
-        push_to_gateway(self.prometheus_url, job='sentiment_metrics', registry=self.registry)
\ No newline at end of file
+        push_to_gateway(self.prometheus_url, job=PUSH_JOB, registry=self.registry,
+                        grouping_key=self._grouping_key())
+
+    def start_pushing(self):
+        """Push from a background thread every ``push_interval`` seconds"""
+        if not self.prometheus_url or (self._pusher is not None and self._pusher.is_alive()):
+            return
+        self._stop_pushing.clear()
+        self._pusher = threading.Thread(target=self._push_loop, name='metrics-push', daemon=True)
+        self._pusher.start()
+
+    def stop_pushing(self, timeout: float = 5):
+        """Stop the push thread and remove this process's group from the gateway"""
+        if self._pusher is None:
+            return
+        self._stop_pushing.set()
+        self._pusher.join(timeout)
+        self._pusher = None
+        try:
+            delete_from_gateway(self.prometheus_url, job=PUSH_JOB,
+                                grouping_key=self._grouping_key())
+        except Exception as e:
+            logger.warning("Could not delete metrics from %s: %s", self.prometheus_url, e)
+
+    def _push_loop(self):
+        while not self._stop_pushing.wait(self.push_interval):
+            try:
+                self.push_metrics()
+            except Exception as e:
+                logger.warning("Could not push metrics to %s: %s", self.prometheus_url, e)
+
+    def _grouping_key(self) -> dict:
+        return {'pid': str(os.getpid())}
+
+advanced_metrics = AdvancedMetrics(Config.PUSHGATEWAY_URL,
+                                   push_interval=Config.PUSHGATEWAY_INTERVAL_SECONDS)
@@ -0,0 +1,8 @@
+import uvicorn
+from config.settings import Config
+
+if __name__ == '__main__':
+    print(f"Starting Sentiment Analysis ASGI API on port {Config.ASGI_PORT}")
+    # The model is loaded and warmed up by the app's lifespan startup
+    uvicorn.run('webapp.asgi:app', host='0.0.0.0', port=Config.ASGI_PORT,
+                log_level='warning')
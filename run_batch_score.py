@@ -0,0 +1,60 @@
+"""Score a large CSV, NDJSON or text file offline (see app/bulk_scoring.py).
+
+    python run_batch_score.py reviews.csv --output scored.ndjson
+    python run_batch_score.py backlog.ndjson --db --id-field review_id
+
+Rerunning the same command after an interruption resumes from the last
+checkpoint; pass --restart to start over. A checkpoint is only resumed
+into the output file and format it was written for.
+"""
+import argparse
+import json
+from app.bulk_scoring import BulkScorer, Checkpoint, INPUT_FORMATS, OUTPUT_FORMATS
+from app.model_loading import resolve_artifact_paths
+from app.prediction import create_predictor
+from config.settings import Config
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a file of texts offline')
+    parser.add_argument('input', help='CSV, NDJSON or text file (one text per line)')
+    parser.add_argument('--output', help='Write results to this .csv or .ndjson file')
+    parser.add_argument('--db', action='store_true',
+                        help='Insert results into sentiment_predictions')
+    parser.add_argument('--format', choices=INPUT_FORMATS, help='Input format (default: by extension)')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS)
+    parser.add_argument('--text-field', default='text', help='CSV column or JSON key holding the text')
+    parser.add_argument('--id-field', help='CSV column or JSON key copied to the output as id')
+    parser.add_argument('--workers', type=int, default=Config.BULK_SCORE_WORKERS,
+                        help='Tokenizer processes (0 tokenizes in this process)')
+    parser.add_argument('--chunk-size', type=int, default=Config.BULK_SCORE_CHUNK_SIZE)
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <output or input>.checkpoint)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    args = parser.parse_args()
+    if not args.output and not args.db:
+        parser.error('give --output, --db or both')
+
+    checkpoint_path = args.checkpoint or (args.output or args.input) + '.checkpoint'
+    if args.restart:
+        Checkpoint(checkpoint_path).clear()
+
+    manager = None
+    if args.db:
+        from app.database import db_manager
+        db_manager.init_db()
+        manager = db_manager
+
+    model_path, vocab_path = resolve_artifact_paths()
+    scorer = BulkScorer(create_predictor(), vocab_path,
+                        workers=args.workers,
+                        chunk_size=args.chunk_size,
+                        manager=manager)
+    print(f"Scoring {args.input} with model {Config.MODEL_VERSION} "
+          f"and {args.workers} tokenizer workers")
+    try:
+        summary = scorer.score_file(args.input, args.output, to_database=args.db,
+                                    input_format=args.format, output_format=args.output_format,
+                                    text_field=args.text_field, id_field=args.id_field,
+                                    checkpoint_path=checkpoint_path)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(summary))
@@ -0,0 +1,21 @@
+from app.model_loading import load_model, resolve_artifact_paths
+from app.optimization import optimize_model
+from app.worker_pool import InferencePool
+from config.settings import Config
+
+if __name__ == '__main__':
+    model_path, _ = resolve_artifact_paths()
+    model = optimize_model(load_model(model_path),
+                           Config.INFERENCE_BACKEND, Config.EMBEDDING_DTYPE)
+    pool = InferencePool(model,
+                         address=Config.INFERENCE_POOL_ADDRESS,
+                         workers=Config.INFERENCE_POOL_WORKERS,
+                         threads_per_worker=Config.INFERENCE_POOL_THREADS,
+                         authkey=Config.INFERENCE_POOL_AUTHKEY,
+                         packed=Config.PACKED_INFERENCE,
+                         tolerance=Config.PACKED_TAIL_TOLERANCE)
+    print(f"Starting inference pool with {Config.INFERENCE_POOL_WORKERS} workers "
+          f"x {Config.INFERENCE_POOL_THREADS} threads on {Config.INFERENCE_POOL_ADDRESS}")
+    print("Start the web app with INFERENCE_POOL_ENABLED=true and the same "
+          "INFERENCE_POOL_WORKERS to use it.")
+    pool.serve_forever()
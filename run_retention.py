@@ -0,0 +1,34 @@
+"""Archive predictions older than the retention (see DatabaseManager.archive_partitions).
+
+    python run_retention.py                      # PREDICTION_RETENTION_DAYS, PARTITION_PERIOD
+    python run_retention.py --days 30 --period day --vacuum
+
+Meant to run from cron; a run with nothing old enough does nothing.
+"""
+import argparse
+import json
+import logging
+from app.archive import PERIODS
+from app.database import db_manager
+from config.settings import Config
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move old predictions to compressed archives')
+    parser.add_argument('--days', type=float, default=Config.PREDICTION_RETENTION_DAYS,
+                        help='Keep this many days of predictions live')
+    parser.add_argument('--period', choices=PERIODS, default=Config.PARTITION_PERIOD,
+                        help='Partition size; one archive file per period')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='Compact the SQLite file afterwards (rewrites the whole file)')
+    args = parser.parse_args()
+
+    # One line per archived partition (logged by archive_partitions)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    db_manager.init_db()
+    print(f"Archiving whole {args.period}s older than {args.days:g} days to {db_manager.archive_dir}")
+    archived = db_manager.archive_partitions(args.days, args.period, vacuum=args.vacuum)
+    print(json.dumps({
+        'partitions': len(archived),
+        'rows': sum(entry['row_count'] for entry in archived),
+        'bytes': sum(entry['size_bytes'] for entry in archived)
+    }))
@@ -1,7 +1,9 @@
 from webapp.app import app
 from config.settings import Config
 from ml_model.model_architecture import SentiNN
+from app.prediction import warm_up
 
 if __name__ == '__main__':
     print(f"Starting Sentiment Analysis WebApp on port {Config.WEBAPP_PORT}")
+    warm_up()
     app.run(host='0.0.0.0', port=Config.WEBAPP_PORT, debug=Config.DEBUG)
\ No newline at end of file
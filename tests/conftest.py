@@ -0,0 +1,38 @@
+import os
+import tempfile
+import pytest
+
+# Keep test runs away from the development database
+os.environ.setdefault(
+    'DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_sentiment.db')
+)
+
+class FakeClock:
+    """A clock that only moves when a test sets ``now``"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture(scope='session')
+def make_result():
+    """Build a successful prediction result; keyword arguments override fields"""
+    def make(i, text=None, **fields):
+        return dict({
+            'request_id': f'req-{i}',
+            'text': f'text {i}' if text is None else text,
+            'prediction': 'Positive' if i % 2 else 'Negative',
+            'confidence': 0.9,
+            'sentiment_score': 1.0,
+            'processing_time': 0.01,
+            'model_version': 'v1',
+            'success': True
+        }, **fields)
+    return make
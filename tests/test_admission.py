@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.admission import AdmissionController, Overloaded
+
+class GatedPredictor:
+    """Holds predict() until the gate opens, except for texts in ``instant``"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.cache = {}
+        self.instant = set()
+        self.scored = []
+
+    def result(self, text):
+        return {'text': text, 'prediction': 'Positive', 'confidence': 0.9,
+                'sentiment_score': 1.0, 'model_version': 'v1', 'success': True}
+
+    def predict(self, text):
+        self.scored.append(text)
+        if text not in self.instant:
+            self.started.release()
+            self.gate.wait(5)
+        return self.result(text)
+
+    def predict_batch(self, texts, check_cache=True):
+        return [self.predict(text) for text in texts]
+
+    def cached_result(self, text):
+        return dict(self.cache[text]) if text in self.cache else None
+
+class TestAdmissionController:
+    @pytest.fixture
+    def predictor(self):
+        predictor = GatedPredictor()
+        yield predictor
+        predictor.gate.set()
+
+    def occupy(self, controller, predictor, count=1):
+        """Start ``count`` predictions that hold their slots until the gate opens"""
+        threads = [threading.Thread(target=controller.predict, args=(f'busy {i}',))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            assert predictor.started.acquire(timeout=5)
+        return threads
+
+    def test_waits_for_a_slot_in_order(self, predictor):
+        controller = AdmissionController(predictor, initial_limit=1, adaptive=False,
+                                         queue_deadline_ms=5000, latency_slo_ms=10000)
+        busy = self.occupy(controller, predictor)
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(controller.predict('queued')))
+        waiting.start()
+        while not controller._waiters:
+            time.sleep(0.001)
+        assert controller.in_flight == 1
+        predictor.gate.set()
+        for thread in busy + [waiting]:
+            thread.join(5)
+        assert results[0]['text'] == 'queued' and 'degraded' not in results[0]
+        assert controller.in_flight == 0 and not controller._waiters
+
+    def test_queue_deadline_degrades_to_truncated_scoring(self, predictor):
+        controller = AdmissionController(predictor, initial_limit=1, adaptive=False,
+                                         queue_deadline_ms=20, degrade_max_tokens=3)
+        self.occupy(controller, predictor)
+        predictor.instant.add('one two ,')
+        result = controller.predict('One two, three four five')
+        assert result['degraded'] == 'truncated'
+        assert result['text'] == 'One two, three four five'
+        assert predictor.scored[-1] == 'one two ,'
+        assert not controller._waiters
+
+    def test_truncated_results_are_not_analyzed_or_stored(self, predictor, monkeypatch):
+        import app.monitoring as monitoring
+        import webapp.app as webapp
+        analyzed, stored = [], []
+        monkeypatch.setattr(monitoring.advanced_metrics, 'record', analyzed.append)
+        monkeypatch.setattr(webapp.write_queue, 'submit', stored.append)
+        monkeypatch.setattr(webapp.db_manager, 'bulk_save_predictions', stored.append)
+        controller = AdmissionController(predictor, initial_limit=1, adaptive=False,
+                                         queue_deadline_ms=20, degrade_max_tokens=2)
+        self.occupy(controller, predictor)
+        predictor.instant.add('a long')
+        result = controller.predict('A long review')
+        assert result['degraded'] == 'truncated'
+        webapp.store_prediction(result)
+        assert analyzed == [] and stored == []
+
+    def test_cache_hits_do_not_wait(self, predictor):
+        controller = AdmissionController(predictor, initial_limit=1, adaptive=False,
+                                         queue_deadline_ms=5000)
+        self.occupy(controller, predictor)
+        predictor.cache['seen before'] = predictor.result('seen before')
+        start = time.monotonic()
+        assert controller.predict('seen before')['text'] == 'seen before'
+        assert time.monotonic() - start < 1
+
+    def test_projected_wait_sheds_on_arrival(self, predictor):
+        controller = AdmissionController(predictor, initial_limit=1, adaptive=False,
+                                         queue_deadline_ms=250, degrade_max_tokens=0)
+        self.occupy(controller, predictor)
+        # One prediction ahead at a second each cannot finish inside the deadline
+        controller.service_time = 1.0
+        start = time.monotonic()
+        with pytest.raises(Overloaded) as error:
+            controller.predict('too late')
+        assert time.monotonic() - start < 0.1
+        assert error.value.retry_after == 1
+        assert not controller._waiters
+
+    def test_limit_follows_service_times(self, predictor):
+        controller = AdmissionController(predictor, initial_limit=4, min_limit=2, max_limit=6,
+                                         latency_slo_ms=300, queue_deadline_ms=100)
+        for _ in range(40):
+            controller.in_flight += 1
+            controller._release(0.05)
+        assert controller.limit == 6
+        for _ in range(40):
+            controller._last_decrease = -1.0
+            controller.in_flight += 1
+            controller._release(0.5)
+        assert controller.limit == 2
+
+    def test_async_waiters_take_freed_slots(self, predictor):
+        controller = AdmissionController(predictor, initial_limit=1, adaptive=False,
+                                         queue_deadline_ms=5000, latency_slo_ms=10000)
+
+        async def score(text):
+            return predictor.result(text)
+
+        async def blocking(func, *args):
+            return func(*args)
+
+        async def scenario():
+            controller._try_acquire()
+            waiting = asyncio.ensure_future(controller.predict_async('queued', score, blocking))
+            while not controller._waiters:
+                await asyncio.sleep(0.001)
+            await asyncio.get_running_loop().run_in_executor(None, controller._release, 0.01)
+            return await waiting
+
+        assert asyncio.run(scenario())['text'] == 'queued'
+        assert controller.in_flight == 0
+
+    def test_api_answers_503_when_shed(self, monkeypatch):
+        import webapp.app as webapp
+
+        class Shedding:
+            def predict(self, text):
+                raise Overloaded('Server is overloaded, retry later', retry_after=3)
+
+        monkeypatch.setattr(webapp, 'predictor', Shedding())
+        response = webapp.app.test_client().post('/api/predict', json={'text': 'hello'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert response.get_json()['retry_after'] == 3
@@ -0,0 +1,202 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import MetaData, func, insert, text
+from app.archive import iter_archived_rows, next_period, period_start
+from app.database import DatabaseManager
+from app.export import EXPORT_COLUMNS
+from app.models import Base, PredictionArchive, PredictionText, SentimentPrediction
+from app.rollups import rebuild_rollups, sentiment_totals
+
+NOW = datetime(2024, 6, 15, 12, 0)
+REQUEST_ID = EXPORT_COLUMNS.index('request_id')
+TIMESTAMP = EXPORT_COLUMNS.index('timestamp')
+
+def make_row(i, timestamp, text=None):
+    return {
+        'request_id': f'archive-{i}',
+        'text': text or f'review {i}',
+        'prediction': 'Positive' if i % 2 else 'Negative',
+        'confidence': 0.8,
+        'sentiment_score': 1.0,
+        'processing_time': 0.01,
+        'model_version': 'v1',
+        'timestamp': timestamp
+    }
+
+class TestPeriods:
+    def test_month_and_day_boundaries(self):
+        timestamp = datetime(2024, 12, 31, 23, 59)
+        assert period_start(timestamp, 'month') == datetime(2024, 12, 1)
+        assert next_period(datetime(2024, 12, 1), 'month') == datetime(2025, 1, 1)
+        assert period_start(timestamp, 'day') == datetime(2024, 12, 31)
+        assert next_period(datetime(2024, 12, 31), 'day') == datetime(2025, 1, 1)
+        with pytest.raises(ValueError):
+            period_start(timestamp, 'week')
+
+class TestArchivePartitions:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        manager = DatabaseManager('sqlite:///' + str(tmp_path / 'partitions.db'),
+                                  archive_dir=str(tmp_path / 'archives'))
+        manager.init_db()
+        # Three rows in each of March, April, May and June
+        rows = [make_row(i, datetime(2024, 3 + i // 3, 10, i))
+                for i in range(12)]
+        rows.append(make_row(12, datetime(2024, 6, 14), text='review 0'))
+        session = manager.get_session()
+        try:
+            session.execute(insert(SentimentPrediction), rows)
+            rebuild_rollups(session)
+            session.commit()
+        finally:
+            session.close()
+        yield manager
+        manager.remove_request_session()
+        manager.engine.dispose()
+        manager.read_engine.dispose()
+
+    def test_old_partitions_move_to_archives(self, manager):
+        archived = manager.archive_partitions(retention_days=45, period='month', now=NOW)
+        # 45 days before June 15 is in May, so March and April are archived
+        assert [a['period_start'] for a in archived] == [datetime(2024, 3, 1), datetime(2024, 4, 1)]
+        assert [a['row_count'] for a in archived] == [3, 3]
+        session = manager.get_session()
+        try:
+            assert session.query(func.count(SentimentPrediction.id)).scalar() == 7
+            assert session.query(func.count(PredictionArchive.id)).scalar() == 2
+            # 'review 0' is still used by a live row; the other archived texts are gone
+            assert session.query(func.count(PredictionText.hash)).scalar() == 7
+            # Stats still count archived predictions
+            assert sum(t['count'] for t in sentiment_totals(session)) == 13
+        finally:
+            session.close()
+        for entry in archived:
+            assert os.path.exists(os.path.join(manager.archive_dir, entry['path']))
+        # Nothing more is old enough
+        assert manager.archive_partitions(retention_days=45, period='month', now=NOW) == []
+
+    def test_archive_files_hold_the_rows(self, manager):
+        archived = manager.archive_partitions(retention_days=45, period='month', now=NOW)
+        rows = list(iter_archived_rows(os.path.join(manager.archive_dir, archived[0]['path'])))
+        assert [row[EXPORT_COLUMNS.index('request_id')] for row in rows] == \
+            ['archive-0', 'archive-1', 'archive-2']
+        assert rows[0][EXPORT_COLUMNS.index('timestamp')] == datetime(2024, 3, 10, 0)
+        assert rows[1][EXPORT_COLUMNS.index('text')] == 'review 1'
+
+    def test_reads_are_routed_across_partitions(self, manager):
+        session = manager.get_session()
+        try:
+            before = list(manager.iter_prediction_rows(session))
+        finally:
+            session.close()
+        manager.archive_partitions(retention_days=45, period='month', now=NOW)
+        session = manager.get_session()
+        try:
+            assert list(manager.iter_prediction_rows(session)) == before
+            april = list(manager.iter_prediction_rows(session, since=datetime(2024, 4, 1),
+                                                      until=datetime(2024, 5, 1)))
+            assert [row[0] for row in april] == [row[0] for row in before[3:6]]
+            assert len(manager.archives_for(session, since=datetime(2024, 4, 15))) == 1
+            assert manager.archives_for(session, since=datetime(2024, 5, 1)) == []
+            archived = manager.find_prediction(session, before[1][0])
+            assert archived['request_id'] == 'archive-1' and archived['archived']
+            assert manager.find_prediction(session, before[-1][0])['request_id'] == 'archive-12'
+            assert manager.find_prediction(session, 10 ** 6) is None
+        finally:
+            session.close()
+
+    def test_daily_partitions(self, manager):
+        archived = manager.archive_partitions(retention_days=0, period='day', now=NOW)
+        # Every day with predictions before June 15, one file each
+        assert len(archived) == 5
+        assert all(a['period_end'] - a['period_start'] == timedelta(days=1) for a in archived)
+
+    def test_late_rows_are_merged_into_their_archive(self, manager):
+        first = manager.archive_partitions(retention_days=45, period='month', now=NOW)
+        # A prediction for March arrives after March was archived
+        session = manager.get_session()
+        try:
+            session.execute(insert(SentimentPrediction),
+                            [make_row(13, datetime(2024, 3, 10, 0, 30))])
+            session.commit()
+            # Reads stay in (timestamp, id) order before the next run
+            march = list(manager.iter_prediction_rows(session, until=datetime(2024, 4, 1)))
+            assert [row[REQUEST_ID] for row in march] == \
+                ['archive-0', 'archive-13', 'archive-1', 'archive-2']
+        finally:
+            session.close()
+
+        merged = manager.archive_partitions(retention_days=45, period='month', now=NOW)
+        assert [(a['period_start'], a['row_count']) for a in merged] == [(datetime(2024, 3, 1), 4)]
+        assert not os.path.exists(os.path.join(manager.archive_dir, first[0]['path']))
+        session = manager.get_session()
+        try:
+            archives = manager.archives_for(session)
+            assert [a.period_start for a in archives] == [datetime(2024, 3, 1), datetime(2024, 4, 1)]
+            rows = list(iter_archived_rows(manager.archive_path(archives[0])))
+            assert [row[REQUEST_ID] for row in rows] == ['archive-0', 'archive-13', 'archive-1', 'archive-2']
+            assert session.query(func.count(SentimentPrediction.id)).scalar() == 7
+            late_id = rows[1][0]
+            assert manager.find_prediction(session, late_id)['request_id'] == 'archive-13'
+            everything = list(manager.iter_prediction_rows(session))
+            assert [row[0] for row in everything] == \
+                [row[0] for row in sorted(everything, key=lambda row: (row[TIMESTAMP], row[0]))]
+        finally:
+            session.close()
+
+    def test_archived_ids_are_not_reused(self, manager):
+        session = manager.get_session()
+        try:
+            last_id = session.query(func.max(SentimentPrediction.id)).scalar()
+        finally:
+            session.close()
+        archived = manager.archive_partitions(retention_days=0, period='month',
+                                              now=datetime(2024, 7, 1))
+        assert archived[-1]['last_id'] == last_id
+        session = manager.get_session()
+        try:
+            assert session.query(func.count(SentimentPrediction.id)).scalar() == 0
+            session.execute(insert(SentimentPrediction), [make_row(13, NOW)])
+            session.commit()
+            new_id = session.query(SentimentPrediction.id).scalar()
+            assert new_id > last_id
+            assert manager.find_prediction(session, last_id)['request_id'] == 'archive-12'
+            assert manager.find_prediction(session, new_id)['request_id'] == 'archive-13'
+        finally:
+            session.close()
+
+    def test_table_without_autoincrement_is_rebuilt(self, tmp_path):
+        url = 'sqlite:///' + str(tmp_path / 'rowids.db')
+        # The layout before the table was declared with AUTOINCREMENT
+        metadata = MetaData()
+        for table in Base.metadata.sorted_tables:
+            table.to_metadata(metadata)
+        metadata.tables[SentimentPrediction.__tablename__]\
+            .dialect_kwargs['sqlite_autoincrement'] = False
+        old = DatabaseManager(url, archive_dir=str(tmp_path / 'archives'))
+        metadata.create_all(old.engine)
+        session = old.get_session()
+        try:
+            session.execute(insert(SentimentPrediction),
+                            [make_row(i, datetime(2024, 3, 10, i)) for i in range(3)])
+            session.commit()
+        finally:
+            session.close()
+        [entry] = old.archive_partitions(retention_days=0, period='month', now=NOW)
+        old.engine.dispose()
+
+        manager = DatabaseManager(url, archive_dir=str(tmp_path / 'archives'))
+        manager.init_db()
+        session = manager.get_session()
+        try:
+            schema = session.execute(text("SELECT sql FROM sqlite_master WHERE name = "
+                                          "'sentiment_predictions'")).scalar()
+            assert 'AUTOINCREMENT' in schema
+            session.execute(insert(SentimentPrediction), [make_row(3, NOW)])
+            session.commit()
+            assert session.query(SentimentPrediction.id).scalar() > entry['last_id']
+        finally:
+            session.close()
+            manager.engine.dispose()
+            manager.read_engine.dispose()
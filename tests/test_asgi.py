@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+from webapp.asgi import app
+
+async def call(method, path, body=b'', content_type='application/json', parts=1):
+    """Run one request through the ASGI app, sending the body in `parts` pieces"""
+    size = max(1, -(-len(body) // parts))
+    messages = [
+        {'type': 'http.request', 'body': body[i:i + size],
+         'more_body': i + size < len(body)}
+        for i in range(0, len(body), size)
+    ] or [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': [(b'content-type', content_type.encode())]}
+    await app(scope, receive, send)
+    status = sent[0]['status']
+    payload = b''.join(message.get('body', b'') for message in sent[1:])
+    return status, payload
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+class TestASGIApp:
+    def test_predict(self):
+        status, body = run(call('POST', '/api/predict', json.dumps({'text': 'Great film'}).encode()))
+        result = json.loads(body)
+        assert status == 200
+        assert result['success'] == True
+        assert result['text'] == 'Great film'
+        assert result['prediction'] in ['Positive', 'Negative']
+
+    def test_predict_requires_text(self):
+        status, body = run(call('POST', '/api/predict', json.dumps({'text': '  '}).encode()))
+        assert status == 400
+        assert 'error' in json.loads(body)
+
+    def test_concurrent_predictions(self):
+        async def many():
+            texts = [f'review {i} was fine' for i in range(50)]
+            responses = await asyncio.gather(*[
+                call('POST', '/api/predict', json.dumps({'text': text}).encode())
+                for text in texts
+            ])
+            return texts, responses
+
+        texts, responses = run(many())
+        assert [json.loads(body)['text'] for _, body in responses] == texts
+        assert all(status == 200 for status, _ in responses)
+
+    def test_batch_json(self):
+        status, body = run(call('POST', '/api/predict/batch',
+                                json.dumps({'texts': ['good', '', 'bad']}).encode()))
+        data = json.loads(body)
+        assert status == 200
+        assert data['total'] == 3
+        assert data['succeeded'] == 2
+        assert [r['index'] for r in data['results']] == [0, 1, 2]
+
+    def test_batch_ndjson_streams_split_body(self):
+        lines = '\n'.join(json.dumps({'text': f'text {i}'}) for i in range(10)) + '\n'
+        status, body = run(call('POST', '/api/predict/batch', lines.encode(),
+                                content_type='application/x-ndjson', parts=7))
+        results = [json.loads(line) for line in body.decode().splitlines()]
+        assert status == 200
+        assert [r['text'] for r in results] == [f'text {i}' for i in range(10)]
+
+    def test_metrics(self):
+        status, body = run(call('GET', '/metrics'))
+        assert status == 200
+        assert b'sentiment_predictions_total' in body
+
+    @pytest.mark.parametrize('method, path, expected', [
+        ('GET', '/nowhere', 404),
+        ('GET', '/api/predict', 405),
+    ])
+    def test_unknown_routes(self, method, path, expected):
+        status, _ = run(call(method, path))
+        assert status == expected
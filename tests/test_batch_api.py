@@ -0,0 +1,58 @@
+import json
+import pytest
+from app.database import db_manager
+from app.models import SentimentPrediction
+
+class TestBatchPredictionAPI:
+    @pytest.fixture
+    def client(self):
+        from webapp.app import app
+        return app.test_client()
+
+    def test_json_batch_preserves_order(self, client):
+        texts = ["I love it", "", "Terrible service", 42, "Okay I guess"]
+        response = client.post('/api/predict/batch', json={'texts': texts})
+        assert response.status_code == 200
+
+        data = response.get_json()
+        assert data['total'] == 5
+        assert data['succeeded'] == 3
+        assert [r['index'] for r in data['results']] == [0, 1, 2, 3, 4]
+        assert [r['success'] for r in data['results']] == [True, False, True, False, True]
+        assert data['results'][2]['text'] == "Terrible service"
+
+    def test_successful_rows_are_stored(self, client):
+        response = client.post('/api/predict/batch', json=["stored one", "stored two"])
+        request_ids = [r['request_id'] for r in response.get_json()['results']]
+
+        session = db_manager.get_session()
+        try:
+            stored = session.query(SentimentPrediction)\
+                .filter(SentimentPrediction.request_id.in_(request_ids)).count()
+        finally:
+            session.close()
+        assert stored == 2
+
+    def test_database_errors_are_logged(self, client, monkeypatch, caplog):
+        def fail(results):
+            raise RuntimeError('database is locked')
+        monkeypatch.setattr(db_manager, 'bulk_save_predictions', fail)
+        response = client.post('/api/predict/batch', json=["not stored"])
+        # The results still go back to the client
+        assert response.status_code == 200
+        assert response.get_json()['succeeded'] == 1
+        assert 'Database error: database is locked' in caplog.text
+
+    def test_ndjson_batch_streams_results(self, client):
+        body = '\n'.join([json.dumps({'text': 'first'}), 'not json', json.dumps('third')])
+        response = client.post('/api/predict/batch', data=body,
+                               content_type='application/x-ndjson')
+        assert response.status_code == 200
+
+        results = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [r['index'] for r in results] == [0, 1, 2]
+        assert [r['success'] for r in results] == [True, False, True]
+
+    def test_empty_batch_is_rejected(self, client):
+        response = client.post('/api/predict/batch', json={'texts': []})
+        assert response.status_code == 400
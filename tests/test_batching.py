@@ -0,0 +1,48 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app import tokenization
+from app.batching import MicroBatcher
+from app.prediction import SentimentPredictor
+from config.settings import Config
+
+class TestMicroBatcher:
+    @pytest.fixture
+    def predictor(self):
+        return SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+
+    @pytest.fixture
+    def batcher(self, predictor):
+        batcher = MicroBatcher(predictor, max_batch_size=8, max_wait_ms=20)
+        yield batcher
+        batcher.close()
+
+    def test_batched_results_match_single_predictions(self, predictor, batcher):
+        texts = [f"review number {i} was {'great' if i % 2 else 'awful'}" for i in range(20)]
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            batched = list(pool.map(batcher.predict, texts))
+
+        for text, result in zip(texts, batched):
+            expected = predictor.predict(text)
+            assert result['success'] == True
+            assert result['text'] == text
+            assert result['prediction'] == expected['prediction']
+            assert result['confidence'] == pytest.approx(expected['confidence'], abs=1e-5)
+
+    def test_request_ids_are_unique(self, batcher):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.predict, ["same text"] * 8))
+        assert len({r['request_id'] for r in results}) == 8
+
+    def test_each_text_is_tokenized_once(self, batcher, monkeypatch):
+        calls = []
+        tokenize = tokenization.basic_english_tokenize
+        monkeypatch.setattr(tokenization, 'basic_english_tokenize',
+                            lambda text: calls.append(text) or tokenize(text))
+        # A cache miss: looked up, queued, batched and encoded
+        assert batcher.predict("tokenized only once, then batched")['success']
+        assert calls == ["tokenized only once, then batched"]
+
+    def test_delegates_to_wrapped_predictor(self, predictor, batcher):
+        assert batcher.model is predictor.model
+        assert batcher.vocab is predictor.vocab
@@ -0,0 +1,119 @@
+import csv
+import json
+import os
+import pytest
+from app.bulk_scoring import BulkScorer, Checkpoint
+from app.database import DatabaseManager
+from app.models import SentimentPrediction
+from app.prediction import SentimentPredictor
+from config.settings import Config
+
+TEXTS = [f"review {i}: the film was {'great' if i % 3 else 'awful'} and {i} people agreed"
+         for i in range(50)]
+
+class FailingPredictor:
+    """Forwards to a real predictor until ``calls`` forward passes have run"""
+
+    def __init__(self, predictor, calls):
+        self.predictor = predictor
+        self.calls = calls
+
+    def forward(self, batch, lengths):
+        if self.calls == 0:
+            raise RuntimeError("interrupted")
+        self.calls -= 1
+        return self.predictor.forward(batch, lengths)
+
+    def __getattr__(self, name):
+        return getattr(self.predictor, name)
+
+def read_ndjson(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+class TestBulkScorer:
+    @pytest.fixture(scope='class')
+    def predictor(self):
+        return SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+
+    @pytest.fixture
+    def ndjson_input(self, tmp_path):
+        path = tmp_path / 'input.ndjson'
+        lines = [json.dumps({'text': text, 'review_id': f'r{i}'}) for i, text in enumerate(TEXTS)]
+        lines.insert(10, json.dumps({'text': '   '}))
+        path.write_text('\n'.join(lines) + '\n')
+        return str(path)
+
+    def test_results_match_single_predictions(self, predictor, ndjson_input, tmp_path):
+        output = str(tmp_path / 'out.ndjson')
+        summary = BulkScorer(predictor, chunk_size=8, progress_seconds=0).score_file(
+            ndjson_input, output, id_field='review_id')
+        rows = read_ndjson(output)
+        assert summary['scored'] == 50 and summary['skipped'] == 1
+        assert [row['id'] for row in rows] == [f'r{i}' for i in range(50)]
+        for row in rows[::7]:
+            expected = predictor.predict(row['text'])
+            assert row['prediction'] == expected['prediction']
+            assert row['confidence'] == pytest.approx(expected['confidence'], abs=1e-4)
+
+    def test_tokenizer_processes(self, predictor, tmp_path):
+        source = tmp_path / 'input.csv'
+        with open(source, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'body'])
+            writer.writerows([i, text] for i, text in enumerate(TEXTS))
+        inline = str(tmp_path / 'inline.csv')
+        pooled = str(tmp_path / 'pooled.csv')
+        BulkScorer(predictor, chunk_size=16).score_file(str(source), inline, text_field='body')
+        BulkScorer(predictor, Config.VOCAB_PATH, workers=2, chunk_size=16).score_file(
+            str(source), pooled, text_field='body')
+
+        def columns(path):
+            with open(path, newline='') as f:
+                return [(r['index'], r['prediction'], r['confidence'][:6])
+                        for r in csv.DictReader(f)]
+        assert columns(pooled) == columns(inline)
+        assert len(columns(inline)) == 50
+
+    def test_resume_after_interruption(self, predictor, ndjson_input, tmp_path):
+        manager = DatabaseManager('sqlite:///' + str(tmp_path / 'bulk.db'))
+        manager.init_db()
+        output = str(tmp_path / 'out.ndjson')
+        with pytest.raises(RuntimeError):
+            BulkScorer(FailingPredictor(predictor, 3), chunk_size=8, manager=manager).score_file(
+                ndjson_input, output, to_database=True)
+        # Three chunks of 8 records, one of them blank
+        assert len(read_ndjson(output)) == 23
+
+        summary = BulkScorer(predictor, chunk_size=8, manager=manager).score_file(
+            ndjson_input, output, to_database=True)
+        rows = read_ndjson(output)
+        assert summary['resumed'] and summary['scored'] == 50
+        assert [row['index'] for row in rows] == [i for i in range(51) if i != 10]
+        session = manager.get_session()
+        try:
+            assert session.query(SentimentPrediction).count() == 50
+        finally:
+            session.close()
+
+    def test_resume_refuses_a_different_output(self, predictor, ndjson_input, tmp_path):
+        output = str(tmp_path / 'out.ndjson')
+        checkpoint = str(tmp_path / 'run.checkpoint')
+        with pytest.raises(RuntimeError):
+            BulkScorer(FailingPredictor(predictor, 2), chunk_size=8).score_file(
+                ndjson_input, output, checkpoint_path=checkpoint)
+        scorer = BulkScorer(predictor, chunk_size=8)
+        with pytest.raises(ValueError, match='was writing to'):
+            scorer.score_file(ndjson_input, str(tmp_path / 'other.ndjson'),
+                              checkpoint_path=checkpoint)
+        with pytest.raises(ValueError, match='was writing ndjson'):
+            scorer.score_file(ndjson_input, output, output_format='csv',
+                              checkpoint_path=checkpoint)
+        os.remove(output)
+        with pytest.raises(ValueError, match='expects'):
+            scorer.score_file(ndjson_input, output, checkpoint_path=checkpoint)
+        # Nothing was written by the refused runs; a restart starts over
+        assert not os.path.exists(output)
+        Checkpoint(checkpoint).clear()
+        summary = scorer.score_file(ndjson_input, output, checkpoint_path=checkpoint)
+        assert not summary['resumed'] and len(read_ndjson(output)) == 50
@@ -0,0 +1,67 @@
+import os
+import pytest
+from app.cache import PredictionCache, file_fingerprint
+from app.prediction import SentimentPredictor
+from config.settings import Config
+
+class TestPredictionCache:
+    def test_lru_eviction(self):
+        cache = PredictionCache(max_entries=2, ttl_seconds=0)
+        cache.put('a', ('Positive', 0.9, 1.0))
+        cache.put('b', ('Negative', 0.8, -1.0))
+        assert cache.get('a') is not None  # 'b' is now least recently used
+        cache.put('c', ('Positive', 0.7, 0.5))
+
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.get('c') is not None
+
+    def test_ttl_expiry(self, clock):
+        cache = PredictionCache(max_entries=10, ttl_seconds=60, clock=clock)
+        cache.put('a', ('Positive', 0.9, 1.0))
+        clock.now = 59
+        assert cache.get('a') is not None
+        clock.now = 61
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_byte_bound(self):
+        cache = PredictionCache(max_entries=0, max_bytes=1000, ttl_seconds=0)
+        for i in range(100):
+            cache.put(f'key-{i}', ('Positive', 0.9, 1.0))
+        assert 0 < len(cache) < 100
+
+    def test_versions_keep_their_own_entries(self):
+        # Two model versions served side by side, as in an A/B test
+        cache = PredictionCache()
+        v1, v2 = PredictionCache.make_key('text', 'v1'), PredictionCache.make_key('text', 'v2')
+        cache.put(v1, ('Positive', 0.9, 1.0))
+        cache.put(v2, ('Negative', 0.8, -1.0))
+        assert cache.get(v1) == ('Positive', 0.9, 1.0)
+        assert cache.get(v2) == ('Negative', 0.8, -1.0)
+
+    def test_keys_depend_on_fingerprint(self):
+        assert PredictionCache.make_key('text', 'v1') != PredictionCache.make_key('text', 'v2')
+
+    def test_file_fingerprint_follows_replaced_files(self, tmp_path):
+        path = str(tmp_path / 'model_weights.pt')
+        with open(path, 'wb') as f:
+            f.write(b'weights v1')
+        first = file_fingerprint(path)
+        assert file_fingerprint(path) == first
+        with open(path, 'wb') as f:
+            f.write(b'new weights')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+        assert file_fingerprint(path) != first
+
+    @pytest.mark.skipif(not Config.CACHE_ENABLED, reason='prediction cache disabled')
+    def test_predictor_serves_repeats_from_cache(self):
+        predictor = SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+        first = predictor.predict("Cache me if you can!")
+        # Same tokens after normalization, so the same cache entry
+        repeat = predictor.cached_result("  CACHE me if you can !")
+
+        assert repeat is not None
+        assert repeat['prediction'] == first['prediction']
+        assert repeat['confidence'] == first['confidence']
+        assert repeat['request_id'] != first['request_id']
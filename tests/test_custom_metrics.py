@@ -0,0 +1,81 @@
+import os
+import threading
+import pytest
+import monitoring.custom_metrics as custom_metrics
+from monitoring.custom_metrics import AdvancedMetrics, AnalyticsEngine
+
+def result(prediction, confidence):
+    return {'success': True, 'prediction': prediction, 'confidence': confidence}
+
+class TestAnalyticsEngine:
+    def test_ratios_confidence_and_throughput(self, clock):
+        engine = AnalyticsEngine(clock=clock)
+        for i in range(30):
+            engine.record(result('Positive' if i % 3 else 'Negative', 0.6 + i / 100))
+            clock.now += 1
+        engine.record({'success': False})
+        stats = engine.snapshot()['1m']
+        assert stats['count'] == 30
+        assert stats['positive_ratio'] == pytest.approx(20 / 30)
+        assert stats['negative_ratio'] == pytest.approx(10 / 30)
+        assert stats['mean_confidence'] == pytest.approx(0.745)
+        assert stats['quantiles'][0.5] == pytest.approx(0.745, abs=0.01)
+        assert stats['throughput_per_minute'] == pytest.approx(60)
+
+    def test_old_predictions_leave_shorter_windows(self, clock):
+        engine = AnalyticsEngine(clock=clock)
+        engine.record(result('Positive', 0.9))
+        clock.now += 120
+        engine.record(result('Negative', 0.7))
+        snapshot = engine.snapshot()
+        assert snapshot['1m']['count'] == 1
+        assert snapshot['1m']['positive_ratio'] == 0
+        assert snapshot['5m']['count'] == 2
+        assert snapshot['1h']['mean_confidence'] == pytest.approx(0.8)
+
+    def test_ring_buckets_are_reused(self, clock):
+        engine = AnalyticsEngine(windows={'10s': (10, 1)}, clock=clock)
+        for _ in range(25):
+            engine.record(result('Positive', 0.99))
+            clock.now += 1
+        assert engine.snapshot()['10s']['count'] == 9
+
+class TestAdvancedMetrics:
+    def test_windows_are_collected_through_the_registry(self, clock):
+        metrics = AdvancedMetrics(engine=AnalyticsEngine(clock=clock))
+        metrics.record(result('Positive', 0.8))
+        metrics.record(result('Negative', 0.6))
+        clock.now += 30
+        registry = metrics.registry
+        assert registry.get_sample_value('sentiment_positive_ratio', {'window': '5m'}) == 0.5
+        assert registry.get_sample_value('sentiment_avg_confidence', {'window': '1m'}) == \
+            pytest.approx(0.7)
+        assert registry.get_sample_value('sentiment_window_predictions', {'window': '1h'}) == 2
+        assert registry.get_sample_value('prediction_throughput', {'window': '1m'}) == \
+            pytest.approx(4)
+        assert registry.get_sample_value('sentiment_confidence_quantile',
+                                         {'window': '1m', 'quantile': '0.5'}) is not None
+
+    def test_pushes_periodically_and_deletes_on_stop(self, monkeypatch):
+        calls = []
+        pushed = threading.Event()
+
+        def push(url, job, registry, grouping_key):
+            calls.append(('push', url, grouping_key))
+            pushed.set()
+
+        monkeypatch.setattr(custom_metrics, 'push_to_gateway', push)
+        monkeypatch.setattr(custom_metrics, 'delete_from_gateway',
+                            lambda url, job, grouping_key: calls.append(('delete', url, grouping_key)))
+        metrics = AdvancedMetrics('gateway:9091', push_interval=0.01)
+        metrics.start_pushing()
+        assert pushed.wait(5)
+        metrics.stop_pushing()
+        group = {'pid': str(os.getpid())}
+        assert calls[0] == ('push', 'gateway:9091', group)
+        assert calls[-1] == ('delete', 'gateway:9091', group)
+
+    def test_pushing_is_opt_in(self):
+        metrics = AdvancedMetrics(None)
+        metrics.start_pushing()
+        assert metrics._pusher is None
@@ -0,0 +1,58 @@
+import threading
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.database import DatabaseManager
+from app.models import SentimentPrediction
+
+class TestDatabaseManager:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        manager = DatabaseManager('sqlite:///' + str(tmp_path / 'tuned.db'))
+        manager.init_db()
+        yield manager
+        manager.remove_request_session()
+        manager.engine.dispose()
+        manager.read_engine.dispose()
+
+    def test_sqlite_connections_are_tuned(self, manager):
+        with manager.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+
+    def test_read_engine_refuses_writes(self, manager):
+        session = manager.get_read_session()
+        try:
+            with pytest.raises(OperationalError):
+                session.execute(text("DELETE FROM sentiment_predictions"))
+        finally:
+            session.close()
+
+    def test_reads_do_not_wait_for_an_open_write(self, manager, make_result):
+        manager.bulk_save_predictions([make_result(1)])
+        with manager.engine.connect() as writer:
+            writer.execute(text('BEGIN IMMEDIATE'))
+            writer.execute(text("UPDATE sentiment_predictions SET confidence = 0.1"))
+            session = manager.get_read_session()
+            try:
+                # The reader sees the last committed value without blocking
+                assert session.query(SentimentPrediction.confidence).scalar() == 0.9
+            finally:
+                session.close()
+            writer.execute(text('ROLLBACK'))
+
+    def test_request_session_is_per_thread_until_removed(self, manager):
+        session = manager.request_session()
+        assert manager.request_session() is session
+        other = []
+        thread = threading.Thread(target=lambda: other.append(manager.request_session()))
+        thread.start()
+        thread.join()
+        assert other[0] is not session
+        manager.remove_request_session()
+        assert manager.request_session() is not session
+
+    def test_in_memory_database_shares_one_engine(self):
+        manager = DatabaseManager('sqlite://')
+        assert manager.read_engine is manager.engine
@@ -0,0 +1,72 @@
+import pytest
+from app.documents import DocumentScorer, stream_tokens
+from app.prediction import SentimentPredictor
+from app.tokenization import basic_english_tokenize
+from config.settings import Config
+from webapp.app import app, document_scorer
+
+class TestStreamTokens:
+    @pytest.mark.parametrize('pieces', [
+        ["It's a <br", " />great", " film!"],
+        ["Great <", "br /> movie,", " really."],
+        ["a<br", " x<BR />", "y"],
+    ])
+    def test_matches_whole_text_tokenization(self, pieces):
+        assert list(stream_tokens(pieces)) == basic_english_tokenize(''.join(pieces))
+
+    def test_decodes_characters_split_across_byte_chunks(self):
+        data = "café déjà vu".encode('utf-8')
+        pieces = [data[i:i + 1] for i in range(len(data))]
+        assert list(stream_tokens(pieces)) == ['café', 'déjà', 'vu']
+
+class TestDocumentScorer:
+    @pytest.fixture
+    def predictor(self):
+        return SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+
+    def test_windows_overlap(self, predictor):
+        scorer = DocumentScorer(predictor, window=256, stride=192)
+        windows = list(scorer.windows(range(600)))
+        assert [(w[0], w[-1]) for w in windows] == [(0, 255), (192, 447), (384, 599)]
+
+    def test_short_document_matches_single_prediction(self, predictor):
+        text = "An absolutely wonderful film with a great cast"
+        expected = predictor.predict(text)
+        for aggregation in ('mean', 'max', 'weighted'):
+            result = DocumentScorer(predictor).score([text], aggregation)
+            assert result['prediction'] == expected['prediction']
+            assert result['confidence'] == pytest.approx(expected['confidence'], abs=1e-4)
+            assert result['document']['windows'] == 1
+
+    def test_long_document_uses_every_window(self, predictor):
+        words = ' '.join(f'word{i}' for i in range(1000))
+        result = DocumentScorer(predictor, max_batch=2, preview_chars=50).score(
+            [words[i:i + 100] for i in range(0, len(words), 100)])
+        assert result['success'] == True
+        assert result['document']['tokens'] == 1000
+        assert result['document']['windows'] == 5
+        assert result['text'] == words[:50]
+
+class TestDocumentEndpoint:
+    @pytest.fixture
+    def client(self):
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+
+    def test_streamed_body(self, client):
+        body = ("The plot drags. " * 400).encode('utf-8')
+        response = client.post('/api/predict/document?aggregation=weighted', data=body,
+                               content_type='text/plain')
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data['document']['aggregation'] == 'weighted'
+        assert data['document']['windows'] > 1
+        assert len(data['text']) == Config.LONG_DOC_PREVIEW_CHARS
+
+    def test_rejects_bad_requests(self, client, monkeypatch):
+        assert client.post('/api/predict/document', data=b'   ').status_code == 400
+        assert client.post('/api/predict/document?aggregation=median',
+                           data=b'fine').status_code == 400
+        monkeypatch.setattr(document_scorer, 'max_tokens', 10)
+        assert client.post('/api/predict/document', data=b'word ' * 20).status_code == 413
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+import pytest
+from app.database import db_manager
+from app.export import columnar_available
+
+class TestExport:
+    @pytest.fixture(scope='class')
+    def client(self, make_result):
+        from dbapp.app import app
+        db_manager.init_db()
+        db_manager.bulk_save_predictions(
+            [make_result(i, f'export row {i} ' + 'x' * 200, request_id=f'export-{i}')
+             for i in range(12)]
+        )
+        return app.test_client()
+
+    def exported(self, client, query):
+        response = client.get('/export?' + query)
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.data.decode().splitlines()]
+
+    def our_rows(self, rows):
+        return [r for r in rows if r['request_id'].startswith('export-')]
+
+    def test_ndjson_full_text(self, client):
+        rows = self.our_rows(self.exported(client, 'format=ndjson'))
+        assert len(rows) == 12
+        assert len(rows[0]['text']) > 200
+
+    def test_truncated_text_and_sentiment_filter(self, client):
+        rows = self.our_rows(self.exported(client, 'text=truncated&sentiment=Positive'))
+        assert len(rows) == 6
+        assert all(r['text'].endswith('...') and len(r['text']) == 103 for r in rows)
+
+    def test_time_range_filter(self, client):
+        assert self.exported(client, 'since=2999-01-01T00:00:00') == []
+
+    def test_archives_listing(self, client):
+        response = client.get('/archives?since=2999-01-01T00:00:00')
+        assert response.status_code == 200
+        assert response.get_json() == {'archives': [], 'total_rows': 0}
+        assert client.get('/archives?since=yesterday').status_code == 400
+
+    def test_csv(self, client):
+        response = client.get('/export?format=csv')
+        rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+        assert len([r for r in rows if r['request_id'].startswith('export-')]) == 12
+
+    @pytest.mark.skipif(not columnar_available(), reason='pyarrow not installed')
+    def test_parquet(self, client):
+        import pyarrow.parquet as pq
+        response = client.get('/export?format=parquet&sentiment=Negative')
+        table = pq.read_table(io.BytesIO(response.data))
+        assert table.num_rows >= 6
+        assert table.column_names[0] == 'id'
+
+    def test_bad_format(self, client):
+        assert client.get('/export?format=xml').status_code == 400
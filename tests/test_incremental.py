@@ -0,0 +1,80 @@
+import pytest
+import torch
+from app.incremental import IncrementalScorer, SessionState, SessionStore
+from app.prediction import SentimentPredictor
+from config.settings import Config
+from webapp.app import app
+
+def state(fingerprint='a'):
+    return SessionState(torch.zeros(4), 1, 1, fingerprint)
+
+class TestIncrementalScorer:
+    @pytest.fixture
+    def predictor(self):
+        return SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+
+    def test_matches_scoring_the_whole_conversation(self, predictor):
+        scorer = IncrementalScorer(predictor, SessionStore())
+        messages = ["hello there, this looks fine", "actually I hate it!",
+                    "but the ending was great."]
+        for i, message in enumerate(messages, 1):
+            result = scorer.update('chat-1', message)
+            expected = predictor.predict(' '.join(messages[:i]))
+            assert result['prediction'] == expected['prediction']
+            assert result['confidence'] == pytest.approx(expected['confidence'], abs=1e-4)
+            assert result['sentiment_score'] == pytest.approx(expected['sentiment_score'], abs=1e-4)
+        assert result['session'] == {'id': 'chat-1', 'tokens': 17, 'messages': 3}
+
+    def test_sessions_are_independent(self, predictor):
+        scorer = IncrementalScorer(predictor, SessionStore())
+        scorer.update('a', "terrible awful film")
+        result = scorer.update('b', "a lovely film")
+        assert result['session']['messages'] == 1
+        assert result['confidence'] == pytest.approx(
+            predictor.predict("a lovely film")['confidence'], abs=1e-4)
+
+    def test_requires_the_sentinn_layout(self, predictor, monkeypatch):
+        monkeypatch.setattr(predictor, 'model', torch.nn.Linear(2, 2))
+        with pytest.raises(ValueError):
+            IncrementalScorer(predictor, SessionStore()).update('a', 'text')
+
+class TestSessionStore:
+    def test_evicts_least_recently_used(self):
+        store = SessionStore(max_sessions=2)
+        store.put('a', state())
+        store.put('b', state())
+        store.get('a', 'a')
+        store.put('c', state())
+        assert store.get('b', 'a') is None
+        assert store.get('a', 'a') is not None
+        assert len(store) == 2
+
+    def test_idle_sessions_expire(self, clock):
+        store = SessionStore(ttl_seconds=10, clock=clock)
+        store.put('a', state())
+        clock.now = 11
+        assert store.get('a', 'a') is None
+
+    def test_states_from_another_model_are_dropped(self):
+        store = SessionStore()
+        store.put('a', state(fingerprint='old'))
+        assert store.get('a', 'new') is None
+        assert len(store) == 0
+
+class TestStreamEndpoint:
+    @pytest.fixture
+    def client(self):
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+
+    def test_update_and_reset(self, client):
+        first = client.post('/api/stream/room-42', json={'text': 'what a great day'}).get_json()
+        second = client.post('/api/stream/room-42', json={'text': 'not anymore'}).get_json()
+        assert first['success'] == True
+        assert second['session']['messages'] == 2
+        assert second['session']['tokens'] == 6
+
+        assert client.delete('/api/stream/room-42').status_code == 200
+        assert client.delete('/api/stream/room-42').status_code == 404
+        assert client.post('/api/stream/room-42', json={'text': ' '}).status_code == 400
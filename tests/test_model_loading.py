@@ -0,0 +1,69 @@
+import os
+import tempfile
+import pytest
+import torch
+from app.model_loading import load_model, load_weights, load_vocab_table, is_state_dict_file
+from app.prediction import LazyPredictor
+from app.tokenization import VocabTable
+from config.settings import Config
+from ml_model.model_architecture import SentiNN
+
+class TestModelLoading:
+    @pytest.fixture
+    def paths(self):
+        directory = tempfile.mkdtemp()
+        torch.manual_seed(0)
+        model = SentiNN(input_size=200, embed_size=16, hidden_size=32)
+        pickled = os.path.join(directory, 'model.pth')
+        weights = os.path.join(directory, 'model_weights.pt')
+        torch.save(model, pickled)
+        torch.save(model.state_dict(), weights)
+        return pickled, weights
+
+    def test_state_dict_detection(self, paths):
+        pickled, weights = paths
+        assert is_state_dict_file(weights)
+        assert not is_state_dict_file(pickled)
+
+    def test_weights_match_pickled_model(self, paths):
+        pickled, weights = paths
+        legacy = load_model(pickled)
+        safe = load_weights(weights)
+        batch = torch.randint(0, 200, (4, 30))
+        with torch.no_grad():
+            assert torch.equal(legacy(batch), safe(batch))
+        assert not safe.training
+
+    def test_token_table_round_trip(self):
+        legacy = load_vocab_table(Config.VOCAB_PATH)
+        path = os.path.join(tempfile.mkdtemp(), 'vocab.bin')
+        legacy.save(path)
+
+        table = load_vocab_table(path)
+        assert VocabTable.is_table_file(path)
+        assert table.itos == legacy.itos
+        assert table.default_index == legacy.default_index
+        tokens = ['the', 'movie', 'zzzunknownzzz']
+        assert table(tokens) == legacy(tokens)
+
+    def test_corrupt_token_table_is_rejected(self):
+        path = os.path.join(tempfile.mkdtemp(), 'vocab.bin')
+        VocabTable(['<unk>', 'good', 'bad'], 0).save(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-5])
+        with pytest.raises(ValueError):
+            VocabTable.load(path)
+        with open(path, 'wb') as f:
+            f.write(b'SNTV')
+        with pytest.raises(ValueError):
+            VocabTable.load(path)
+
+    def test_lazy_predictor_defers_loading(self):
+        calls = []
+        lazy = LazyPredictor(lambda: calls.append(1) or 'predictor')
+        assert not lazy.loaded and calls == []
+        assert lazy.load() == 'predictor'
+        assert lazy.load() == 'predictor'
+        assert calls == [1]
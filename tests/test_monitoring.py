@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from prometheus_client import CollectorRegistry, Counter, REGISTRY
+from app.monitoring import _ScrapeCache, record_prediction
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RECORD = """
+from app.monitoring import record_prediction
+for _ in range(3):
+    record_prediction({'success': True, 'prediction': 'Positive', 'confidence': 0.8,
+                       'sentiment_score': 1.5, 'model_version': 'mp'}, 0.01)
+"""
+
+SCRAPE = "import sys; from app.monitoring import get_metrics; sys.stdout.write(get_metrics().decode())"
+
+def result(confidence, score):
+    return {'success': True, 'prediction': 'Negative', 'confidence': confidence,
+            'sentiment_score': score, 'model_version': 'hist-test'}
+
+class TestPredictionHistograms:
+    def test_confidence_and_score_are_distributions(self):
+        record_prediction(result(0.62, -0.4), 0.01)
+        record_prediction(result(0.97, -3.0), 0.01)
+        labels = {'sentiment': 'Negative', 'model_version': 'hist-test'}
+        assert REGISTRY.get_sample_value('sentiment_confidence_count', labels) == 2
+        assert REGISTRY.get_sample_value('sentiment_confidence_bucket',
+                                         dict(labels, le='0.65')) == 1
+        assert REGISTRY.get_sample_value('sentiment_score_bucket',
+                                         {'model_version': 'hist-test', 'le': '-2.5'}) == 1
+        assert REGISTRY.get_sample_value('sentiment_score_bucket',
+                                         {'model_version': 'hist-test', 'le': '0.0'}) == 2
+
+class TestScrapeCache:
+    def test_reuses_output_within_ttl(self):
+        registry = CollectorRegistry()
+        counter = Counter('scrapes_test_total', 'Test counter', registry=registry)
+        cache = _ScrapeCache(registry, ttl=60)
+        first = cache.render()
+        counter.inc()
+        assert cache.render() is first
+        assert _ScrapeCache(registry, ttl=0).render() != first
+
+class TestMultiprocessMetrics:
+    def test_scrape_merges_every_process(self, tmp_path):
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', RECORD], cwd=ROOT, env=env, check=True)
+        output = subprocess.run([sys.executable, '-c', SCRAPE], cwd=ROOT, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        assert 'sentiment_predictions_total{model_version="mp",sentiment="Positive",' \
+               'status="success"} 6.0' in output
+        assert 'sentiment_confidence_count{model_version="mp",sentiment="Positive"} 6.0' in output
@@ -0,0 +1,56 @@
+import copy
+import pytest
+import torch
+from app.inference import PAD_ID, PADDED_LENGTH, packed_forward, supports_packed
+from app.optimization import INFERENCE_BACKENDS, optimize_model
+from ml_model.model_architecture import SentiNN
+
+class TestOptimizedBackends:
+    @pytest.fixture
+    def model(self):
+        torch.manual_seed(0)
+        model = SentiNN(input_size=500, embed_size=32, hidden_size=64)
+        model.eval()
+        return model
+
+    @pytest.fixture
+    def batch(self):
+        lengths = [3, 40, 120, PADDED_LENGTH]
+        batch = torch.full((len(lengths), PADDED_LENGTH), PAD_ID, dtype=torch.long)
+        for i, length in enumerate(lengths):
+            batch[i, :length] = torch.randint(3, 500, (length,))
+            batch[i, length - 1] = 1  # <eos>
+        return batch, torch.tensor(lengths)
+
+    @pytest.mark.parametrize('backend', INFERENCE_BACKENDS)
+    @pytest.mark.parametrize('embedding_dtype', ['float32', 'float16', 'bfloat16'])
+    def test_backend_stays_close_to_fp32(self, model, batch, backend, embedding_dtype):
+        rows, lengths = batch
+        optimized = optimize_model(copy.deepcopy(model), backend, embedding_dtype)
+        with torch.no_grad():
+            expected = torch.softmax(model(rows), dim=1)
+            actual = torch.softmax(optimized(rows), dim=1)
+        assert torch.allclose(actual, expected, atol=1e-2)
+
+    def test_quantized_model_keeps_packed_inference(self, model, batch):
+        rows, lengths = batch
+        quantized = optimize_model(copy.deepcopy(model), 'quantized')
+        assert supports_packed(quantized)
+        with torch.no_grad():
+            expected = quantized(rows)
+            actual = packed_forward(quantized, rows, lengths)
+        assert torch.allclose(actual, expected, atol=1e-2)
+
+    def test_compiled_model_runs_padded(self, model):
+        assert not supports_packed(optimize_model(copy.deepcopy(model), 'torchscript'))
+
+    def test_half_embedding_halves_storage(self, model):
+        optimized = optimize_model(copy.deepcopy(model), 'eager', 'float16')
+        assert optimized.e.weight.dtype == torch.float16
+        assert optimized.e(torch.tensor([[3]])).dtype == torch.float32
+
+    def test_unknown_backend_is_rejected(self, model):
+        with pytest.raises(ValueError):
+            optimize_model(model, 'tensorrt')
+        with pytest.raises(ValueError):
+            optimize_model(model, 'eager', 'int4')
@@ -0,0 +1,49 @@
+import pytest
+import torch
+from app.inference import PAD_ID, PADDED_LENGTH, packed_forward, supports_packed
+from ml_model.model_architecture import SentiNN
+
+class TestPackedInference:
+    @pytest.fixture
+    def model(self):
+        torch.manual_seed(0)
+        model = SentiNN(input_size=500, embed_size=32, hidden_size=64)
+        model.eval()
+        return model
+
+    def make_batch(self, lengths):
+        batch = torch.full((len(lengths), PADDED_LENGTH), PAD_ID, dtype=torch.long)
+        for i, length in enumerate(lengths):
+            batch[i, :length] = torch.randint(3, 500, (length,))
+            batch[i, length - 1] = 1  # <eos>
+        return batch, torch.tensor(lengths)
+
+    def test_supports_sentinn(self, model):
+        assert supports_packed(model)
+        assert not supports_packed(torch.nn.Linear(4, 2))
+
+    def test_logits_match_padded_forward(self, model):
+        batch, lengths = self.make_batch([1, 2, 5, 17, 64, 200, 256, PADDED_LENGTH])
+        with torch.no_grad():
+            expected = model(batch)
+            actual = packed_forward(model, batch, lengths)
+        assert torch.allclose(actual, expected, atol=1e-4)
+
+    def test_zero_tolerance_replays_full_tail(self, model):
+        batch, lengths = self.make_batch([3, 40, 120])
+        with torch.no_grad():
+            expected = model(batch)
+            actual = packed_forward(model, batch, lengths, tolerance=0)
+        assert torch.allclose(actual, expected, atol=1e-5)
+
+    def test_predictions_match_padded_predictor(self):
+        from app.prediction import SentimentPredictor
+        from config.settings import Config
+        predictor = SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+        texts = ["great", "I hated every minute of it.", "fine " * 300]
+        batch, lengths = predictor.preprocess_batch(texts)
+
+        with torch.no_grad():
+            expected = predictor.model(batch)
+        actual = packed_forward(predictor.model, batch, lengths)
+        assert torch.allclose(actual, expected, atol=1e-4)
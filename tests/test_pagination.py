@@ -0,0 +1,60 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, SentimentPrediction
+from app.pagination import keyset_page, decode_cursor
+
+class TestKeysetPagination:
+    @pytest.fixture
+    def session(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        start = datetime(2024, 1, 1)
+        for i in range(23):
+            session.add(SentimentPrediction(
+                text=f'text {i}',
+                prediction='Positive' if i % 2 else 'Negative',
+                confidence=0.5,
+                sentiment_score=0.0,
+                # Pairs of rows share a timestamp to exercise the id tie-break
+                timestamp=start + timedelta(seconds=i // 2),
+                request_id=f'req-{i}',
+                processing_time=0.01
+            ))
+        session.commit()
+        yield session
+        session.close()
+
+    def walk(self, query, per_page):
+        pages, cursor = [], None
+        while True:
+            rows, cursor, _ = keyset_page(query, per_page, after=cursor)
+            pages.append([row.id for row in rows])
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_every_row_newest_first(self, session):
+        pages = self.walk(session.query(SentimentPrediction), 5)
+        ids = [i for page in pages for i in page]
+        assert len(pages) == 5
+        assert ids == list(range(23, 0, -1))
+
+    def test_sentiment_filter(self, session):
+        query = session.query(SentimentPrediction)\
+            .filter(SentimentPrediction.prediction == 'Positive')
+        ids = [i for page in self.walk(query, 4) for i in page]
+        assert ids == [i for i in range(23, 0, -1) if (i - 1) % 2]
+
+    def test_before_returns_previous_page(self, session):
+        query = session.query(SentimentPrediction)
+        first, next_cursor, prev_cursor = keyset_page(query, 5)
+        assert prev_cursor is None
+        second, _, prev_cursor = keyset_page(query, 5, after=next_cursor)
+        back, _, _ = keyset_page(query, 5, before=prev_cursor)
+        assert [row.id for row in back] == [row.id for row in first]
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError):
+            decode_cursor('not-a-cursor')
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+from datetime import datetime
+from app.persistence import WriteBehindQueue
+
+class RecordingManager:
+    def __init__(self, gate=None, failures=0):
+        self.batches = []
+        self.timestamps = []
+        self.gate = gate
+        self.failures = failures
+
+    def bulk_save_predictions(self, results, timestamp=None):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('database is locked')
+        self.batches.append([r['request_id'] for r in results])
+        self.timestamps.append([r.get('timestamp') or timestamp for r in results])
+        return len(results)
+
+class TestWriteBehindQueue:
+    def test_rows_are_written_in_batches(self, make_result):
+        manager = RecordingManager()
+        write_queue = WriteBehindQueue(manager, batch_size=10, flush_interval=5)
+        for i in range(25):
+            assert write_queue.submit(make_result(i))
+        write_queue.close()
+
+        written = [request_id for batch in manager.batches for request_id in batch]
+        assert written == [f'req-{i}' for i in range(25)]
+        assert all(len(batch) <= 10 for batch in manager.batches)
+
+    def test_close_drains_accepted_rows(self, make_result):
+        manager = RecordingManager()
+        write_queue = WriteBehindQueue(manager, batch_size=1000, flush_interval=60)
+        for i in range(5):
+            write_queue.submit(make_result(i))
+        write_queue.close()
+        assert sum(len(batch) for batch in manager.batches) == 5
+
+    def test_full_queue_drops_rows(self, make_result):
+        gate = threading.Event()
+        manager = RecordingManager(gate)
+        write_queue = WriteBehindQueue(manager, max_size=2, batch_size=1,
+                                       flush_interval=0, put_timeout=0.01)
+        accepted = [write_queue.submit(make_result(i)) for i in range(10)]
+        gate.set()
+        write_queue.close()
+
+        assert not all(accepted)
+        assert sum(len(batch) for batch in manager.batches) == sum(accepted)
+
+    def test_rows_keep_their_submission_time(self, make_result):
+        manager = RecordingManager()
+        write_queue = WriteBehindQueue(manager, batch_size=2, flush_interval=60)
+        before = datetime.utcnow()
+        write_queue.submit(make_result(0))
+        threading.Event().wait(0.02)
+        write_queue.submit(make_result(1))
+        write_queue.close()
+
+        [[first, second]] = manager.timestamps
+        assert before <= first < second
+        assert (second - first).total_seconds() >= 0.02
+
+    def test_failed_predictions_are_not_queued(self):
+        write_queue = WriteBehindQueue(RecordingManager())
+        assert not write_queue.submit({'success': False})
+
+    def test_failed_batches_are_spilled_and_replayed(self, tmp_path, make_result):
+        # Both tries of the first batch fail, so it goes to a spill file
+        manager = RecordingManager(failures=2)
+        spill_dir = str(tmp_path / 'spill')
+        write_queue = WriteBehindQueue(manager, batch_size=3, flush_interval=60, retries=1,
+                                       spill_dir=spill_dir)
+        for i in range(3):
+            write_queue.submit(make_result(i))
+        for _ in range(500):
+            if os.path.isdir(spill_dir) and os.listdir(spill_dir):
+                break
+            threading.Event().wait(0.01)
+        # The next successful flush replays it
+        for i in range(3, 6):
+            write_queue.submit(make_result(i))
+        write_queue.close()
+
+        assert manager.batches == [['req-3', 'req-4', 'req-5'], ['req-0', 'req-1', 'req-2']]
+        # Replayed rows keep the time they were first submitted
+        assert max(manager.timestamps[1]) < min(manager.timestamps[0])
+        assert [name for name in os.listdir(spill_dir) if name.startswith('spill-')] == []
+
+    def test_spilled_batches_are_replayed_on_start(self, tmp_path, make_result):
+        spill_dir = str(tmp_path / 'spill')
+        failing = WriteBehindQueue(RecordingManager(failures=10), retries=0, spill_dir=spill_dir)
+        failing.submit(make_result(0))
+        failing.close()
+        assert len([name for name in os.listdir(spill_dir) if name.startswith('spill-')]) == 1
+
+        manager = RecordingManager()
+        write_queue = WriteBehindQueue(manager, spill_dir=spill_dir)
+        write_queue.submit(make_result(1))
+        write_queue.close()
+        assert manager.batches == [['req-0'], ['req-1']]
+
+    def test_spill_files_with_one_timestamp_are_replayed(self, tmp_path, make_result):
+        # The layout written before each row kept its own timestamp
+        spill_dir = tmp_path / 'spill'
+        spill_dir.mkdir()
+        with open(spill_dir / 'spill-20240101T000000000000-1.json', 'w') as f:
+            json.dump({'timestamp': '2024-01-01T00:00:00', 'rows': [make_result(0)]}, f)
+
+        manager = RecordingManager()
+        write_queue = WriteBehindQueue(manager, spill_dir=str(spill_dir))
+        write_queue.submit(make_result(1))
+        write_queue.close()
+        assert manager.batches == [['req-0'], ['req-1']]
+        assert manager.timestamps[0] == [datetime(2024, 1, 1)]
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import pytest
+from prometheus_client import REGISTRY
+from app.prediction import SentimentPredictor
+from app.profiling import NULL_TIMER, ProfileLog, StageTimer, start_timer
+import app.profiling as profiling
+from config.settings import Config
+
+def stage_count(stage):
+    return REGISTRY.get_sample_value('sentiment_stage_duration_seconds_count',
+                                     {'stage': stage}) or 0
+
+class TestStageTimer:
+    @pytest.fixture
+    def predictor(self):
+        return SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH)
+
+    def test_marks_split_elapsed_time(self):
+        timer = StageTimer()
+        timer.mark('tokenize')
+        timer.mark('forward')
+        timer.mark('forward')
+        assert set(timer.stages) == {'tokenize', 'forward'}
+        assert sum(timer.stages.values()) == timer._last - timer.started
+
+    def test_predict_batch_records_every_model_stage(self, predictor):
+        stages = ('cache_lookup', 'tokenize', 'vocab_lookup', 'tensor',
+                  'forward', 'softmax', 'postprocess')
+        before = {stage: stage_count(stage) for stage in stages}
+        predictor.predict_batch(["stage timing test one", "and another"], check_cache=False)
+        for stage in stages:
+            assert stage_count(stage) == before[stage] + 1
+
+    def test_disabled_metrics_use_null_timer(self, monkeypatch):
+        monkeypatch.setattr(Config, 'STAGE_METRICS_ENABLED', False)
+        assert start_timer() is NULL_TIMER
+
+    def test_sampled_batches_are_written_to_profile_log(self, predictor, monkeypatch):
+        path = os.path.join(tempfile.mkdtemp(), 'profile.jsonl')
+        monkeypatch.setattr(profiling, 'profile_log', ProfileLog(path))
+        monkeypatch.setattr(Config, 'PROFILE_SAMPLE_RATE', 1.0)
+
+        results = predictor.predict_batch(["profile me", "me too"], check_cache=False)
+
+        with open(path) as f:
+            record = json.loads(f.readline())
+        assert record['request_ids'] == [r['request_id'] for r in results]
+        assert record['batch_size'] == 2
+        assert {'tokenize', 'vocab_lookup', 'forward'} <= set(record['stages_us'])
+        assert record['total_us'] >= sum(record['stages_us'].values()) - 1
+
+    def test_profile_log_errors_are_logged(self, tmp_path, caplog):
+        log = ProfileLog(str(tmp_path / 'missing' / 'profile.jsonl'))
+        timer = StageTimer()
+        timer.mark('forward')
+        log.write(timer, [])
+        assert 'Profile log error' in caplog.text
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import time
+import pytest
+from app.prediction import LazyPredictor, SentimentPredictor
+from app.registry import ModelRegistry
+from config.settings import Config
+
+class TestModelRegistry:
+    @pytest.fixture
+    def registry(self):
+        default = SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH, 'v1')
+        registry = ModelRegistry(SentimentPredictor, 'v1', default)
+        registry.load_version('v2', Config.MODEL_PATH, Config.VOCAB_PATH)
+        return registry
+
+    def test_results_are_tagged_with_version(self, registry):
+        result = registry.predict("a wonderful film")
+        assert result['success'] == True
+        assert result['model_version'] == 'v1'
+
+        registry.activate('v2')
+        assert registry.predict("a wonderful film")['model_version'] == 'v2'
+
+    def test_traffic_split_is_deterministic(self, registry):
+        registry.set_traffic({'v1': 80, 'v2': 20})
+        texts = [f"review {i}" for i in range(2000)]
+        versions = [registry.route(text)[0] for text in texts]
+
+        assert versions == [registry.route(text)[0] for text in texts]
+        assert 0.15 < versions.count('v2') / len(texts) < 0.25
+
+    def test_batch_keeps_input_order_across_versions(self, registry):
+        registry.set_traffic({'v1': 50, 'v2': 50})
+        texts = [f"review {i}" for i in range(40)]
+        results = registry.predict_batch(texts)
+
+        assert [r['text'] for r in results] == texts
+        assert {r['model_version'] for r in results} == {'v1', 'v2'}
+        for text, result in zip(texts, results):
+            assert result['model_version'] == registry.route(text)[0]
+
+    def test_warm_up_loads_every_version(self):
+        lazy = LazyPredictor(lambda: SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH, 'v1'))
+        registry = ModelRegistry(SentimentPredictor, 'v1', lazy)
+        assert not lazy.loaded
+        registry.warm_up()
+        assert lazy.loaded
+
+    def test_unknown_version_is_rejected(self, registry):
+        with pytest.raises(KeyError):
+            registry.set_traffic({'v3': 100})
+        with pytest.raises(ValueError):
+            registry.unload('v1')
+
+    def test_manifest_loads_and_switches_versions(self, registry):
+        manifest = os.path.join(tempfile.mkdtemp(), 'models.json')
+        with open(manifest, 'w') as f:
+            json.dump({
+                'versions': {'v3': {'model_path': Config.MODEL_PATH,
+                                    'vocab_path': Config.VOCAB_PATH}},
+                'traffic': {'v3': 100}
+            }, f)
+        registry.manifest_path = manifest
+        registry.sync_manifest()
+
+        assert registry.traffic() == {'v3': 100.0}
+        # The default version can go as well once the manifest drops it
+        assert set(registry.versions()) == {'v3'}
+        assert registry.predict("fine")['model_version'] == 'v3'
+
+    def test_pool_allows_a_single_version(self):
+        default = SentimentPredictor(Config.MODEL_PATH, Config.VOCAB_PATH, 'v1')
+        registry = ModelRegistry(SentimentPredictor, 'v1', default, single_version=True)
+        with pytest.raises(ValueError):
+            registry.load_version('v2', Config.MODEL_PATH, Config.VOCAB_PATH)
+        assert set(registry.versions()) == {'v1'}
+
+    def test_watcher_survives_a_manifest_deleted_mid_poll(self, registry, monkeypatch):
+        manifest = os.path.join(tempfile.mkdtemp(), 'models.json')
+        with open(manifest, 'w') as f:
+            f.write('{}')
+        calls = []
+
+        def vanish():
+            calls.append(1)
+            if len(calls) == 1:
+                os.remove(manifest)
+                raise ValueError('manifest went away')
+
+        monkeypatch.setattr(registry, 'sync_manifest', vanish)
+        registry.manifest_path = manifest
+        registry.poll_seconds = 0.01
+        registry.route('start the watcher')
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with open(manifest, 'w') as f:
+            f.write('{"versions": {}}')
+        while len(calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry._watcher.is_alive() and len(calls) == 2
+        registry.poll_seconds = 60
@@ -0,0 +1,72 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, SentimentPrediction, PredictionRollup
+from app.rollups import apply_rollups, rebuild_rollups, sentiment_totals, count_since
+
+# Recent enough that minute buckets are within their retention window
+NOW = datetime.utcnow().replace(second=0, microsecond=0)
+
+def make_rows():
+    rows = []
+    for i in range(200):
+        rows.append({
+            'text': f'text {i}',
+            'prediction': 'Positive' if i % 3 else 'Negative',
+            'confidence': 0.5 + (i % 50) / 100,
+            'sentiment_score': 0.0,
+            'request_id': f'req-{i}',
+            'processing_time': 0.001 * (i % 7 + 1),
+            # One row every 10 minutes, going back ~33 hours
+            'timestamp': NOW - timedelta(minutes=10 * i)
+        })
+    return rows
+
+class TestRollups:
+    @pytest.fixture
+    def session(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+
+    def store(self, session, rows):
+        session.execute(insert(SentimentPrediction), rows)
+        # Apply in several chunks to exercise the upsert path
+        for start in range(0, len(rows), 37):
+            apply_rollups(session, rows[start:start + 37])
+        session.commit()
+
+    def test_totals_match_raw_aggregates(self, session):
+        rows = make_rows()
+        self.store(session, rows)
+
+        totals = {t['sentiment']: t for t in sentiment_totals(session)}
+        for sentiment in ('Positive', 'Negative'):
+            subset = [r for r in rows if r['prediction'] == sentiment]
+            assert totals[sentiment]['count'] == len(subset)
+            assert totals[sentiment]['confidence_sum'] == pytest.approx(sum(r['confidence'] for r in subset))
+            assert totals[sentiment]['confidence_min'] == min(r['confidence'] for r in subset)
+            assert totals[sentiment]['confidence_max'] == max(r['confidence'] for r in subset)
+            assert totals[sentiment]['processing_time_max'] == max(r['processing_time'] for r in subset)
+
+    def test_count_since_matches_raw_filter(self, session):
+        rows = make_rows()
+        self.store(session, rows)
+
+        for hours in (1, 5, 24):
+            since = NOW - timedelta(hours=hours, minutes=5)
+            expected = sum(1 for r in rows if r['timestamp'] >= since)
+            assert count_since(session, since) == expected
+
+    def test_rebuild_matches_incremental(self, session):
+        self.store(session, make_rows())
+        incremental = sentiment_totals(session)
+        rebuild_rollups(session)
+        session.commit()
+
+        rebuilt = sentiment_totals(session)
+        assert [t['count'] for t in rebuilt] == [t['count'] for t in incremental]
+        assert session.query(PredictionRollup).filter_by(granularity='hour').count() > 0
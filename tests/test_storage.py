@@ -0,0 +1,178 @@
+import uuid
+import pytest
+from sqlalchemy import create_engine, func, insert, inspect, text
+from app.database import DatabaseManager
+from app.models import PredictionText, SentimentPrediction
+
+LEGACY_SCHEMA = """
+CREATE TABLE sentiment_predictions (
+    id INTEGER NOT NULL PRIMARY KEY,
+    text TEXT NOT NULL,
+    prediction VARCHAR(50) NOT NULL,
+    confidence FLOAT NOT NULL,
+    sentiment_score FLOAT NOT NULL,
+    timestamp DATETIME,
+    request_id VARCHAR(100) NOT NULL UNIQUE,
+    processing_time FLOAT NOT NULL,
+    model_version VARCHAR(50)
+)
+"""
+
+class TestCompactStorage:
+    @pytest.fixture
+    def manager(self):
+        manager = DatabaseManager('sqlite://')
+        manager.init_db()
+        return manager
+
+    def test_repeated_texts_are_stored_once(self, manager, make_result):
+        manager.bulk_save_predictions([make_result(i, 'the same review') for i in range(10)]
+                                      + [make_result(10, 'another review')])
+        session = manager.get_session()
+        try:
+            assert session.query(func.count(SentimentPrediction.id)).scalar() == 11
+            assert session.query(func.count(PredictionText.hash)).scalar() == 2
+        finally:
+            session.close()
+
+    def test_rows_read_back_like_before(self, manager, make_result):
+        result = make_result(1, 'x' * 150)
+        manager.bulk_save_predictions([result])
+        session = manager.get_session()
+        try:
+            prediction = session.query(SentimentPrediction)\
+                .filter(SentimentPrediction.request_id == result['request_id']).one()
+            assert prediction.text == 'x' * 150
+            record = prediction.to_dict()
+            assert record['text'] == 'x' * 100 + '...'
+            assert record['request_id'] == result['request_id']
+            # The text can still be filtered on
+            assert session.query(SentimentPrediction)\
+                .filter(SentimentPrediction.text == 'x' * 150).count() == 1
+        finally:
+            session.close()
+
+    def test_request_ids_are_stored_compactly(self, manager, make_result):
+        results = [make_result(1, request_id=str(uuid.uuid4())),
+                   make_result(2, request_id='batch-7')]
+        manager.bulk_save_predictions(results)
+        session = manager.get_session()
+        try:
+            stored = session.execute(
+                text('SELECT length(request_id) FROM sentiment_predictions ORDER BY id')
+            ).scalars().all()
+            assert stored == [17, 8]
+            assert [row[0] for row in session.query(SentimentPrediction.request_id)
+                    .order_by(SentimentPrediction.id)] == [r['request_id'] for r in results]
+        finally:
+            session.close()
+
+    def test_orm_objects_and_bulk_inserts_share_texts(self, manager, make_result):
+        session = manager.get_session()
+        try:
+            session.add(SentimentPrediction(text='shared', prediction='Positive', confidence=0.8,
+                                            sentiment_score=0.5, request_id='orm-1',
+                                            processing_time=0.01))
+            session.commit()
+            row = make_result(2, 'shared')
+            del row['success']
+            session.execute(insert(SentimentPrediction), [row])
+            session.commit()
+            assert session.query(func.count(PredictionText.hash)).scalar() == 1
+            assert [p.text for p in session.query(SentimentPrediction)] == ['shared', 'shared']
+        finally:
+            session.close()
+
+    def test_orm_objects_can_repeat_a_stored_text(self, manager):
+        def add(*request_ids):
+            session = manager.get_session()
+            try:
+                for request_id in request_ids:
+                    session.add(SentimentPrediction(text='again', prediction='Positive',
+                                                    confidence=0.8, sentiment_score=0.5,
+                                                    request_id=request_id, processing_time=0.01))
+                session.commit()
+            finally:
+                session.close()
+
+        add('orm-1')
+        add('orm-2', 'orm-3')
+        session = manager.get_session()
+        try:
+            assert session.query(func.count(PredictionText.hash)).scalar() == 1
+            assert [p.text for p in session.query(SentimentPrediction)] == ['again'] * 3
+        finally:
+            session.close()
+
+    def legacy_database(self, tmp_path, request_ids):
+        url = 'sqlite:///' + str(tmp_path / 'legacy.db')
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text(LEGACY_SCHEMA))
+            for i, request_id in enumerate(request_ids, 1):
+                conn.execute(text(
+                    "INSERT INTO sentiment_predictions VALUES "
+                    "(:id, :text, 'Positive', 0.9, 1.0, '2024-01-01 00:00:00', :request_id, 0.01, 'v1')"
+                ), {'id': i * 10, 'text': f'review {i % 2}', 'request_id': request_id})
+        engine.dispose()
+        return url
+
+    def test_legacy_database_is_migrated(self, tmp_path):
+        request_ids = [str(uuid.uuid4()) for _ in range(5)] + ['batch-req-1']
+        url = self.legacy_database(tmp_path, request_ids)
+
+        manager = DatabaseManager(url)
+        manager.init_db()
+        # A second start finds nothing left to migrate
+        manager.init_db()
+        session = manager.get_session()
+        try:
+            predictions = session.query(SentimentPrediction).order_by(SentimentPrediction.id).all()
+            assert [p.id for p in predictions] == [10, 20, 30, 40, 50, 60]
+            assert [p.request_id for p in predictions] == request_ids
+            assert [p.text for p in predictions] == [f'review {i % 2}' for i in range(1, 7)]
+            assert session.query(func.count(PredictionText.hash)).scalar() == 2
+            assert predictions[0].to_dict()['timestamp'] == '2024-01-01T00:00:00'
+        finally:
+            session.close()
+            manager.engine.dispose()
+            manager.read_engine.dispose()
+
+    def test_interrupted_migration_runs_again(self, tmp_path, monkeypatch):
+        import app.database as database
+        request_ids = [f'req-{i}' for i in range(6)]
+        url = self.legacy_database(tmp_path, request_ids)
+        manager = DatabaseManager(url)
+        real_store_texts = database.store_texts
+        migrate = DatabaseManager._migrate_inline_texts
+        batches = []
+
+        def failing_store_texts(connection, texts):
+            batches.append(texts)
+            if len(batches) == 2:
+                raise RuntimeError('interrupted')
+            real_store_texts(connection, texts)
+
+        monkeypatch.setattr(database, 'store_texts', failing_store_texts)
+        monkeypatch.setattr(DatabaseManager, '_migrate_inline_texts',
+                            lambda self: migrate(self, batch_size=2))
+        with pytest.raises(RuntimeError):
+            manager.init_db()
+        monkeypatch.setattr(database, 'store_texts', real_store_texts)
+        try:
+            tables = inspect(manager.engine).get_table_names()
+            assert 'sentiment_predictions_compact' not in tables
+            assert 'text' in {c['name'] for c in
+                              inspect(manager.engine).get_columns('sentiment_predictions')}
+            manager.init_db()
+            session = manager.get_session()
+            try:
+                predictions = session.query(SentimentPrediction)\
+                    .order_by(SentimentPrediction.id).all()
+                assert [p.request_id for p in predictions] == request_ids
+                assert [p.text for p in predictions] == [f'review {i % 2}' for i in range(1, 7)]
+            finally:
+                session.close()
+        finally:
+            manager.engine.dispose()
+            manager.read_engine.dispose()
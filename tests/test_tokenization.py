@@ -0,0 +1,62 @@
+import pickle
+import pytest
+from torchtext.data.utils import get_tokenizer
+from app.inference import MAX_SEQ_LEN, EOS_ID, PAD_ID, PADDED_LENGTH
+from app.tokenization import basic_english_tokenize, TextEncoder, VocabTable
+from config.settings import Config
+
+TEXTS = [
+    "I love this product! It's amazing!",
+    "This is terrible and awful!",
+    'He said "no"; she said: (maybe)... OK?',
+    "Line one<br />Line two<BR />three",
+    "<br;/>hello",
+    "a<br:/>b",
+    'quoted<br" />break',
+    "MiXeD CaSe, tabs\tand\nnewlines  ",
+    "unknownwordzzz qwertyuiop",
+    "",
+    "   ",
+    "emoji 😀 and accents café naïve",
+    "word " * 400,
+]
+
+class TestTokenization:
+    @pytest.fixture(scope='class')
+    def vocab(self):
+        with open(Config.VOCAB_PATH, 'rb') as f:
+            return pickle.load(f)
+
+    @pytest.fixture(scope='class')
+    def encoder(self, vocab):
+        return TextEncoder(VocabTable.from_vocab(vocab))
+
+    def reference_ids(self, vocab, text):
+        tokenizer = get_tokenizer("basic_english", language="en")
+        token_ids = vocab(tokenizer(text))[:MAX_SEQ_LEN]
+        token_ids.append(EOS_ID)
+        return token_ids
+
+    @pytest.mark.parametrize('text', TEXTS)
+    def test_tokenizer_matches_basic_english(self, text):
+        assert basic_english_tokenize(text) == get_tokenizer("basic_english")(text)
+
+    @pytest.mark.parametrize('text', TEXTS)
+    def test_encode_matches_vocab_lookup(self, vocab, encoder, text):
+        assert encoder.encode(text).tolist() == self.reference_ids(vocab, text)
+
+    def test_encode_batch_pads_rows(self, vocab, encoder):
+        batch, lengths = encoder.encode_batch(TEXTS)
+        assert batch.shape == (len(TEXTS), PADDED_LENGTH)
+        for row, text in enumerate(TEXTS):
+            expected = self.reference_ids(vocab, text)
+            assert lengths[row] == len(expected)
+            assert batch[row, :len(expected)].tolist() == expected
+            assert (batch[row, len(expected):] == PAD_ID).all()
+
+    def test_encode_batch_reuses_buffer(self, encoder):
+        import numpy as np
+        buffer = np.zeros((8, PADDED_LENGTH), dtype=np.int64)
+        batch, _ = encoder.encode_batch(TEXTS[:3], out=buffer)
+        assert np.shares_memory(batch, buffer)
+        assert batch.shape == (3, PADDED_LENGTH)
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pytest
+import torch
+from app.inference import PADDED_LENGTH, PAD_ID
+from app.worker_pool import (InferencePool, PoolClient, decode_message, encode_error,
+                              encode_message, parse_address, worker_address)
+from ml_model.model_architecture import SentiNN
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='inference pool requires fork()')
+
+class SlowModel(torch.nn.Module):
+    """Waits in proportion to the batch size, like an I/O-bound model"""
+    DELAY = 0.1
+
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(1, 2)
+
+    def forward(self, batch):
+        time.sleep(self.DELAY * len(batch) / 8)
+        return torch.zeros(len(batch), 2)
+
+class TestInferencePool:
+    @pytest.fixture
+    def model(self):
+        torch.manual_seed(0)
+        model = SentiNN(input_size=300, embed_size=16, hidden_size=32)
+        model.eval()
+        return model
+
+    @pytest.fixture
+    def pool(self, model):
+        address = os.path.join(tempfile.mkdtemp(), 'pool.sock')
+        pool = InferencePool(model, address, workers=2, authkey=b'test')
+        pool.start()
+        yield pool, PoolClient(address, authkey=b'test', workers=2)
+        pool.stop()
+
+    def test_parse_address(self):
+        assert parse_address('localhost:5002') == ('localhost', 5002)
+        assert parse_address('/tmp/pool.sock') == '/tmp/pool.sock'
+        assert worker_address(('localhost', 5002), 1) == ('localhost', 5003)
+        assert worker_address('/tmp/pool.sock', 1) == '/tmp/pool.sock.1'
+
+    def test_authkey_is_required(self, model):
+        with pytest.raises(ValueError):
+            InferencePool(model, '/tmp/pool.sock', authkey=b'')
+        with pytest.raises(ValueError):
+            PoolClient('/tmp/pool.sock', authkey=None)
+
+    def test_message_framing(self):
+        batch = np.arange(6, dtype=np.int64).reshape(2, 3)
+        logits = np.ones((2, 2), dtype=np.float32)
+        decoded = decode_message(encode_message([batch, logits]))
+        assert [a.dtype for a in decoded] == [np.int64, np.float32]
+        assert np.array_equal(decoded[0], batch) and np.array_equal(decoded[1], logits)
+        with pytest.raises(ValueError):
+            encode_message([np.zeros(2, dtype=object)])
+        with pytest.raises(ValueError):
+            decode_message(encode_message([batch])[:-1])
+        with pytest.raises(RuntimeError, match='boom'):
+            decode_message(encode_error('boom'))
+
+    def test_socket_is_private(self, pool):
+        server, _ = pool
+        for index in range(server.workers):
+            assert os.stat(worker_address(server.address, index)).st_mode & 0o777 == 0o600
+
+    def test_wrong_authkey_is_refused(self, pool):
+        server, _ = pool
+        with pytest.raises(Exception):
+            PoolClient(server.address, authkey=b'wrong').forward(
+                np.zeros((1, 3), dtype=np.int64), np.array([3], dtype=np.int64))
+
+    def test_logits_match_local_model(self, model, pool):
+        _, client = pool
+        batch = np.full((3, PADDED_LENGTH), PAD_ID, dtype=np.int64)
+        batch[:, :4] = [[5, 6, 7, 1], [8, 9, 10, 1], [11, 12, 13, 1]]
+        lengths = np.array([4, 4, 4], dtype=np.int64)
+
+        with torch.no_grad():
+            expected = model(torch.from_numpy(batch)).numpy()
+        for _ in range(4):
+            assert np.allclose(client.forward(batch, lengths), expected, atol=1e-4)
+        # The batch went to both workers, over connections reused every time
+        first = [list(idle) for idle in client._idle]
+        assert [len(idle) for idle in first] == [1, 1]
+        client.forward(batch, lengths)
+        assert client._idle == first
+        # A single row needs only one worker
+        assert np.allclose(client.forward(batch[:1], lengths[:1]), expected[:1], atol=1e-4)
+        client.close()
+        assert client._idle == [[], []]
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_one_client_thread_uses_every_worker(self, workers):
+        address = os.path.join(tempfile.mkdtemp(), 'pool.sock')
+        pool = InferencePool(SlowModel(), address, workers=workers, authkey=b'test')
+        pool.start()
+        try:
+            client = PoolClient(address, authkey=b'test', workers=workers)
+            batch = np.zeros((8, 3), dtype=np.int64)
+            lengths = np.full(8, 3, dtype=np.int64)
+            started = time.perf_counter()
+            for _ in range(4):
+                assert client.forward(batch, lengths).shape == (8, 2)
+            elapsed = time.perf_counter() - started
+        finally:
+            pool.stop()
+        # A worker takes SlowModel.DELAY for a whole batch; two workers
+        # each take half of every batch at the same time
+        if workers == 1:
+            assert elapsed >= 4 * SlowModel.DELAY
+        else:
+            assert elapsed < 4 * 0.75 * SlowModel.DELAY
+
+    def test_more_client_threads_than_workers(self, model, pool):
+        _, client = pool
+        batch = np.full((1, PADDED_LENGTH), PAD_ID, dtype=np.int64)
+        batch[0, :3] = [5, 6, 1]
+        lengths = np.array([3], dtype=np.int64)
+        with torch.no_grad():
+            expected = model(torch.from_numpy(batch)).numpy()
+        results = []
+
+        def call():
+            for _ in range(3):
+                results.append(np.allclose(client.forward(batch, lengths), expected, atol=1e-4))
+
+        # Idle open connections must not keep other threads from being served
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        assert results == [True] * 15
+
+    def test_weights_are_shared(self, model, pool):
+        assert all(p.is_shared() for p in model.parameters())
+
+    def test_worker_errors_are_raised(self, pool):
+        _, client = pool
+        with pytest.raises(RuntimeError):
+            client.forward(np.zeros((1, 3), dtype=np.int64) + 10_000,
+                           np.array([3], dtype=np.int64))
+        # The connection stays usable after an error
+        assert client.forward(np.zeros((1, 3), dtype=np.int64),
+                              np.array([3], dtype=np.int64)).shape == (1, 2)
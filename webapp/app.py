@@ -1,12 +1,22 @@
-from flask import Flask, render_template, request, jsonify, Response
-from sqlalchemy import func
-from app.prediction import predictor
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from app.admission import Overloaded
+from app.prediction import predictor, model_registry
 from app.database import db_manager
+from app.persistence import write_queue
 from app.models import SentimentPrediction
-from app.monitoring import get_metrics, PREDICTION_COUNTER, PREDICTION_DURATION
+from app.documents import AGGREGATIONS, DocumentScorer, DocumentTooLong
+from app.incremental import IncrementalScorer, SessionStore
+from app.pagination import keyset_page, approximate_count
+from app.rollups import sentiment_totals, count_since
+from app.monitoring import get_metrics, record_prediction, PREDICTION_COUNTER, PREDICTION_DURATION
+from app.profiling import observe_stage
 from config.settings import Config
 import json
+import logging
 from datetime import datetime, timedelta
+from time import perf_counter_ns
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -14,6 +24,47 @@ app.config.from_object(Config)
 # Initialize database
 db_manager.init_db()
 
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    # Closes the request's session and returns its connection to the pool
+    db_manager.remove_request_session()
+
+document_scorer = DocumentScorer(predictor,
+                                 stride=Config.LONG_DOC_WINDOW_STRIDE,
+                                 max_batch=Config.LONG_DOC_MAX_BATCH,
+                                 max_tokens=Config.LONG_DOC_MAX_TOKENS,
+                                 preview_chars=Config.LONG_DOC_PREVIEW_CHARS)
+stream_scorer = IncrementalScorer(predictor,
+                                  SessionStore(max_sessions=Config.STREAM_MAX_SESSIONS,
+                                               ttl_seconds=Config.STREAM_SESSION_TTL_SECONDS),
+                                  tolerance=Config.PACKED_TAIL_TOLERANCE)
+
+def store_prediction(result):
+    """Persist a prediction, off the request path when write-behind is enabled.
+
+    Results of shed requests scored on their first tokens only are not
+    stored, so rollups and exports hold predictions of full texts alone.
+    """
+    if result.get('degraded') == 'truncated':
+        return
+    start = perf_counter_ns()
+    try:
+        if Config.WRITE_BEHIND_ENABLED:
+            write_queue.submit(result)
+        else:
+            db_manager.bulk_save_predictions([result])
+    except Exception as e:
+        logger.error("Database error: %s", e)
+    finally:
+        observe_stage('db_write', perf_counter_ns() - start)
+
+def overloaded_response(error):
+    """503 for a shed prediction, telling the client when to retry"""
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -27,27 +78,16 @@ def predict():
             return render_template('predict.html', error="Please enter some text")
         
         # Make prediction
-        result = predictor.predict(text)
+        try:
+            result = predictor.predict(text)
+        except Overloaded:
+            return render_template('predict.html',
+                                 error="The server is busy, please try again shortly",
+                                 text=text), 503
         
         if result['success']:
             # Store in database
-            session = db_manager.get_session()
-            try:
-                prediction_record = SentimentPrediction(
-                    text=result['text'],
-                    prediction=result['prediction'],
-                    confidence=result['confidence'],
-                    sentiment_score=result['sentiment_score'],
-                    request_id=result['request_id'],
-                    processing_time=result['processing_time']
-                )
-                session.add(prediction_record)
-                session.commit()
-            except Exception as e:
-                session.rollback()
-                print(f"Database error: {e}")
-            finally:
-                session.close()
+            store_prediction(result)
             
             return render_template('predict.html', 
                                  result=result,
@@ -61,27 +101,29 @@ def predict():
 
 @app.route('/history')
 def history():
-    session = db_manager.get_session()
+    session = db_manager.request_session()
+    per_page = 20
+    
+    # Get one page of predictions by (timestamp, id) cursor
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = 20
-        
-        # Get paginated predictions
-        predictions = session.query(SentimentPrediction)\
-            .order_by(SentimentPrediction.timestamp.desc())\
-            .offset((page - 1) * per_page)\
-            .limit(per_page)\
-            .all()
-        
-        total = session.query(SentimentPrediction).count()
-        
-        return render_template('history.html', 
-                             predictions=predictions,
-                             page=page,
-                             per_page=per_page,
-                             total=total)
-    finally:
-        session.close()
+        predictions, next_cursor, prev_cursor = keyset_page(
+            session.query(SentimentPrediction), per_page,
+            after=request.args.get('cursor'),
+            before=request.args.get('before')
+        )
+    except ValueError:
+        predictions, next_cursor, prev_cursor = keyset_page(
+            session.query(SentimentPrediction), per_page
+        )
+    
+    total = approximate_count(session)
+    
+    return render_template('history.html', 
+                         predictions=predictions,
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor,
+                         per_page=per_page,
+                         total=total)
 
 @app.route('/api/predict', methods=['POST'])
 def api_predict():
@@ -91,70 +133,204 @@ def api_predict():
     if not text:
         return jsonify({'error': 'Text is required'}), 400
 
-    result = predictor.predict(text)
+    try:
+        result = predictor.predict(text)
+    except Overloaded as e:
+        return overloaded_response(e)
     
     if result['success']:
         # Store in database
-        session = db_manager.get_session()
+        store_prediction(result)
+    
+    return jsonify(result)
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def _read_ndjson_texts(stream):
+    """Yield one text per NDJSON line (a JSON string or an object with 'text')"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
         try:
-            prediction_record = SentimentPrediction(
-                text=result['text'],
-                prediction=result['prediction'],
-                confidence=result['confidence'],
-                sentiment_score=result['sentiment_score'],
-                request_id=result['request_id'],
-                processing_time=result['processing_time']
-            )
-            session.add(prediction_record)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Database error: {e}")
-        finally:
-            session.close()
+            item = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield item.get('text') if isinstance(item, dict) else item
+
+def _score_chunks(texts):
+    """Score texts in chunks, yielding each chunk's results in input order"""
+    chunk = []
+    index = 0
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= Config.API_BATCH_CHUNK_SIZE:
+            yield score_chunk(chunk, index)
+            index += len(chunk)
+            chunk = []
+    if chunk:
+        yield score_chunk(chunk, index)
+
+def score_chunk(texts, start_index):
+    """Score one chunk of a batch request and store it with one bulk insert.
+
+    Texts that are not non-empty strings get an error result. Every result
+    carries its ``index`` in the whole request, counting from
+    ``start_index``. Shared by the WSGI and ASGI batch endpoints.
+    """
+    valid = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+    predictions = predictor.predict_batch([texts[i].strip() for i in valid]) if valid else []
+    
+    results = [
+        predictor.error_result(text if isinstance(text, str) else None,
+                               ValueError('Text is required'), 0.0)
+        for text in texts
+    ]
+    for i, result in zip(valid, predictions):
+        results[i] = result
+    for i, result in enumerate(results):
+        result['index'] = start_index + i
+        record_prediction(result, result['processing_time'])
+    
+    # Store the whole chunk with a single bulk insert
+    start = perf_counter_ns()
+    try:
+        db_manager.bulk_save_predictions(results)
+    except Exception as e:
+        logger.error("Database error: %s", e)
+    finally:
+        observe_stage('db_write', perf_counter_ns() - start)
+    
+    return results
+
+@app.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    if request.mimetype in NDJSON_MIMETYPES:
+        # Stream results back line by line so large payloads never have to
+        # be held in memory in full
+        def generate():
+            for results in _score_chunks(_read_ndjson_texts(request.stream)):
+                for result in results:
+                    yield json.dumps(result) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    data = request.get_json(silent=True)
+    texts = data.get('texts') if isinstance(data, dict) else data
+    
+    if not isinstance(texts, list) or not texts:
+        return jsonify({'error': 'A non-empty list of texts is required'}), 400
+    if len(texts) > Config.API_BATCH_MAX_ITEMS:
+        return jsonify({
+            'error': f'At most {Config.API_BATCH_MAX_ITEMS} texts per request, '
+                     'use NDJSON for larger payloads'
+        }), 413
+    
+    results = [result for chunk in _score_chunks(texts) for result in chunk]
+    
+    return jsonify({
+        'results': results,
+        'total': len(results),
+        'succeeded': sum(1 for result in results if result['success'])
+    })
+
+# Request bodies are read and tokenized this many bytes at a time
+DOCUMENT_READ_SIZE = 64 * 1024
+
+@app.route('/api/predict/document', methods=['POST'])
+def api_predict_document():
+    """Score a long document as overlapping windows, streaming a raw text body"""
+    aggregation = request.args.get('aggregation', Config.LONG_DOC_AGGREGATION)
+    if aggregation not in AGGREGATIONS:
+        return jsonify({'error': f"aggregation must be one of {', '.join(AGGREGATIONS)}"}), 400
+    
+    if request.mimetype == 'application/json':
+        data = request.get_json(silent=True)
+        text = data.get('text') if isinstance(data, dict) else None
+        chunks = [text] if isinstance(text, str) else []
+    else:
+        chunks = iter(lambda: request.stream.read(DOCUMENT_READ_SIZE), b'')
+    
+    try:
+        result = document_scorer.score(chunks, aggregation)
+    except DocumentTooLong as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        result = predictor.error_result(None, e, 0.0)
+    
+    if result['success'] and not result['document']['tokens']:
+        return jsonify({'error': 'Text is required'}), 400
+    
+    record_prediction(result, result['processing_time'])
+    if result['success']:
+        store_prediction(result)
+    
+    return jsonify(result)
+
+@app.route('/api/stream/<session_id>', methods=['POST'])
+def api_stream_update(session_id):
+    """Append a message to a stream and return the whole stream's sentiment"""
+    data = request.get_json(silent=True)
+    text = data.get('text', '') if isinstance(data, dict) else ''
+    text = text.strip() if isinstance(text, str) else ''
+    
+    if not text:
+        return jsonify({'error': 'Text is required'}), 400
+    
+    try:
+        result = stream_scorer.update(session_id, text)
+    except Exception as e:
+        result = predictor.error_result(text, e, 0.0)
+    
+    record_prediction(result, result['processing_time'])
+    if result['success']:
+        store_prediction(result)
     
     return jsonify(result)
 
+@app.route('/api/stream/<session_id>', methods=['DELETE'])
+def api_stream_reset(session_id):
+    if not stream_scorer.reset(session_id):
+        return jsonify({'error': 'Unknown session'}), 404
+    return jsonify({'deleted': session_id})
+
+@app.route('/api/models')
+def api_models():
+    """Loaded model versions and their share of traffic"""
+    return jsonify({'versions': model_registry.versions()})
+
 @app.route('/metrics')
 def metrics():
     return Response(get_metrics(), mimetype='text/plain')
 
 @app.route('/dashboard')
 def dashboard():
-    session = db_manager.get_session()
-    try:
-        # Get stats for last 24 hours
-        yesterday = datetime.utcnow() - timedelta(hours=24)
-        
-        total_predictions = session.query(SentimentPrediction).count()
-        recent_predictions = session.query(SentimentPrediction)\
-            .filter(SentimentPrediction.timestamp >= yesterday).count()
-        
-        sentiment_distribution = session.query(
-            SentimentPrediction.prediction,
-            func.count(SentimentPrediction.id)
-        ).group_by(SentimentPrediction.prediction).all()
-        
-        avg_confidence = session.query(
-            func.avg(SentimentPrediction.confidence)
-        ).scalar() or 0
-        
-        avg_processing_time = session.query(
-            func.avg(SentimentPrediction.processing_time)
-        ).scalar() or 0
-        
-        stats = {
-            'total_predictions': total_predictions,
-            'recent_predictions': recent_predictions,
-            'sentiment_distribution': dict(sentiment_distribution),
-            'avg_confidence': round(avg_confidence, 3),
-            'avg_processing_time': round(avg_processing_time, 4)
-        }
-        
-        return render_template('metrics.html', stats=stats)
-        
-    finally:
-        session.close()
+    session = db_manager.request_session()
+    # Stats come from the pre-aggregated rollups, not the predictions table
+    yesterday = datetime.utcnow() - timedelta(hours=24)
+    
+    totals = sentiment_totals(session)
+    total_predictions = sum(t['count'] for t in totals)
+    recent_predictions = count_since(session, yesterday)
+    
+    sentiment_distribution = [(t['sentiment'], t['count']) for t in totals]
+    
+    avg_confidence = sum(t['confidence_sum'] for t in totals) / total_predictions \
+        if total_predictions else 0
+    
+    avg_processing_time = sum(t['processing_time_sum'] for t in totals) / total_predictions \
+        if total_predictions else 0
+    
+    stats = {
+        'total_predictions': total_predictions,
+        'recent_predictions': recent_predictions,
+        'sentiment_distribution': dict(sentiment_distribution),
+        'avg_confidence': round(avg_confidence, 3),
+        'avg_processing_time': round(avg_processing_time, 4)
+    }
+    
+    return render_template('metrics.html', stats=stats)
+    
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=Config.WEBAPP_PORT, debug=Config.DEBUG)
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""ASGI entry point serving the prediction API without a thread per request.
+
+Serves the same ``/api/predict``, ``/api/predict/batch``, ``/api/models``
+and ``/metrics`` routes as the Flask app, as a plain ASGI callable with no
+framework on top. Single predictions are handed to the micro-batcher and
+awaited through its futures, so a waiting request only costs a coroutine;
+the same goes for requests queued by admission control.
+Without batching, and for batch requests, the CPU-bound work runs on a
+small thread pool. Database writes go to the write-behind queue without
+blocking, or to the thread pool when write-behind is disabled.
+
+    uvicorn webapp.asgi:app --port 5002
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 webapp.asgi:app
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, perf_counter_ns
+from app.admission import AdmissionController, Overloaded
+from app.batching import MicroBatcher
+from app.monitoring import get_metrics, record_prediction, ACTIVE_REQUESTS
+from app.persistence import write_queue
+from app.prediction import predictor, model_registry, warm_up
+from app.profiling import observe_stage
+from config.settings import Config
+from webapp.app import NDJSON_MIMETYPES, score_chunk, store_prediction
+
+executor = ThreadPoolExecutor(max_workers=Config.ASGI_EXECUTOR_WORKERS,
+                              thread_name_prefix='asgi-inference')
+
+# The micro-batcher (or plain predictor), with or without admission control in front
+batcher = predictor.predictor if isinstance(predictor, AdmissionController) else predictor
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """The parts of an ASGI HTTP request the routes need"""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        headers = dict(scope.get('headers', []))
+        self.mimetype = headers.get(b'content-type', b'').decode('latin-1') \
+            .split(';')[0].strip().lower()
+
+    async def chunks(self):
+        """Yield the request body as it arrives"""
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                return
+            yield message.get('body', b'')
+            if not message.get('more_body', False):
+                return
+
+    async def body(self) -> bytes:
+        return b''.join([chunk async for chunk in self.chunks()])
+
+    async def json(self):
+        try:
+            return json.loads(await self.body() or b'null')
+        except ValueError:
+            return None
+
+    async def lines(self):
+        """Yield body lines without buffering the whole body"""
+        pending = b''
+        async for chunk in self.chunks():
+            pending += chunk
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield line
+        if pending:
+            yield pending
+
+
+async def send_response(send, status: int, body: bytes, content_type: str, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode('latin-1')),
+                    (b'content-length', str(len(body)).encode('latin-1'))] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, data, status: int = 200, headers=()):
+    await send_response(send, status, json.dumps(data).encode('utf-8'), 'application/json',
+                        headers)
+
+
+async def run_in_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def predict_text(text: str):
+    """Score one text, through admission control when it is enabled"""
+    if isinstance(predictor, AdmissionController):
+        return await predictor.predict_async(text, _predict_text, run_in_executor)
+    return await _predict_text(text)
+
+
+async def _predict_text(text: str):
+    """Score one text without tying up a thread while it waits for its batch"""
+    if not isinstance(batcher, MicroBatcher):
+        return await run_in_executor(batcher.predict, text)
+
+    with ACTIVE_REQUESTS.track_inprogress():
+        start_time = perf_counter()
+        tokens = batcher.tokenize(text)
+        result = batcher.cached_result(text, tokens)
+        if result is None:
+            result = await asyncio.wrap_future(batcher.submit(text, tokens))
+        record_prediction(result, perf_counter() - start_time)
+        return result
+
+
+async def store(result):
+    if result.get('degraded') == 'truncated':
+        return
+    if Config.WRITE_BEHIND_ENABLED:
+        start = perf_counter_ns()
+        write_queue.submit(result, block=False)
+        observe_stage('db_write', perf_counter_ns() - start)
+    else:
+        await run_in_executor(store_prediction, result)
+
+
+async def api_predict(request, send):
+    data = await request.json()
+    text = data.get('text', '') if isinstance(data, dict) else ''
+    text = text.strip() if isinstance(text, str) else ''
+    if not text:
+        raise HTTPError(400, 'Text is required')
+
+    result = await predict_text(text)
+    if result['success']:
+        await store(result)
+    await send_json(send, result)
+
+
+async def _read_ndjson_texts(request):
+    async for line in request.lines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield item.get('text') if isinstance(item, dict) else item
+
+
+async def api_predict_batch(request, send):
+    if request.mimetype in NDJSON_MIMETYPES:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson')]
+        })
+
+        async def flush(chunk, index):
+            results = await run_in_executor(score_chunk, chunk, index)
+            body = ''.join(json.dumps(result) + '\n' for result in results)
+            await send({'type': 'http.response.body', 'body': body.encode('utf-8'),
+                        'more_body': True})
+
+        chunk, index = [], 0
+        async for text in _read_ndjson_texts(request):
+            chunk.append(text)
+            if len(chunk) >= Config.API_BATCH_CHUNK_SIZE:
+                await flush(chunk, index)
+                index += len(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk, index)
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    data = await request.json()
+    texts = data.get('texts') if isinstance(data, dict) else data
+    if not isinstance(texts, list) or not texts:
+        raise HTTPError(400, 'A non-empty list of texts is required')
+    if len(texts) > Config.API_BATCH_MAX_ITEMS:
+        raise HTTPError(413, f'At most {Config.API_BATCH_MAX_ITEMS} texts per request, '
+                             'use NDJSON for larger payloads')
+
+    results = []
+    for index in range(0, len(texts), Config.API_BATCH_CHUNK_SIZE):
+        chunk = texts[index:index + Config.API_BATCH_CHUNK_SIZE]
+        results.extend(await run_in_executor(score_chunk, chunk, index))
+    await send_json(send, {
+        'results': results,
+        'total': len(results),
+        'succeeded': sum(1 for result in results if result['success'])
+    })
+
+
+async def api_models(request, send):
+    await send_json(send, {'versions': model_registry.versions()})
+
+
+async def metrics(request, send):
+    await send_response(send, 200, get_metrics(), 'text/plain')
+
+
+ROUTES = {
+    ('POST', '/api/predict'): api_predict,
+    ('POST', '/api/predict/batch'): api_predict_batch,
+    ('GET', '/api/models'): api_models,
+    ('GET', '/metrics'): metrics,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await run_in_executor(warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await run_in_executor(write_queue.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        methods = [method for method, path in ROUTES if path == scope['path']]
+        if methods:
+            await send_json(send, {'error': 'Method not allowed'}, 405)
+        else:
+            await send_json(send, {'error': 'Not found'}, 404)
+        return
+
+    try:
+        await handler(Request(scope, receive), send)
+    except HTTPError as e:
+        await send_json(send, {'error': e.message}, e.status)
+    except Overloaded as e:
+        await send_json(send, {'error': str(e), 'retry_after': e.retry_after}, 503,
+                        [(b'retry-after', str(e.retry_after).encode('latin-1'))])